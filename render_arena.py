@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Render Buffer Arena
+Goal: Reuse full-frame working arrays across renders instead of allocating them per call
+Tools: Python, NumPy
+
+A render loop in one process (spool worker, catalog run, journal resume)
+asks the arena for the same named buffers every call. The arena for a
+scene resolution hands back the arrays it allocated last time, so steady
+state renders allocate no full-frame working memory at all.
+
+Buffers are reused in place: a buffer handed out for one render is
+overwritten by the next, so callers that keep results across renders must
+copy them. Arenas are per process and not thread-safe.
+"""
+
+from collections import OrderedDict
+
+# Scene resolutions whose arenas are kept alive at once
+MAX_ARENAS = 2
+
+
+class BufferArena:
+    """Named working buffers for one scene resolution"""
+
+    def __init__(self):
+        self.buffers = {}
+        self.allocations = 0
+        self.allocations_avoided = 0
+
+    def get(self, name, shape, dtype="uint8"):
+        """
+        Buffer ``name`` with this shape and dtype; contents are undefined
+
+        Buffers are kept flat and grown to the largest request, so smaller
+        requests (the last strip of a tiled render, a region's bounding box)
+        are served as views of the held buffer.
+        """
+        import numpy as np
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        buffer = self.buffers.get(name)
+        if buffer is not None and buffer.dtype == dtype and buffer.size >= count:
+            self.allocations_avoided += 1
+            return buffer[:count].reshape(shape)
+        buffer = np.empty(count, dtype)
+        self.buffers[name] = buffer
+        self.allocations += 1
+        return buffer.reshape(shape)
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+
+_arenas = OrderedDict()
+_retired = {"allocations": 0, "allocations_avoided": 0}
+
+
+def arena_for(size):
+    """Arena for a scene size (width, height), evicting the least recently used size"""
+    size = tuple(size)
+    arena = _arenas.get(size)
+    if arena is None:
+        arena = _arenas[size] = BufferArena()
+        while len(_arenas) > MAX_ARENAS:
+            _, retired = _arenas.popitem(last=False)
+            _retired["allocations"] += retired.allocations
+            _retired["allocations_avoided"] += retired.allocations_avoided
+    else:
+        _arenas.move_to_end(size)
+    return arena
+
+
+def arena_stats():
+    """Process-wide buffer allocation counters"""
+    live = list(_arenas.values())
+    return {
+        "allocations": _retired["allocations"] + sum(arena.allocations for arena in live),
+        "allocations_avoided": _retired["allocations_avoided"] + sum(arena.allocations_avoided for arena in live),
+        "arena_bytes": sum(arena.nbytes for arena in live),
+    }
+
+
+def reset_arena_stats():
+    """Zero the allocation counters, keeping the buffers (the metrics start over after warmup)"""
+    _retired.update(allocations=0, allocations_avoided=0)
+    for arena in _arenas.values():
+        arena.allocations = arena.allocations_avoided = 0
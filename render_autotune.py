@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Render Autotuner
+Goal: Find the resampling backends, strip height, worker count and encoder preset that suit this host
+Tools: Python, NumPy
+
+The knobs are swept over a sample of recently finished countertop jobs
+from the render journal (those whose images still exist), or over the
+bundled sample scene with --benchmark or an empty journal. Each knob gets
+a simple cost model fitted to its measurements:
+    resample      calibrate-resample's selection (fastest backend within
+                  the PSNR threshold) at the slab scale factors the sample
+                  jobs actually use, instead of fixed scales
+    strip_height  tiled render seconds = a + b / strip_height, the fixed
+                  cost plus a per-strip overhead; the smallest strip height
+                  predicted within TOLERANCE of the fastest, which keeps
+                  strip memory down
+    workers       Amdahl's law: seconds per job with w processes =
+                  a + b / w, a being the serial share (I/O, memory
+                  bandwidth); the fewest workers predicted within
+                  TOLERANCE of the best
+    preset        encode seconds plus the seconds it takes to serve the
+                  bytes at --bandwidth-mbps, per candidate preset
+The choices are saved in the host profile under "autotune" (resampling
+under "resample"), where renders pick them up as their defaults: tiled
+strip height, the preset of jobs that don't set one and --workers of the
+batch commands. Explicit options and job inputs still win.
+
+    python slab_render.py autotune
+    python slab_render.py autotune --knob preset --knob strip_height --dry-run
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+from render_io import load_host_profile, update_host_profile, use_host_profile
+
+KNOBS = ("resample", "strip_height", "workers", "preset")
+DEFAULT_JOBS = 4
+DEFAULT_STRIP_HEIGHTS = (64, 128, 256, 512, 1024)
+DEFAULT_PRESET_CANDIDATES = ("gallery", "gallery-baseline")
+# Downstream bandwidth the preset's bytes are costed at
+DEFAULT_BANDWIDTH_MBPS = 20.0
+# A setting predicted within this share of the best counts as just as fast
+TOLERANCE = 0.05
+# Longest side of the slab sample resampling is calibrated on
+CALIBRATION_SIZE = 1024
+
+
+def sample_jobs(journal_path, count=DEFAULT_JOBS):
+    """
+    Inputs of the most recent finished countertop jobs whose images still exist
+
+    Returns:
+        list: Job inputs (kitchen, slab, mask), newest first
+    """
+    from render_journal import DONE, RenderJournal
+    if not os.path.exists(journal_path):
+        return []
+    journal = RenderJournal(journal_path)
+    try:
+        jobs = journal.list(states=(DONE,))
+    finally:
+        journal.close()
+    samples, seen = [], set()
+    for job in reversed(jobs):
+        inputs = job["inputs"]
+        key = tuple(inputs.get(name) for name in ("kitchen", "slab", "mask"))
+        if "regions" in inputs or "variants" in inputs or key in seen:
+            continue
+        if all(path and os.path.exists(path) for path in key):
+            seen.add(key)
+            samples.append({"kitchen": key[0], "slab": key[1], "mask": key[2]})
+        if len(samples) >= count:
+            break
+    return samples
+
+
+def fit_inverse(xs, seconds):
+    """
+    Least-squares fit of seconds = a + b / x
+
+    Returns:
+        tuple: (a, b), or None with fewer than two distinct x
+    """
+    import numpy as np
+    if len(set(xs)) < 2:
+        return None
+    design = np.column_stack([np.ones(len(xs)), 1 / np.asarray(xs, dtype=np.float64)])
+    (a, b), *_ = np.linalg.lstsq(design, np.asarray(seconds, dtype=np.float64), rcond=None)
+    return float(a), float(b)
+
+
+def pick_smallest(candidates, predicted, tolerance=TOLERANCE):
+    """Smallest candidate predicted within tolerance of the best"""
+    best = min(predicted)
+    return min(candidate for candidate, value in zip(candidates, predicted) if value <= best * (1 + tolerance))
+
+
+def _timed(render, inputs):
+    started = time.perf_counter()
+    render(inputs)
+    return time.perf_counter() - started
+
+
+def tune_resample(jobs, slab_scale, repeats=3, profile_path=None):
+    """
+    Calibrate resampling at the scale factors the jobs frame their slabs at
+
+    Scales calibrated before (by calibrate-resample or an earlier run) are
+    kept, so other resizes still find their nearest scale.
+    """
+    from render_resample import calibrate, load_thumbnail
+    scales = sorted({round(slab_scale(job["kitchen"], job["slab"]), 2) for job in jobs})
+    sample = load_thumbnail(jobs[0]["slab"], CALIBRATION_SIZE)
+    calibration = calibrate(sample, scales, repeats=repeats)
+    previous = load_host_profile(profile_path).get("resample", {}).get("scales", {})
+    calibration["scales"] = dict(previous, **calibration["scales"])
+    chosen = {str(scale): calibration["scales"][str(scale)]["backend"] for scale in scales}
+    return calibration, {"scales": scales, "backends": chosen}
+
+
+def tune_strip_height(render, jobs, scratch, candidates=DEFAULT_STRIP_HEIGHTS, repeats=2):
+    """Time tiled renders at each strip height and fit seconds = a + b / strip_height"""
+    seconds = {}
+    for height in candidates:
+        samples = []
+        for index in range(repeats):
+            samples.append(sum(_timed(render, dict(job, tiled=True, strip_height=height,
+                                                   output=os.path.join(scratch, f"strip_{index}_{n}.jpg")))
+                               for n, job in enumerate(jobs)))
+        seconds[height] = statistics.median(samples)
+    heights = list(seconds)
+    fit = fit_inverse(heights, [seconds[height] for height in heights])
+    predicted = [fit[0] + fit[1] / height for height in heights] if fit else [seconds[h] for h in heights]
+    model = {"seconds": {str(height): round(value, 6) for height, value in seconds.items()},
+             "a": round(fit[0], 6) if fit else None, "b": round(fit[1], 6) if fit else None}
+    return pick_smallest(heights, predicted), model
+
+
+def _worker_pid(_):
+    return os.getpid()
+
+
+def _warm_worker():
+    # Pay for the heavy imports before the timed renders start
+    import numpy  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+
+def tune_workers(render, jobs, scratch, max_workers):
+    """Time batches of renders at 1..max_workers processes and fit seconds per job = a + b / workers"""
+    from concurrent.futures import ProcessPoolExecutor
+    per_job = {}
+    for workers in range(1, max_workers + 1):
+        count = max(2 * workers, len(jobs))
+        batch = [dict(jobs[n % len(jobs)], output=os.path.join(scratch, f"workers_{workers}_{n}.jpg"))
+                 for n in range(count)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker) as pool:
+            # Start every worker process before the clock starts
+            list(pool.map(_worker_pid, range(workers)))
+            started = time.perf_counter()
+            list(pool.map(render, batch))
+            per_job[workers] = (time.perf_counter() - started) / count
+    counts = list(per_job)
+    fit = fit_inverse(counts, [per_job[workers] for workers in counts])
+    predicted = [fit[0] + fit[1] / workers for workers in counts] if fit else [per_job[w] for w in counts]
+    model = {"seconds_per_job": {str(workers): round(value, 6) for workers, value in per_job.items()},
+             "a": round(fit[0], 6) if fit else None, "b": round(fit[1], 6) if fit else None}
+    if fit:
+        # Serial fraction of a job under Amdahl's law
+        total = fit[0] + fit[1]
+        model["serial_fraction"] = round(min(1.0, max(0.0, fit[0] / total)), 4) if total > 0 else None
+    return pick_smallest(counts, predicted), model
+
+
+def tune_preset(render, jobs, scratch, candidates=DEFAULT_PRESET_CANDIDATES, bandwidth_mbps=DEFAULT_BANDWIDTH_MBPS,
+                repeats=3):
+    """
+    Re-encode each job's render with every candidate and cost encode time plus serving time
+
+    Candidates must be full-size JPEG presets, since the winner becomes the
+    default of every render that doesn't name a preset.
+    """
+    import numpy as np
+    from PIL import Image
+    from render_encode import benchmark_presets, full_size_jpeg
+    unfit = [preset for preset in candidates if not full_size_jpeg(preset)]
+    if unfit:
+        raise ValueError(f"Presets {', '.join(unfit)} can't be a host's default preset")
+    seconds = dict.fromkeys(candidates, 0.0)
+    sizes = dict.fromkeys(candidates, 0)
+    for index, job in enumerate(jobs):
+        output = os.path.join(scratch, f"preset_{index}.jpg")
+        # Rendered with the print preset so the candidates re-encode a near-lossless frame
+        render(dict(job, preset="print", output=output))
+        array = np.asarray(Image.open(output).convert("RGB"))
+        for stats in benchmark_presets(array, candidates, repeats):
+            seconds[stats["preset"]] += stats["encode_seconds"]
+            sizes[stats["preset"]] += stats["bytes"]
+    serve = 8 / (bandwidth_mbps * 1e6)
+    cost = {preset: seconds[preset] + sizes[preset] * serve for preset in candidates}
+    model = {"bandwidth_mbps": bandwidth_mbps,
+             "encode_seconds": {preset: round(value, 6) for preset, value in seconds.items()},
+             "bytes": sizes, "cost_seconds": {preset: round(value, 6) for preset, value in cost.items()}}
+    return min(candidates, key=cost.get), model
+
+
+def autotune(render, slab_scale, jobs, knobs=KNOBS, strip_heights=DEFAULT_STRIP_HEIGHTS,
+             max_workers=None, presets=DEFAULT_PRESET_CANDIDATES, bandwidth_mbps=DEFAULT_BANDWIDTH_MBPS,
+             repeats=2, source="journal", profile_path=None, record=True):
+    """
+    Sweep the knobs over the sample jobs and save the chosen settings
+
+    Args:
+        render: Callable taking render job inputs, picklable for the workers sweep
+        slab_scale: Callable giving the factor a scene's framing scales a slab by,
+            from the kitchen and slab paths
+        source: Where the jobs came from, "journal" or "benchmark"
+
+    Returns:
+        dict: The "autotune" profile section: settings, models and sample size
+    """
+    previous = load_host_profile(profile_path).get("autotune", {})
+    section = {"settings": dict(previous.get("settings", {})), "models": dict(previous.get("models", {})),
+               "jobs": len(jobs), "source": source, "host": socket.gethostname()}
+    # The sweep renders must resample with the profile being tuned, not the default one
+    with use_host_profile(profile_path) if profile_path else contextlib.nullcontext(), \
+            tempfile.TemporaryDirectory(prefix="slab-render-autotune-") as scratch:
+        if "resample" in knobs:
+            calibration, section["models"]["resample"] = tune_resample(jobs, slab_scale, max(3, repeats),
+                                                                       profile_path)
+            # Saved first: the renders of the other sweeps resample with it
+            if record:
+                update_host_profile("resample", calibration, profile_path)
+        if "preset" in knobs:
+            section["settings"]["preset"], section["models"]["preset"] = tune_preset(
+                render, jobs, scratch, presets, bandwidth_mbps, repeats=max(3, repeats))
+        if "strip_height" in knobs:
+            section["settings"]["strip_height"], section["models"]["strip_height"] = tune_strip_height(
+                render, jobs, scratch, strip_heights, repeats)
+        if "workers" in knobs:
+            section["settings"]["workers"], section["models"]["workers"] = tune_workers(
+                render, jobs, scratch, max_workers or os.cpu_count() or 1)
+    section["tuned_at"] = time.time()
+    if record:
+        update_host_profile("autotune", section, profile_path)
+    return section
+
+
+def report_autotune(section, knobs):
+    """Print the chosen settings and what they were chosen from"""
+    models, settings = section["models"], section["settings"]
+    if "resample" in knobs:
+        for scale, backend in models["resample"]["backends"].items():
+            print(f"📐 resample at scale {scale}: {backend}")
+    if "preset" in knobs:
+        model = models["preset"]
+        print(f"🗜️ preset: {settings['preset']} (" + ", ".join(
+            f"{preset} {model['encode_seconds'][preset] * 1000:.0f} ms + {model['bytes'][preset] / 1024:.0f} KiB"
+            for preset in model["cost_seconds"]) + f" at {model['bandwidth_mbps']:g} Mbit/s)")
+    if "strip_height" in knobs:
+        timings = models["strip_height"]["seconds"]
+        print(f"🧱 strip height: {settings['strip_height']} rows (" + ", ".join(
+            f"{height}: {seconds * 1000:.0f} ms" for height, seconds in timings.items()) + ")")
+    if "workers" in knobs:
+        model = models["workers"]
+        serial = model.get("serial_fraction")
+        print(f"👷 workers: {settings['workers']} (" + ", ".join(
+            f"{workers}: {seconds * 1000:.0f} ms/job" for workers, seconds in model["seconds_per_job"].items())
+            + (f", serial fraction {serial:.0%}" if serial is not None else "") + ")")
+
+
+def autotune_command(argv, render, slab_scale):
+    """
+    CLI for ``slab_render.py autotune``
+
+    ``render`` runs a job from its inputs; ``slab_scale`` gives the factor a
+    scene's framing scales a slab by, from the kitchen and slab paths.
+    """
+    from render_journal import DEFAULT_JOURNAL_PATH
+    from render_warmup import warmup_inputs
+    parser = argparse.ArgumentParser(prog="slab_render.py autotune",
+                                     description="Sweep render settings on this host and save the fastest")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL_PATH, help="Journal to sample recent jobs from")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Recent jobs to sample (default: %(default)s)")
+    parser.add_argument("--benchmark", action="store_true", help="Tune on the bundled sample scene only")
+    parser.add_argument("--knob", action="append", choices=KNOBS, help="Only tune these knobs (repeatable)")
+    parser.add_argument("--strip-heights", type=lambda text: [int(h) for h in text.split(",")],
+                        default=list(DEFAULT_STRIP_HEIGHTS), help="Comma-separated strip heights to try")
+    parser.add_argument("--max-workers", type=int, help="Most worker processes to try (default: one per core)")
+    parser.add_argument("--presets", type=lambda text: text.split(","), default=list(DEFAULT_PRESET_CANDIDATES),
+                        help="Comma-separated JPEG presets to choose the default from")
+    parser.add_argument("--bandwidth-mbps", type=float, default=DEFAULT_BANDWIDTH_MBPS,
+                        help="Bandwidth encoded bytes are costed at (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=2, help="Timed rounds per setting")
+    parser.add_argument("--profile", help="Host profile to update (default: render_profile.json)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the choices without saving them")
+    parser.add_argument("--json", action="store_true", help="Print the profile section as JSON")
+    args = parser.parse_args(argv)
+
+    from render_encode import PRESETS, full_size_jpeg
+    unknown = [preset for preset in args.presets if preset not in PRESETS]
+    if unknown:
+        parser.error(f"unknown presets: {', '.join(unknown)}")
+    # Downscaled or AVIF/WebP presets would win on bytes and then shrink every default render
+    unfit = [preset for preset in args.presets if not full_size_jpeg(preset)]
+    if unfit:
+        parser.error(f"not full-size JPEG presets: {', '.join(unfit)}")
+    knobs = tuple(args.knob or KNOBS)
+    jobs = [] if args.benchmark else sample_jobs(args.journal, args.jobs)
+    source = "journal"
+    if not jobs:
+        jobs = [{name: value for name, value in warmup_inputs(None).items() if name != "output"}]
+        source = "benchmark"
+    if not args.json:
+        print(f"🎛️ Tuning {', '.join(knobs)} on {len(jobs)} {'recent jobs' if source == 'journal' else 'sample scene'}")
+
+    started = time.perf_counter()
+    section = autotune(render, slab_scale, jobs, knobs, args.strip_heights, args.max_workers, args.presets,
+                       args.bandwidth_mbps, args.repeats, source, args.profile, record=not args.dry_run)
+    section["seconds"] = round(time.perf_counter() - started, 3)
+    if args.json:
+        print(json.dumps(section, sort_keys=True))
+        return 0
+    report_autotune(section, knobs)
+    print(f"⏱️ Tuned in {section['seconds']:.1f} s")
+    if not args.dry_run:
+        print("✅ Saved tuned settings to host profile")
+    return 0
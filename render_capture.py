@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Slow-Render Profile Capture
+Goal: Keep a flamegraph-ready profile of renders that blow their latency target
+Tools: Python (stack sampling thread)
+
+When capture is enabled, a sampling thread records the rendering thread's
+Python stack every few milliseconds while a render runs. Renders slower
+than the threshold, and every Nth render, are written out as collapsed
+stacks (``frame;frame;frame count`` lines, the input of flamegraph.pl,
+inferno and speedscope) next to a JSON file with the job's inputs,
+dimensions and timing. Faster renders drop their samples. With capture
+disabled the render path only pays for one check.
+
+Enable it for any render command through the environment:
+    SLAB_RENDER_CAPTURE_DIR       directory for captured profiles
+    SLAB_RENDER_CAPTURE_SLOW_MS   capture renders slower than this
+    SLAB_RENDER_CAPTURE_EVERY     capture every Nth render
+or with ``spool work --capture-dir/--capture-slow-ms/--capture-every``.
+With a directory but neither trigger, every render is captured.
+"""
+
+import collections
+import contextlib
+import os
+import socket
+import sys
+import threading
+import time
+
+from render_io import write_json_atomic
+
+DEFAULT_INTERVAL = 0.005
+
+
+def frame_label(code):
+    """Flamegraph frame name: file and qualified function name"""
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread"""
+
+    def __init__(self, thread_id, interval=DEFAULT_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="render-capture", daemon=True)
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+        return self.stacks
+
+
+def write_collapsed(path, stacks):
+    """Write stacks in collapsed format, heaviest first"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(temp_path, path)
+
+
+class RenderCapture:
+    """
+    Decides which renders to keep a profile of and writes them
+
+    Args:
+        output_dir: Directory for <stamp>-<mode>-<output>.collapsed/.json pairs
+        slow_seconds: Capture renders that take longer than this
+        every: Capture every Nth render regardless of its time
+    """
+
+    def __init__(self, output_dir, slow_seconds=None, every=None, interval=DEFAULT_INTERVAL):
+        self.output_dir = output_dir
+        self.slow_seconds = slow_seconds
+        self.every = every if every or slow_seconds is not None else 1
+        self.interval = interval
+        self.renders = 0
+        self.captured = 0
+
+    def reason(self, seconds):
+        """Why this render's profile is kept, or None to drop it"""
+        if self.slow_seconds is not None and seconds > self.slow_seconds:
+            return "slow"
+        if self.every and self.renders % self.every == 0:
+            return "sampled"
+        return None
+
+    @contextlib.contextmanager
+    def capture(self, inputs, mode, observation):
+        """Sample the stack while the block renders; ``observation["result"]`` supplies the dimensions"""
+        sampler = StackSampler(threading.get_ident(), self.interval).start()
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            stacks = sampler.stop()
+            self.renders += 1
+            reason = self.reason(seconds)
+            if reason and stacks:
+                self.write(inputs, mode, observation.get("result") or {}, seconds, reason, stacks, error)
+
+    def write(self, inputs, mode, result, seconds, reason, stacks, error=None):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(str(inputs.get("output") or "render")))[0]
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{self.renders}-{mode}-{stem}"
+        path = os.path.join(self.output_dir, name)
+        write_collapsed(f"{path}.collapsed", stacks)
+        write_json_atomic(f"{path}.json", {
+            "inputs": inputs, "mode": mode, "reason": reason, "error": error,
+            "width": result.get("width"), "height": result.get("height"),
+            "seconds": round(seconds, 6), "samples": sum(stacks.values()), "interval": self.interval,
+            "host": socket.gethostname(), "pid": os.getpid(), "captured_at": time.time(),
+        }, indent=2)
+        self.captured += 1
+        return path
+
+
+_capture = None
+_configured = False
+
+
+def configure(output_dir, slow_ms=None, every=None):
+    """Enable capture for this process (None output_dir disables it)"""
+    global _capture, _configured
+    _configured = True
+    _capture = None
+    if output_dir:
+        _capture = RenderCapture(output_dir, slow_ms / 1000 if slow_ms is not None else None, every)
+    return _capture
+
+
+def active_capture():
+    """The process's RenderCapture, configured from the environment on first use"""
+    if not _configured:
+        slow_ms = os.environ.get("SLAB_RENDER_CAPTURE_SLOW_MS")
+        every = os.environ.get("SLAB_RENDER_CAPTURE_EVERY")
+        configure(os.environ.get("SLAB_RENDER_CAPTURE_DIR"), float(slow_ms) if slow_ms else None,
+                  int(every) if every else None)
+    return _capture
+
+
+@contextlib.contextmanager
+def capture_render(inputs, mode, observation):
+    """Profile the render in the block if capture is enabled, else do nothing"""
+    capture = active_capture()
+    if capture is None:
+        yield
+        return
+    with capture.capture(inputs, mode, observation):
+        yield
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Catalog Pre-Render
+Goal: Keep a render of every active product against the standard scenes, redoing only what changed
+Tools: Python
+
+The product manifest is a JSON list (or a CSV) of records with:
+    product_id  - product the slab belongs to
+    slab_image  - local path to the slab photo, relative to the manifest
+    updated_at  - optional; last change of the slab image
+    hash        - optional; content hash of the slab image
+
+Each (product, scene) render is keyed by a fingerprint of the slab, the
+scene files and the render settings, including the encoder preset and the
+resampling filters in effect (the host's tuned defaults when not given).
+Renders are written to <product_id>_<scene>.<ext>, the extension being the
+format the preset writes. The state file records the fingerprint of every
+finished render, so a run only renders pairs whose fingerprint changed or
+whose output is missing. It also keeps each render's placeholder, so the
+state file doubles as the manifest the inventory pages paint from.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+
+from render_encode import DEFAULT_PRESET, FORMAT_EXTENSIONS, PRESETS, default_preset, output_format
+from render_io import default_workers, file_digest, read_json, write_json_atomic
+from render_resample import AUTO, available_backends, backend_settings
+from render_regions import assign_slabs, normalize_scene
+
+STATE_VERSION = 1
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCENES = {
+    "kitchen": {"image": os.path.join(BASE_DIR, "kitchen.jpg"), "mask": os.path.join(BASE_DIR, "mask.png")},
+}
+DEFAULT_OUTPUT_DIR = os.path.join("upload", "catalog")
+
+
+def load_manifest(path):
+    """
+    Read product records from a JSON or CSV manifest
+
+    Returns:
+        list: Dicts with product_id, slab_image and optional updated_at/hash
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            records = list(csv.DictReader(f))
+    else:
+        records = read_json(path)
+        if isinstance(records, dict):
+            records = records.get("products", [])
+
+    base = os.path.dirname(os.path.abspath(path))
+    products = []
+    for record in records:
+        if not record.get("product_id") or not record.get("slab_image"):
+            raise ValueError(f"Manifest record needs product_id and slab_image: {record}")
+        product = dict(record, product_id=str(record["product_id"]))
+        product["slab_image"] = os.path.join(base, record["slab_image"])
+        products.append(product)
+    return products
+
+
+def load_scenes(path=None):
+    """
+    Read scene definitions, ``{name: {"image": ..., "mask": ...}}``
+
+    A scene may list ``regions`` instead of a mask (see render_regions.py);
+    the product's slab goes into every region that does not pin its own.
+    Paths are relative to the scenes file. Without a file the bundled
+    kitchen scene is used.
+    """
+    if path is None:
+        return dict(DEFAULT_SCENES)
+    base = os.path.dirname(os.path.abspath(path))
+    return {name: normalize_scene(scene, base) for name, scene in read_json(path).items()}
+
+
+def scene_fingerprint(scene, files):
+    if "regions" not in scene:
+        return _fingerprint(files.get(scene["image"]), files.get(scene["mask"]))
+    regions = [dict(region, mask=files.get(region["mask"]),
+                    slab=files.get(region["slab"]) if region.get("slab") else None)
+               for region in scene["regions"]]
+    return _fingerprint(files.get(scene["image"]), regions)
+
+
+def scene_inputs(scene, slab_image, output):
+    """Render job inputs for a product's slab in a scene"""
+    if "regions" not in scene:
+        return {"kitchen": scene["image"], "slab": slab_image, "mask": scene["mask"], "output": output}
+    return {"kitchen": scene["image"], "regions": assign_slabs(scene["regions"], default_slab=slab_image),
+            "output": output}
+
+
+def _fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class FileFingerprints:
+    """
+    Content fingerprints memoized by file size and mtime
+
+    Hashing is skipped for files whose stat is unchanged since the last run,
+    so a nightly run over thousands of slabs mostly costs one stat per file.
+    """
+
+    def __init__(self, memo=None):
+        self.memo = memo if memo is not None else {}
+
+    def get(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        entry = self.memo.get(key)
+        if entry is None or entry["stat"] != signature:
+            entry = {"stat": signature, "digest": file_digest(path)}
+            self.memo[key] = entry
+        return entry["digest"]
+
+
+def slab_fingerprint(product, files):
+    """Prefer the manifest's own hash or timestamp over reading the slab"""
+    if product.get("hash"):
+        return f"hash:{product['hash']}"
+    if product.get("updated_at"):
+        return _fingerprint("updated", product["updated_at"], os.path.abspath(product["slab_image"]))
+    return f"sha256:{files.get(product['slab_image'])}"
+
+
+def output_path_for(output_dir, product_id, scene_name, preset=DEFAULT_PRESET):
+    """Render path of a (product, scene) pair, with the extension of the format the preset writes"""
+    return os.path.join(output_dir, f"{product_id}_{scene_name}{FORMAT_EXTENSIONS[output_format(preset)]}")
+
+
+def plan_catalog(products, scenes, state, output_dir, files, settings=None, force=False, preset=DEFAULT_PRESET):
+    """
+    Work out which (product, scene) renders are stale
+
+    Returns:
+        list: Render tasks with product_id, scene, inputs and fingerprint
+    """
+    scene_fingerprints = {name: scene_fingerprint(scene, files) for name, scene in scenes.items()}
+    rendered = state.get("renders", {})
+    tasks = []
+    for product in products:
+        slab_fp = slab_fingerprint(product, files)
+        for name, scene in scenes.items():
+            fingerprint = _fingerprint(slab_fp, scene_fingerprints[name], settings or {})
+            output = output_path_for(output_dir, product["product_id"], name, preset)
+            previous = rendered.get(product["product_id"], {}).get(name)
+            if not force and previous and previous["fingerprint"] == fingerprint and os.path.exists(output):
+                continue
+            tasks.append({
+                "product_id": product["product_id"],
+                "scene": name,
+                "fingerprint": fingerprint,
+                "inputs": scene_inputs(scene, product["slab_image"], output),
+            })
+    return tasks
+
+
+def prune_catalog(products, scenes, state, output_dir):
+    """Drop renders of products or scenes no longer in the catalog"""
+    active = {product["product_id"] for product in products}
+    removed = []
+    rendered = state.get("renders", {})
+    for product_id in list(rendered):
+        for name in list(rendered[product_id]):
+            if product_id in active and name in scenes:
+                continue
+            output = rendered[product_id].pop(name)["output"]
+            if os.path.exists(output):
+                os.unlink(output)
+            removed.append(output)
+        if not rendered[product_id]:
+            del rendered[product_id]
+    return removed
+
+
+def run_catalog(manifest_path, render, output_dir=DEFAULT_OUTPUT_DIR, state_path=None, scenes_path=None,
+                workers=1, force=False, dry_run=False, prune=False, settings=None, preset=None, resample=AUTO):
+    """
+    Pre-render the catalog, rendering only stale (product, scene) pairs
+
+    Args:
+        render: Picklable callable taking the job inputs, used in worker processes
+        settings: Render settings folded into every fingerprint
+        preset: Encoder preset (default: the host's default preset)
+        resample: Resampling backend; with auto the host's calibration is
+            part of the fingerprint
+
+    Returns:
+        dict: Counts of rendered, skipped, failed and pruned renders
+    """
+    state_path = state_path or os.path.join(output_dir, "catalog_state.json")
+    state = read_json(state_path, default={})
+    if state.get("version") != STATE_VERSION:
+        state = {"version": STATE_VERSION, "renders": {}, "files": {}}
+
+    products = load_manifest(manifest_path)
+    scenes = load_scenes(scenes_path)
+    files = FileFingerprints(state["files"])
+    preset = preset or default_preset()
+    settings = dict(settings or {}, preset=preset, encode=PRESETS[preset], resample=backend_settings(resample))
+    tasks = plan_catalog(products, scenes, state, output_dir, files, settings=settings, force=force, preset=preset)
+    for task in tasks:
+        task["inputs"].update(preset=preset, resample=resample)
+    summary = {"products": len(products), "scenes": len(scenes), "stale": len(tasks),
+               "skipped": len(products) * len(scenes) - len(tasks), "rendered": 0, "failed": 0, "pruned": 0}
+    if dry_run:
+        for task in tasks:
+            print(f"🔄 Would render product {task['product_id']} in scene {task['scene']}")
+        return summary
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    def record(task, result=None, error=None):
+        if error is not None:
+            summary["failed"] += 1
+            print(f"❌ Product {task['product_id']} / {task['scene']}: {error}")
+            return
+        summary["rendered"] += 1
+        renders = state["renders"].setdefault(task["product_id"], {})
+        previous = renders.get(task["scene"])
+        # A preset of another format renders to another extension; don't leave the old file behind
+        if previous and previous["output"] != task["inputs"]["output"] and os.path.exists(previous["output"]):
+            os.unlink(previous["output"])
+        renders[task["scene"]] = {
+            "fingerprint": task["fingerprint"],
+            "output": task["inputs"]["output"],
+            "placeholder": (result or {}).get("placeholder"),
+            "rendered_at": time.time(),
+        }
+
+    try:
+        if workers > 1 and len(tasks) > 1:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(render, task["inputs"]): task for task in tasks}
+                for future in as_completed(futures):
+                    error = future.exception()
+                    record(futures[future], None if error else future.result(), error)
+        else:
+            for task in tasks:
+                try:
+                    result = render(task["inputs"])
+                except Exception as e:
+                    record(task, error=e)
+                else:
+                    record(task, result)
+        if prune:
+            summary["pruned"] = len(prune_catalog(products, scenes, state, output_dir))
+    finally:
+        # Keep the finished renders even if the run is interrupted
+        write_json_atomic(state_path, state)
+    return summary
+
+
+def catalog_command(argv, render):
+    """CLI for ``slab_render.py catalog``"""
+    parser = argparse.ArgumentParser(prog="slab_render.py catalog",
+                                     description="Pre-render every catalog product against the standard scenes")
+    parser.add_argument("manifest", help="Product manifest (JSON or CSV)")
+    parser.add_argument("--scenes", help="Scene definitions JSON (default: bundled kitchen scene)")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Directory for catalog renders")
+    parser.add_argument("--state", help="State file (default: <output-dir>/catalog_state.json)")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Parallel render processes")
+    parser.add_argument("--preset", default=default_preset(), choices=list(PRESETS),
+                        help="Encoder preset (default: %(default)s)")
+    parser.add_argument("--resample", default=AUTO, choices=[AUTO] + available_backends(),
+                        help="Resampling backend (default: calibrated for this host)")
+    parser.add_argument("--force", action="store_true", help="Render everything regardless of state")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the renders that are stale")
+    parser.add_argument("--prune", action="store_true", help="Delete renders of products no longer in the manifest")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    summary = run_catalog(args.manifest, render, output_dir=args.output_dir, state_path=args.state,
+                          scenes_path=args.scenes, workers=args.workers, force=args.force,
+                          dry_run=args.dry_run, prune=args.prune, preset=args.preset, resample=args.resample)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(summary, sort_keys=True))
+    return 1 if summary["failed"] else 0
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Upload Deduplication Index
+Goal: Find exact and near-duplicate images under upload/, and catch re-uploads at ingest
+Tools: Python, NumPy, Pillow
+
+Every image under the upload directory gets a SHA-256 of its bytes (exact
+duplicates) and two 64-bit perceptual hashes of a small grayscale
+thumbnail: dHash (brightness gradients between neighbouring pixels) and
+pHash (signs of the low DCT frequencies). Re-saved, re-compressed or
+resized copies of an image land within a few bits of each other in both.
+Both hashes see only brightness structure, so renders of different slabs
+in the same kitchen hash alike; a 4x4 grid of average colours must also
+agree within a few levels for a near duplicate.
+
+The index file keeps the hashes per upload URL and is updated
+incrementally: only new or changed files (by size and mtime, then
+content) are decoded. Lookups go through a BK-tree over the pHash, which
+only visits subtrees whose Hamming distance can still be within the
+threshold; a near duplicate must also be within the threshold in dHash.
+
+    python slab_render.py dedupe index
+    python slab_render.py dedupe report
+    python slab_render.py dedupe check new_upload.png --add
+"""
+
+import argparse
+import json
+import os
+import time
+
+from render_catalog import FileFingerprints
+from render_io import read_json, write_json_atomic
+from render_probe import probe_image
+
+INDEX_VERSION = 1
+DEFAULT_UPLOAD_DIR = "upload"
+DEFAULT_INDEX_PATH = os.path.join("upload", "dedupe_index.json")
+# Bits (of 64) two hashes may differ by and still count as the same picture
+DEFAULT_THRESHOLD = 10
+# Derived files that are expected to look like their originals
+EXCLUDED_DIRS = ("responsive",)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+# Largest per-channel difference of the average colour grids of near duplicates
+COLOR_TOLERANCE = 12
+COLOR_GRID = 4
+THUMBNAIL_SIZE = 128
+DCT_SIZE = 32
+HASH_SIZE = 8
+
+
+def _dct_matrix(n):
+    import numpy as np
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+def _bits(flags):
+    value = 0
+    for flag in flags.ravel():
+        value = (value << 1) | int(flag)
+    return value
+
+
+def image_hashes(path):
+    """
+    Perceptual hashes of an image
+
+    Returns:
+        tuple: (dhash, phash) as 64-bit ints and the colour grid as bytes
+    """
+    import numpy as np
+    from PIL import Image
+    from render_resample import load_thumbnail, resize
+    color = load_thumbnail(path, THUMBNAIL_SIZE, "RGB")
+    thumbnail = np.asarray(Image.fromarray(color).convert("L"))
+    # Fixed filters (not the host-calibrated "auto") keep hashes comparable across hosts
+    grid = resize(color, (COLOR_GRID, COLOR_GRID), "pil-box")
+    small = resize(thumbnail, (HASH_SIZE + 1, HASH_SIZE), "pil-box").astype(np.int16)
+    dhash = _bits(small[:, 1:] > small[:, :-1])
+    pixels = resize(thumbnail, (DCT_SIZE, DCT_SIZE), "pil-box").astype(np.float64)
+    dct = _dct_matrix(DCT_SIZE)
+    low = (dct @ pixels @ dct.T)[:HASH_SIZE, :HASH_SIZE]
+    phash = _bits(low > np.median(low))
+    return dhash, phash, grid.tobytes()
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def color_distance(a, b):
+    """Largest channel difference between two colour grids (hex)"""
+    return max(abs(x - y) for x, y in zip(bytes.fromhex(a), bytes.fromhex(b)))
+
+
+class BKTree:
+    """Metric tree over 64-bit hashes under Hamming distance"""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, key, item):
+        """Insert item under key; items with the same key share a node"""
+        if self.root is None:
+            self.root = (key, [item], {})
+            return
+        node = self.root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            if distance not in node[2]:
+                node[2][distance] = (key, [item], {})
+                return
+            node = node[2][distance]
+
+    def search(self, key, radius):
+        """(distance, item) of every item within radius of key"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_key, items, children = stack.pop()
+            distance = hamming(key, node_key)
+            if distance <= radius:
+                found.extend((distance, item) for item in items)
+            # Triangle inequality: only children at distance within radius of ours can hold matches
+            stack.extend(child for edge, child in children.items() if abs(edge - distance) <= radius)
+        return found
+
+
+def find_images(upload_dir):
+    """(path, url) of every image under the upload directory"""
+    images = []
+    for directory, dirnames, filenames in os.walk(upload_dir):
+        if directory == upload_dir:
+            dirnames[:] = [name for name in dirnames if name not in EXCLUDED_DIRS]
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(directory, filename)
+                url = "/upload/" + os.path.relpath(path, upload_dir).replace(os.sep, "/")
+                images.append((path, url))
+    return images
+
+
+class DedupeIndex:
+    """Hashes of the upload tree, persisted as JSON"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        data = read_json(path, default={})
+        if data.get("version") != INDEX_VERSION:
+            data = {"version": INDEX_VERSION, "files": {}, "images": {}}
+        self.data = data
+        self.files = FileFingerprints(data["files"])
+        self._tree = None
+
+    @property
+    def images(self):
+        return self.data["images"]
+
+    def entry_for(self, path):
+        """Digest and hashes of a file, reusing the indexed ones when its content is unchanged"""
+        digest = self.files.get(path)
+        for entry in self.images.values():
+            if entry["digest"] == digest:
+                return dict(entry)
+        info = probe_image(path)
+        if info["error"]:
+            raise ValueError(info["error"])
+        dhash, phash, colors = image_hashes(path)
+        return {"digest": digest, "dhash": f"{dhash:016x}", "phash": f"{phash:016x}", "colors": colors.hex(),
+                "width": info["width"], "height": info["height"]}
+
+    def update(self, upload_dir=DEFAULT_UPLOAD_DIR):
+        """
+        Hash new and changed uploads and forget deleted ones
+
+        Returns:
+            dict: Counts of images, added (new or changed), unchanged, removed and failed
+        """
+        found = find_images(upload_dir)
+        summary = {"images": len(found), "added": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        by_digest = {entry["digest"]: entry for entry in self.images.values()}
+        images = {}
+        for path, url in found:
+            try:
+                digest = self.files.get(path)
+                if digest not in by_digest:
+                    # Copies of an indexed image reuse its hashes; only new content is decoded
+                    by_digest[digest] = self.entry_for(path)
+            except (OSError, ValueError) as e:
+                summary["failed"] += 1
+                print(f"❌ {url}: {e}")
+                continue
+            images[url] = dict(by_digest[digest])
+            summary["unchanged" if self.images.get(url, {}).get("digest") == digest else "added"] += 1
+        summary["removed"] = len(set(self.images) - set(images))
+        self.data["images"] = images
+        live = {os.path.abspath(path) for path, _ in found}
+        self.data["files"] = {key: value for key, value in self.data["files"].items() if key in live}
+        self.files.memo = self.data["files"]
+        self._tree = None
+        return summary
+
+    def add(self, url, entry):
+        self.images[url] = entry
+        if self._tree is not None:
+            self._tree.add(int(entry["phash"], 16), url)
+
+    def save(self):
+        self.data["updated_at"] = time.time()
+        write_json_atomic(self.path, self.data)
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = BKTree()
+            for url, entry in self.images.items():
+                self._tree.add(int(entry["phash"], 16), url)
+        return self._tree
+
+    def matches(self, entry, threshold=DEFAULT_THRESHOLD, exclude=None):
+        """
+        Indexed images that duplicate an entry
+
+        Returns:
+            list: Dicts with url, exact, and the pHash and dHash distances, closest first
+        """
+        dhash = int(entry["dhash"], 16)
+        found = []
+        for distance, url in self.tree.search(int(entry["phash"], 16), threshold):
+            other = self.images[url]
+            if url == exclude:
+                continue
+            exact = other["digest"] == entry["digest"]
+            dhash_distance = hamming(dhash, int(other["dhash"], 16))
+            if exact or (dhash_distance <= threshold
+                         and color_distance(entry["colors"], other["colors"]) <= COLOR_TOLERANCE):
+                found.append({"url": url, "exact": exact, "phash_distance": distance,
+                              "dhash_distance": dhash_distance})
+        return sorted(found, key=lambda match: (not match["exact"], match["phash_distance"], match["url"]))
+
+    def groups(self, threshold=DEFAULT_THRESHOLD):
+        """Sets of duplicate uploads (connected by exact or near matches), largest first"""
+        parent = {url: url for url in self.images}
+
+        def root(url):
+            while parent[url] != url:
+                parent[url] = parent[parent[url]]
+                url = parent[url]
+            return url
+
+        for url, entry in self.images.items():
+            for match in self.matches(entry, threshold, exclude=url):
+                parent[root(match["url"])] = root(url)
+        groups = {}
+        for url in self.images:
+            groups.setdefault(root(url), []).append(url)
+        duplicates = [sorted(urls) for urls in groups.values() if len(urls) > 1]
+        return sorted(duplicates, key=lambda urls: (-len(urls), urls[0]))
+
+
+def dedupe_command(argv):
+    """CLI for ``slab_render.py dedupe``"""
+    parser = argparse.ArgumentParser(prog="slab_render.py dedupe",
+                                     description="Perceptual-hash index of uploaded images")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index file (default: %(default)s)")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help="Bits two hashes may differ by for a near duplicate (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_parser = commands.add_parser("index", help="Hash new and changed uploads")
+    index_parser.add_argument("--upload-dir", default=DEFAULT_UPLOAD_DIR)
+    commands.add_parser("report", help="List groups of duplicate uploads")
+    check_parser = commands.add_parser("check", help="Look up images against the index, e.g. at upload time")
+    check_parser.add_argument("images", nargs="+")
+    check_parser.add_argument("--add", action="store_true", help="Also add the images to the index")
+    check_parser.add_argument("--upload-dir", default=DEFAULT_UPLOAD_DIR,
+                              help="Upload directory the added images' URLs are relative to")
+    args = parser.parse_args(argv)
+
+    index = DedupeIndex(args.index)
+    if args.command == "index":
+        summary = index.update(args.upload_dir)
+        index.save()
+        groups = index.groups(args.threshold)
+        summary["duplicate_groups"] = len(groups)
+        summary["duplicates"] = sum(len(urls) - 1 for urls in groups)
+        print(json.dumps(summary, sort_keys=True))
+        return 1 if summary["failed"] else 0
+
+    if args.command == "report":
+        groups = index.groups(args.threshold)
+        if args.json:
+            print(json.dumps(groups))
+        for urls in [] if args.json else groups:
+            print(f"🪞 {len(urls)} copies:")
+            for url in urls:
+                print(f"   {url}")
+        if not groups and not args.json:
+            print("✅ No duplicate uploads")
+        return 0
+
+    duplicates = 0
+    for path in args.images:
+        try:
+            entry = index.entry_for(path)
+        except (OSError, ValueError) as e:
+            print(json.dumps({"path": path, "error": str(e)}) if args.json else f"❌ {path}: {e}")
+            continue
+        matches = index.matches(entry, args.threshold)
+        duplicates += bool(matches)
+        if args.add:
+            index.add("/upload/" + os.path.relpath(path, args.upload_dir).replace(os.sep, "/"), entry)
+        if args.json:
+            print(json.dumps({"path": path, "matches": matches}, sort_keys=True))
+        elif matches:
+            for match in matches:
+                kind = "exact copy" if match["exact"] else f"near duplicate ({match['phash_distance']} bits)"
+                print(f"🪞 {path}: {kind} of {match['url']}")
+        else:
+            print(f"✅ {path}: no duplicates")
+    if args.add:
+        index.save()
+    return 1 if duplicates else 0
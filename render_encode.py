@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Render Encoders
+Goal: Save renders through named presets that trade encode CPU against bytes served
+Tools: Python, Pillow
+
+Presets:
+    gallery    progressive, optimized 4:2:0 JPEG for the public catalog
+    gallery-baseline
+               the gallery's quality as a baseline, non-optimized JPEG:
+               cheaper to encode, a few percent larger
+    thumbnail  small AVIF (WebP when AVIF is unavailable) capped at 480 px
+    print      baseline 4:4:4 JPEG at quality 95 for downloads and print
+    responsive AVIF and WebP size variants of uploaded images (see render_responsive.py)
+
+JPEG presets can also be written in partial mode (see render_splice.py) or
+streamed strip by strip in tiled mode (see render_tiled.py); both keep the
+preset's quality and subsampling but always produce a baseline,
+non-optimized file.
+
+Renders that don't name a preset use default_preset(): the one
+``slab_render.py autotune`` picked for this host, else gallery.
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+
+from render_io import tuned_setting
+from render_resample import AUTO, resize
+from render_splice import SceneJpegCache, splice_encode
+from render_tiled import DEFAULT_STRIP_HEIGHT, StreamingJpegWriter, strip_height_for
+
+DEFAULT_PRESET = "gallery"
+
+PRESETS = {
+    "gallery": {"formats": ["JPEG"], "quality": 85, "progressive": True, "optimize": True,
+                "subsampling": "4:2:0"},
+    "thumbnail": {"formats": ["AVIF", "WEBP"], "quality": 60, "max_size": 480, "subsampling": "4:2:0"},
+    "gallery-baseline": {"formats": ["JPEG"], "quality": 85, "progressive": False, "optimize": False,
+                         "subsampling": "4:2:0"},
+    "print": {"formats": ["JPEG"], "quality": 95, "progressive": False, "optimize": False,
+              "subsampling": "4:4:4"},
+    "responsive": {"formats": ["AVIF", "WEBP"], "quality": 65, "subsampling": "4:2:0"},
+}
+
+# File extensions and the format they promise the server's content type by
+EXTENSION_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".jpe": "JPEG", ".webp": "WEBP", ".avif": "AVIF",
+                     ".png": "PNG", ".gif": "GIF", ".tif": "TIFF", ".tiff": "TIFF", ".bmp": "BMP"}
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp", "AVIF": ".avif"}
+
+def default_preset():
+    """Preset for renders that don't choose one: the host's tuned preset, else DEFAULT_PRESET"""
+    preset = tuned_setting("preset")
+    return preset if preset in PRESETS and full_size_jpeg(preset) else DEFAULT_PRESET
+
+
+def full_size_jpeg(preset):
+    """Whether a preset writes full-size JPEG, as a host's default preset must"""
+    settings = PRESETS[preset]
+    return "JPEG" in settings["formats"] and not settings.get("max_size")
+
+
+def format_available(name):
+    """Whether this Pillow build can write the format"""
+    from PIL import features
+    return name == "JPEG" or bool(features.check(name.lower()))
+
+
+def preset_format(preset):
+    """First format of the preset this host can write"""
+    for name in PRESETS[preset]["formats"]:
+        if format_available(name):
+            return name
+    raise RuntimeError(f"No available format for encoder preset {preset}")
+
+
+def output_format(preset, path=None):
+    """
+    Format a preset writes to path
+
+    A path whose extension names an image format gets that format, which
+    must be one of the preset's; otherwise the preset's first available
+    format is used (temporary files, file objects).
+
+    Raises:
+        ValueError: The preset can't write the format the extension names
+    """
+    extension = os.path.splitext(path)[1].lower() if isinstance(path, str) else ""
+    if extension not in EXTENSION_FORMATS:
+        return preset_format(preset)
+    image_format = EXTENSION_FORMATS[extension]
+    if image_format not in PRESETS[preset]["formats"] or not format_available(image_format):
+        raise ValueError(f"Encoder preset {preset} cannot write {extension} files "
+                         f"(it writes {' or '.join(PRESETS[preset]['formats'])})")
+    return image_format
+
+
+def save_options(preset, image_format):
+    """Pillow save() keyword arguments for a preset"""
+    settings = PRESETS[preset]
+    if image_format == "JPEG":
+        return {"quality": settings["quality"], "progressive": settings.get("progressive", False),
+                "optimize": settings.get("optimize", False), "subsampling": settings["subsampling"]}
+    if image_format == "WEBP":
+        return {"quality": settings["quality"], "method": settings.get("method", 4)}
+    if image_format == "AVIF":
+        return {"quality": settings["quality"], "speed": settings.get("speed", 8),
+                "subsampling": settings["subsampling"]}
+    raise ValueError(f"Unsupported image format: {image_format}")
+
+
+def encode(array, fp, preset=DEFAULT_PRESET, resample=AUTO, name=None):
+    """
+    Encode an HxWx3 uint8 array with a preset
+
+    Args:
+        fp: Output path or binary file object
+        name: File name the output is published under, whose extension
+            picks the format (default: fp); see output_format
+
+    Returns:
+        dict: Preset, format, dimensions, bytes written and encode seconds
+    """
+    from PIL import Image
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown encoder preset: {preset}")
+    image_format = output_format(preset, name or fp)
+    max_size = PRESETS[preset].get("max_size")
+    height, width = array.shape[:2]
+    if max_size and max(width, height) > max_size:
+        ratio = max_size / max(width, height)
+        array = resize(array, (max(1, round(width * ratio)), max(1, round(height * ratio))), resample)
+
+    started = time.perf_counter()
+    image = Image.fromarray(array)
+    image.save(fp, image_format, **save_options(preset, image_format))
+    seconds = time.perf_counter() - started
+
+    size = fp.tell() if hasattr(fp, "tell") else os.path.getsize(fp)
+    return {"preset": preset, "format": image_format, "width": image.width, "height": image.height,
+            "bytes": size, "encode_seconds": round(seconds, 6)}
+
+
+def baseline_jpeg_options(preset, mode):
+    """JPEG save options of a preset that can be written in partial or tiled mode"""
+    settings = PRESETS[preset]
+    if "JPEG" not in settings["formats"] or settings.get("max_size"):
+        raise ValueError(f"Encoder preset {preset} cannot be used for {mode} encoding")
+    return save_options(preset, "JPEG")
+
+
+def encode_partial(scene_path, scene, array, alpha, fp, preset=DEFAULT_PRESET, cache=None):
+    """
+    Encode a scene-based render by splicing re-encoded MCUs into the cached scene
+
+    Args:
+        scene_path: Scene image the cache is keyed on
+        scene: Decoded scene the render was composited onto
+        alpha: Mask of the pixels that differ from the scene
+        fp: Output path or binary file object
+        cache: SceneJpegCache to reuse across renders
+
+    Returns:
+        dict: Encode stats, including how many MCUs were re-encoded
+    """
+    options = baseline_jpeg_options(preset, "partial")
+
+    started = time.perf_counter()
+    data, encoded_mcus, total_mcus = splice_encode(scene_path, scene, array, alpha, options,
+                                                   cache or _scene_cache)
+    seconds = time.perf_counter() - started
+
+    if hasattr(fp, "write"):
+        fp.write(data)
+    else:
+        with open(fp, "wb") as f:
+            f.write(data)
+    return {"preset": preset, "format": "JPEG", "mode": "partial", "width": array.shape[1],
+            "height": array.shape[0], "bytes": len(data), "encode_seconds": round(seconds, 6),
+            "mcus_encoded": encoded_mcus, "mcus_total": total_mcus}
+
+
+def open_stream(fp, size, preset=DEFAULT_PRESET, strip_height=None):
+    """
+    Streaming JPEG writer for a tiled render
+
+    Args:
+        fp: Binary file object the strips are written to
+        size: Full image size (width, height)
+        strip_height: Rows per strip, rounded up to whole MCU rows and capped
+            to fit a restart interval (default: the host's tuned strip
+            height, else DEFAULT_STRIP_HEIGHT)
+
+    Returns:
+        StreamingJpegWriter: Its strip_height is the rounded value strips must use
+    """
+    options = baseline_jpeg_options(preset, "tiled")
+    strip_height = strip_height_for(strip_height or tuned_setting("strip_height", DEFAULT_STRIP_HEIGHT), options,
+                                    size[0])
+    return StreamingJpegWriter(fp, size, options, strip_height)
+
+
+def stream_stats(preset, writer):
+    """Encode stats of a finished streaming write, shaped like encode()'s"""
+    return {"preset": preset, "format": "JPEG", "mode": "tiled", "width": writer.width,
+            "height": writer.height, "bytes": writer.bytes_written,
+            "encode_seconds": round(writer.encode_seconds, 6), "strips": writer.strips_written}
+
+
+_scene_cache = SceneJpegCache()
+
+
+def benchmark_presets(array, presets=None, repeats=3):
+    """Median encode time and size of each preset for one image"""
+    results = []
+    for preset in presets or PRESETS:
+        samples = []
+        for _ in range(repeats):
+            buffer = io.BytesIO()
+            stats = encode(array, buffer, preset)
+            samples.append(stats["encode_seconds"])
+        stats["encode_seconds"] = round(statistics.median(samples), 6)
+        stats["bits_per_pixel"] = round(stats["bytes"] * 8 / (stats["width"] * stats["height"]), 3)
+        results.append(stats)
+    return results
+
+
+def bench_command(argv):
+    """CLI for ``slab_render.py bench-encoders``"""
+    parser = argparse.ArgumentParser(prog="slab_render.py bench-encoders",
+                                     description="Report encode time and bytes for each encoder preset")
+    parser.add_argument("image", help="Rendered image to re-encode with every preset")
+    parser.add_argument("--preset", action="append", choices=list(PRESETS), help="Only benchmark these presets")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed encodes per preset")
+    args = parser.parse_args(argv)
+
+    import numpy as np
+    from PIL import Image
+    array = np.asarray(Image.open(args.image).convert("RGB"))
+    for stats in benchmark_presets(array, args.preset, args.repeats):
+        print(f"🗜️ {stats['preset']:<10} {stats['format']:<5} {stats['width']}x{stats['height']:<5} "
+              f"{stats['encode_seconds'] * 1000:8.1f} ms  {stats['bytes'] / 1024:8.1f} KiB  "
+              f"{stats['bits_per_pixel']:.2f} bpp")
+    return 0
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Slab Texture Extension
+Goal: Fill a scene with a small slab photo at its own resolution instead of upscaling it
+Tools: Python, NumPy
+
+Framing a slab that is small next to the scene scales it up to cover the
+scene SLAB_COVERAGE times over, which costs a full-frame LANCZOS resample
+and smears the grain. Extension repeats the slab instead:
+    tile   - plain copies of the slab made periodic by cross-fading a
+             seam band at each edge into the opposite edge
+    mirror - alternate copies are mirrored, like bookmatched slabs, so
+             every edge continues into itself; the symmetry shows, so it
+             suits a bookmatched look rather than a single slab
+The slab is used at native resolution unless that would take more than
+MAX_REPEATS copies across the scene; then it is scaled up just enough,
+still far less than full framing would. The original copy sits at the
+centre of the scene, where full framing would have put the slab's centre.
+"""
+
+import math
+
+MODES = ("tile", "mirror")
+# Copies of the slab across either axis of the scene before it is scaled up instead
+MAX_REPEATS = 3
+# Width of the cross-faded band between tiles, as a share of the tile
+SEAM_FRACTION = 0.125
+
+
+def extension_scale(slab_size, size):
+    """Scale the slab is used at: 1 (native) unless the scene needs too many copies"""
+    return max(1.0, size[0] / (slab_size[0] * MAX_REPEATS), size[1] / (slab_size[1] * MAX_REPEATS))
+
+
+def seamless_tile(slab):
+    """
+    Make a slab periodic by cross-fading its edge bands
+
+    Each axis loses SEAM_FRACTION of its length: the last band is faded
+    into the first, so the tile's right edge runs on into its left edge and
+    its bottom into its top.
+    """
+    import numpy as np
+    tile = slab
+    for axis in (1, 0):
+        length = tile.shape[axis]
+        seam = int(length * SEAM_FRACTION)
+        if seam < 1:
+            continue
+        ramp_shape = [1] * tile.ndim
+        ramp_shape[axis] = seam
+        ramp = np.linspace(0, 1, seam + 2, dtype=np.float32)[1:-1].reshape(ramp_shape)
+        head = np.take(tile, range(seam), axis=axis).astype(np.float32)
+        tail = np.take(tile, range(length - seam, length), axis=axis).astype(np.float32)
+        band = (tail + (head - tail) * ramp + 0.5).astype(np.uint8)
+        tile = np.concatenate([band, np.take(tile, range(seam, length - seam), axis=axis)], axis=axis)
+    return tile
+
+
+def extend_texture(slab, size, mode="tile"):
+    """
+    Repeat a slab (HxWxC uint8) to cover size (width, height)
+
+    Returns:
+        ndarray: size-shaped uint8 array with the slab's first copy centred
+    """
+    import numpy as np
+    if mode not in MODES:
+        raise ValueError(f"Unknown extension mode {mode!r}; expected one of {', '.join(MODES)}")
+    if mode == "tile":
+        slab = seamless_tile(slab)
+    width, height = size
+    slab_height, slab_width = slab.shape[:2]
+    # Padding repeats as many times as it takes; symmetric reflects including the edge pixels
+    left, top = (width - slab_width) // 2, (height - slab_height) // 2
+    pad_x = (max(0, left), max(0, width - slab_width - left))
+    pad_y = (max(0, top), max(0, height - slab_height - top))
+    texture = np.pad(slab, (pad_y, pad_x) + ((0, 0),) * (slab.ndim - 2),
+                     mode="symmetric" if mode == "mirror" else "wrap")
+    x, y = max(0, -left), max(0, -top)
+    return texture[y:y + height, x:x + width]
+
+
+def extended_frame(slab, size, mode="tile", resample="auto"):
+    """
+    Scene-sized slab texture by extension, for a slab that framing would upscale
+
+    The slab is scaled up first only when it would otherwise repeat more
+    than MAX_REPEATS times across the scene.
+    """
+    from render_resample import resize
+    slab_size = (slab.shape[1], slab.shape[0])
+    scale = extension_scale(slab_size, size)
+    if scale > 1:
+        slab = resize(slab, (math.ceil(slab_size[0] * scale), math.ceil(slab_size[1] * scale)), resample)
+    return extend_texture(slab, size, mode)
@@ -0,0 +1,107 @@
+"""
+Render File Helpers
+Goal: Small file utilities shared by the render tools (atomic JSON, content digests)
+Tools: Python
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import uuid
+
+
+def write_json_atomic(path, data, indent=None):
+    """Write JSON next to its destination and rename it into place"""
+    directory, name = os.path.split(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(data, f, sort_keys=True, indent=indent)
+    os.replace(temp_path, path)
+
+
+def read_json(path, default=None):
+    """Load a JSON file, returning ``default`` if it does not exist"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        if default is None:
+            raise
+        return default
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HOST_PROFILE_PATH = os.environ.get("SLAB_RENDER_PROFILE", os.path.join(BASE_DIR, "render_profile.json"))
+
+
+_host_profiles = {}
+
+
+def load_host_profile(path=None):
+    """
+    Tuning results measured on this host, ``{}`` until something is calibrated
+
+    The parsed profile is cached until the file changes, so hot paths can
+    consult it on every render.
+    """
+    path = path or HOST_PROFILE_PATH
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    cached = _host_profiles.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, read_json(path))
+        _host_profiles[path] = cached
+    return cached[1]
+
+
+def tuned_setting(name, default=None, path=None):
+    """Value ``slab_render.py autotune`` chose for a knob on this host, or default"""
+    return load_host_profile(path).get("autotune", {}).get("settings", {}).get(name, default)
+
+
+def default_workers():
+    """Parallel processes for batch commands: the tuned count, else one per core"""
+    return tuned_setting("workers") or os.cpu_count() or 1
+
+
+@contextlib.contextmanager
+def use_host_profile(path):
+    """
+    Read tuned settings from another host profile until the block exits
+
+    Worker processes started inside the block read it too: forked ones
+    inherit the module path, spawned ones the environment.
+    """
+    global HOST_PROFILE_PATH
+    previous, previous_env = HOST_PROFILE_PATH, os.environ.get("SLAB_RENDER_PROFILE")
+    HOST_PROFILE_PATH = os.environ["SLAB_RENDER_PROFILE"] = path
+    try:
+        yield path
+    finally:
+        HOST_PROFILE_PATH = previous
+        if previous_env is None:
+            os.environ.pop("SLAB_RENDER_PROFILE", None)
+        else:
+            os.environ["SLAB_RENDER_PROFILE"] = previous_env
+
+
+def update_host_profile(section, data, path=None):
+    """Replace one section of the host profile, keeping the others"""
+    path = path or HOST_PROFILE_PATH
+    profile = dict(load_host_profile(path))
+    profile[section] = data
+    write_json_atomic(path, profile, indent=2)
+    return profile
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Render Job Journal
+Goal: Keep a durable record of slab render jobs so interrupted renders can be resumed
+Tools: Python, SQLite
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATES = (QUEUED, RUNNING, DONE, FAILED)
+
+DEFAULT_JOURNAL_PATH = os.environ.get(
+    "SLAB_RENDER_JOURNAL", os.path.join("upload", "render_journal.sqlite3")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    host TEXT,
+    pid INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+
+def _pid_alive(pid):
+    """Return True if a process with this pid exists on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RenderJournal:
+    """
+    SQLite-backed journal of render jobs
+
+    Every job moves through queued -> running -> done/failed. The row keeps
+    the job inputs, so a job interrupted by a restart or OOM kill can be
+    re-run later from the journal alone.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, job_id, inputs):
+        """
+        Record a queued job; enqueuing an existing job id leaves it untouched
+
+        Raises:
+            ValueError: The job id is already journaled with different inputs
+        """
+        existing = self.get(job_id)
+        if existing is not None:
+            if existing["inputs"] != json.loads(json.dumps(inputs)):
+                raise ValueError(f"Render job {job_id} is already journaled with different inputs")
+            return existing
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR IGNORE INTO jobs (job_id, state, inputs, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(inputs, sort_keys=True), now, now),
+        )
+        return self.get(job_id)
+
+    def mark_running(self, job_id):
+        self.conn.execute(
+            "UPDATE jobs SET state = ?, attempts = attempts + 1, host = ?, pid = ?, "
+            "error = NULL, updated_at = ? WHERE job_id = ?",
+            (RUNNING, socket.gethostname(), os.getpid(), time.time(), job_id),
+        )
+
+    def mark_done(self, job_id, result=None):
+        self.conn.execute(
+            "UPDATE jobs SET state = ?, result = ?, error = NULL, updated_at = ? WHERE job_id = ?",
+            (DONE, json.dumps(result or {}, sort_keys=True), time.time(), job_id),
+        )
+
+    def mark_failed(self, job_id, error):
+        self.conn.execute(
+            "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE job_id = ?",
+            (FAILED, str(error), time.time(), job_id),
+        )
+
+    def get(self, job_id):
+        row = self.conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list(self, states=None, limit=None):
+        query = "SELECT * FROM jobs"
+        params = []
+        if states:
+            query += " WHERE state IN (%s)" % ",".join("?" * len(states))
+            params.extend(states)
+        query += " ORDER BY created_at"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [_row_to_job(row) for row in self.conn.execute(query, params)]
+
+    def unfinished(self):
+        """
+        Jobs that were queued, or started by a process that no longer exists
+
+        Jobs still running in a live process on this host are left alone so
+        that resuming never races a healthy render.
+        """
+        hostname = socket.gethostname()
+        jobs = []
+        for job in self.list(states=(QUEUED, RUNNING)):
+            if job["state"] == RUNNING and job["host"] == hostname and _pid_alive(job["pid"]):
+                continue
+            jobs.append(job)
+        return jobs
+
+
+def _row_to_job(row):
+    job = dict(row)
+    job["inputs"] = json.loads(job["inputs"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def job_id_for(inputs):
+    """
+    Default job id: the output file name and a digest of the inputs
+
+    The digest covers the input files' sizes and modification times, so
+    rendering new or changed images to the same output is a new job while
+    re-running an unchanged render finds the finished one.
+    """
+    stats = {}
+    for name in ("kitchen", "slab", "mask"):
+        path = inputs.get(name)
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            stats[name] = [stat.st_size, stat.st_mtime_ns]
+    digest = hashlib.sha256(json.dumps([inputs, stats], sort_keys=True).encode()).hexdigest()
+    return f"{os.path.basename(inputs.get('output', 'render'))}-{digest[:12]}"
+
+
+def run_job(journal, job_id, render, force=False):
+    """
+    Run a journaled job through ``render(inputs) -> dict``
+
+    Outputs are written atomically, so a running job whose output was
+    written after it started finished its render before being interrupted
+    and is marked done without rendering again. Finished jobs are skipped
+    unless ``force`` is set.
+    """
+    job = journal.get(job_id)
+    if job is None:
+        raise KeyError(f"Unknown render job: {job_id}")
+    if job["state"] == DONE and not force:
+        return job
+
+    output_path = job["inputs"].get("output")
+    if (not force and job["state"] == RUNNING and output_path and os.path.exists(output_path)
+            and os.path.getmtime(output_path) >= job["updated_at"]):
+        journal.mark_done(job_id, {"output": output_path, "recovered": True})
+        return journal.get(job_id)
+
+    journal.mark_running(job_id)
+    try:
+        result = render(job["inputs"])
+    except Exception as e:
+        journal.mark_failed(job_id, e)
+    else:
+        journal.mark_done(job_id, result)
+    return journal.get(job_id)
+
+
+def resume_unfinished(journal, render):
+    """Re-run every unfinished job and return the updated job records"""
+    return [run_job(journal, job["job_id"], render) for job in journal.unfinished()]
+
+
+def _format_job(job):
+    updated = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job["updated_at"]))
+    line = f"{job['job_id']:<40} {job['state']:<8} attempts={job['attempts']} updated={updated}"
+    if job["error"]:
+        line += f" error={job['error']}"
+    return line
+
+
+def journal_command(argv, render):
+    """
+    Inspect and replay the journal: ``list``, ``show``, ``resume`` and ``replay``
+
+    ``render`` is the callable used to re-run jobs, taking the journaled inputs.
+    """
+    parser = argparse.ArgumentParser(prog="slab_render.py journal", description="Inspect and replay render jobs")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL_PATH, help="Path to the journal database")
+    parser.add_argument("--json", action="store_true", help="Print job records as JSON lines")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="List journaled jobs")
+    list_parser.add_argument("--state", action="append", choices=STATES, help="Only show jobs in this state")
+    list_parser.add_argument("--limit", type=int, help="Maximum number of jobs to show")
+
+    show_parser = commands.add_parser("show", help="Show one job with its inputs")
+    show_parser.add_argument("job_id")
+
+    commands.add_parser("resume", help="Re-run queued jobs and jobs whose worker died")
+
+    replay_parser = commands.add_parser("replay", help="Re-run specific jobs")
+    replay_parser.add_argument("job_ids", nargs="+")
+    replay_parser.add_argument("--force", action="store_true", help="Re-render even if the job is done")
+
+    args = parser.parse_args(argv)
+    journal = RenderJournal(args.journal)
+
+    def emit(jobs):
+        for job in jobs:
+            print(json.dumps(job, sort_keys=True) if args.json else _format_job(job))
+
+    try:
+        if args.command == "list":
+            emit(journal.list(states=args.state, limit=args.limit))
+        elif args.command == "show":
+            job = journal.get(args.job_id)
+            if job is None:
+                print(f"❌ Error: Unknown render job: {args.job_id}", file=sys.stderr)
+                return 1
+            print(json.dumps(job, indent=None if args.json else 2, sort_keys=True))
+        elif args.command == "resume":
+            jobs = resume_unfinished(journal, render)
+            emit(jobs)
+            return 1 if any(job["state"] == FAILED for job in jobs) else 0
+        elif args.command == "replay":
+            jobs = []
+            for job_id in args.job_ids:
+                try:
+                    jobs.append(run_job(journal, job_id, render, force=args.force))
+                except KeyError as e:
+                    print(f"❌ Error: {e.args[0]}", file=sys.stderr)
+                    return 1
+            emit(jobs)
+            return 1 if any(job["state"] == FAILED for job in jobs) else 0
+    finally:
+        journal.close()
+    return 0
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Render Memory Accounting
+Goal: Know how much memory each render stage takes, and keep large jobs under a memory budget
+Tools: Python (/proc/self/status, /proc/self/clear_refs)
+
+Accounting: while a render runs, each timed stage (decode, resample,
+composite, encode, placeholder) notes the process RSS when it ends and the
+peak RSS reached during it. On Linux the kernel's high-water mark (VmHWM)
+is reset at every stage boundary, so the peak includes allocations that
+were freed again within the stage, numpy's and Pillow's alike. Elsewhere
+the peak falls back to the RSS seen at stage boundaries.
+
+Budget: before anything is decoded, the job's peak footprint is estimated
+from the image headers for a whole-frame render, a whole-frame render
+with the slab decoded at a reduced JPEG scale (draft), and a tiled render.
+The first mode that fits the budget is used; a job that does not fit even
+tiled is refused instead of getting the worker OOM-killed.
+"""
+
+import contextlib
+import os
+import resource
+import threading
+
+# Bytes per pixel held at a whole-frame render's peak, measured on the
+# bundled scene and a 12000x9000 slab: the decoded kitchen, framed slab and
+# mask, the composite arena's uint16 planes and the encoder's copy
+FRAME_BYTES_PER_PIXEL = 30
+# Decoding a slab to an array peaks at Pillow's 4-byte image, the packed
+# bytes it exports and the 3-byte array
+SLAB_BYTES_PER_PIXEL = 10
+# Tiled renders hold the kitchen and slab as Pillow images (4 bytes a pixel) and the mask
+TILED_BYTES_PER_PIXEL = 5
+DRAFT_SCALES = (1, 2, 4, 8)
+MODES = ("full", "draft", "tiled")
+
+_local = threading.local()
+
+
+def rss_bytes():
+    """Current resident set size, from /proc or the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def peak_rss_bytes():
+    """Peak RSS since the last reset_peak_rss(), or None without /proc"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """Reset the kernel's RSS high-water mark; False where that is not supported"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class MemoryAccount:
+    """RSS and peak RSS per stage of one render"""
+
+    def __init__(self):
+        self.exact_peaks = reset_peak_rss()
+        self.start_bytes = rss_bytes()
+        self.stages = {}
+
+    def note_stage(self, stage):
+        """Record the stage that just ended and start measuring the next one"""
+        rss = rss_bytes()
+        peak = peak_rss_bytes() if self.exact_peaks else None
+        entry = self.stages.setdefault(stage, {"rss_bytes": 0, "peak_bytes": 0})
+        entry["rss_bytes"] = rss
+        entry["peak_bytes"] = max(entry["peak_bytes"], peak or rss)
+        if self.exact_peaks:
+            reset_peak_rss()
+
+    def summary(self):
+        """Peak and per-stage figures for the render result"""
+        peak = max([entry["peak_bytes"] for entry in self.stages.values()] + [self.start_bytes])
+        return {"start_bytes": self.start_bytes, "peak_bytes": peak, "added_bytes": peak - self.start_bytes,
+                "exact_peaks": self.exact_peaks, "stages": self.stages}
+
+
+@contextlib.contextmanager
+def account_memory():
+    """Account the stages run in the block on this thread; yields the MemoryAccount"""
+    previous = getattr(_local, "account", None)
+    _local.account = MemoryAccount()
+    try:
+        yield _local.account
+    finally:
+        _local.account = previous
+
+
+def note_stage(stage):
+    """Called as a timed stage ends; a no-op outside account_memory()"""
+    account = getattr(_local, "account", None)
+    if account is not None:
+        account.note_stage(stage)
+
+
+def draft_scale(slab_size, needed_size):
+    """Largest JPEG draft reduction (1, 2, 4 or 8) that still covers needed_size"""
+    scale = 1
+    for candidate in DRAFT_SCALES[1:]:
+        if slab_size[0] // candidate < needed_size[0] or slab_size[1] // candidate < needed_size[1]:
+            break
+        scale = candidate
+    return scale
+
+
+def estimate_footprint(size, slab_size, mask_size, slab_draft_scale=1, strip_height=None):
+    """
+    Estimated peak bytes of a render in each mode
+
+    Args:
+        size: Scene (kitchen) size
+        slab_size, mask_size: Source image sizes
+        slab_draft_scale: Reduction the slab can be decoded at (1 when it is not a JPEG)
+        strip_height: Rows per strip in tiled mode
+
+    Returns:
+        dict: Bytes for "full", "draft" (None if the slab can't be drafted) and "tiled"
+    """
+    from render_io import tuned_setting
+    from render_tiled import DEFAULT_STRIP_HEIGHT
+    width, height = size
+    frame = width * height * FRAME_BYTES_PER_PIXEL + mask_size[0] * mask_size[1]
+    slab_pixels = slab_size[0] * slab_size[1]
+    drafted_pixels = slab_pixels // (slab_draft_scale * slab_draft_scale)
+    strip_height = strip_height or tuned_setting("strip_height", DEFAULT_STRIP_HEIGHT)
+    strip = width * min(height, strip_height) * FRAME_BYTES_PER_PIXEL
+    return {
+        "full": frame + slab_pixels * SLAB_BYTES_PER_PIXEL,
+        "draft": frame + drafted_pixels * SLAB_BYTES_PER_PIXEL if slab_draft_scale > 1 else None,
+        "tiled": (width * height + drafted_pixels) * TILED_BYTES_PER_PIXEL + mask_size[0] * mask_size[1] + strip,
+    }
+
+
+def plan_render(size, slab_size, mask_size, slab_decode_size, slab_format, budget_bytes, strip_height=None):
+    """
+    Pick the render mode that keeps the job under budget_bytes
+
+    Args:
+        size, slab_size, mask_size: Image sizes from the headers
+        slab_decode_size: Smallest slab size the scene needs, the draft target
+        slab_format: Pillow format of the slab; only JPEGs can be drafted
+
+    Returns:
+        dict: mode ("full", "draft" or "tiled"), draft_scale, the estimates and the budget
+
+    Raises:
+        ValueError: If even a tiled render is estimated over budget
+    """
+    scale = draft_scale(slab_size, slab_decode_size) if slab_format == "JPEG" else 1
+    estimates = estimate_footprint(size, slab_size, mask_size, scale, strip_height)
+    plan = {"budget_bytes": budget_bytes, "draft_scale": scale, "estimates": estimates}
+    for mode in MODES:
+        if estimates[mode] is not None and estimates[mode] <= budget_bytes:
+            return dict(plan, mode=mode)
+    raise ValueError(f"Render needs about {estimates['tiled'] / 2**20:.0f} MiB even tiled, "
+                     f"over the {budget_bytes / 2**20:.0f} MiB memory budget")
+
+
+_default_budget = os.environ.get("SLAB_RENDER_MEMORY_BUDGET_MB")
+
+
+def set_default_budget(budget_mb):
+    """Memory budget for renders that don't set their own (None for no budget)"""
+    global _default_budget
+    _default_budget = budget_mb
+
+
+def default_budget_bytes():
+    """Process-wide memory budget, from set_default_budget or SLAB_RENDER_MEMORY_BUDGET_MB"""
+    return int(float(_default_budget) * 2**20) if _default_budget else None
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Render Metrics
+Goal: Counters and histograms for the Python render path, exposed in Prometheus text format
+Tools: Python (http.server)
+
+Metrics live in a process-wide registry that renders update as they run.
+A worker exposes them either on a local HTTP port (GET /metrics) or by
+rewriting a textfile for node_exporter's textfile collector, so render
+performance sits on the same dashboards as the API.
+
+Exported:
+    slab_render_renders_total{mode,status}      finished renders
+    slab_render_render_seconds{mode}            render latency histogram
+    slab_render_stage_seconds{stage}            decode/resample/composite/encode/placeholder latency
+    slab_render_output_bytes_total{format}      encoded bytes written
+    slab_render_cache_requests_total{cache,result}
+                                                scene JPEG cache and buffer arena hits/misses
+    slab_render_peak_memory_bytes{mode}         peak RSS while rendering
+    slab_render_spool_jobs{state}               spool queue depth (workers only)
+    process_resident_memory_bytes               worker RSS
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+from render_memory import note_stage, rss_bytes
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_TEXTFILE_INTERVAL = 15.0
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+               for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric with a fixed set of label names"""
+
+    kind = "untyped"
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        for key, (counts, total) in self.values.items():
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", dict(labels, le=_format_value(bound)), count
+            yield f"{self.name}_count", labels, counts[-1]
+            yield f"{self.name}_sum", labels, total
+
+
+class Registry:
+    """
+    Metrics of this process
+
+    Collectors are callables run at exposition time that return
+    ``(name, documentation, kind, [(labels, value), ...])`` tuples, for
+    values read from elsewhere (cache counters, RSS, queue depth). A
+    collector of counters passes a ``reset`` callable zeroing them at
+    their source, which reset() calls.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+        self.collectors = []
+        self.resets = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector, reset=None):
+        self.collectors.append(collector)
+        if reset is not None:
+            self.resets.append(reset)
+
+    def reset(self):
+        """Clear every metric's values and collected counters; only safe before the metrics are first exposed"""
+        with self.lock:
+            for metric in self.metrics:
+                metric.values.clear()
+            for reset in self.resets:
+                reset()
+
+    def exposition(self):
+        """All metrics in Prometheus text exposition format (0.0.4)"""
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}"
+                             for name, labels, value in metric.samples())
+        for collector in self.collectors:
+            for name, documentation, kind, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+RENDERS = REGISTRY.counter("slab_render_renders_total", "Finished renders by mode and status", ["mode", "status"])
+RENDER_SECONDS = REGISTRY.histogram("slab_render_render_seconds", "Render latency in seconds", ["mode"])
+STAGE_SECONDS = REGISTRY.histogram("slab_render_stage_seconds", "Render stage latency in seconds", ["stage"])
+OUTPUT_BYTES = REGISTRY.counter("slab_render_output_bytes_total", "Encoded bytes written by format", ["format"])
+PEAK_MEMORY = REGISTRY.histogram("slab_render_peak_memory_bytes", "Peak RSS while rendering", ["mode"],
+                                 buckets=[2**20 * mib for mib in (64, 128, 256, 512, 1024, 2048, 4096, 8192)])
+
+
+@contextlib.contextmanager
+def time_stage(stage):
+    """Observe the duration of a render stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        note_stage(stage)
+
+
+def _encodes(result):
+    """Encode stats of every file a render result wrote"""
+    if result.get("encode"):
+        yield result["encode"]
+    for variant in result.get("variants", []):
+        if variant.get("encode"):
+            yield variant["encode"]
+    if result.get("grid"):
+        yield result["grid"]["encode"]
+
+
+@contextlib.contextmanager
+def observe_render(mode):
+    """
+    Count a render and its latency and output bytes
+
+    Yields a dict; store the render result under "result".
+    """
+    observation = {}
+    started = time.perf_counter()
+    try:
+        yield observation
+    except Exception:
+        RENDERS.inc(mode=mode, status="error")
+        raise
+    finally:
+        RENDER_SECONDS.observe(time.perf_counter() - started, mode=mode)
+    RENDERS.inc(mode=mode, status="ok")
+    result = observation.get("result") or {}
+    for encoded in _encodes(result):
+        OUTPUT_BYTES.inc(encoded["bytes"], format=encoded["format"])
+    if result.get("memory"):
+        PEAK_MEMORY.observe(result["memory"]["peak_bytes"], mode=mode)
+
+
+def _process_samples():
+    yield ("process_resident_memory_bytes", "Resident memory size in bytes", "gauge",
+           [({}, rss_bytes())])
+
+
+def _cache_samples():
+    samples = []
+    import sys
+    # Only report caches the process has loaded; don't import them just to say zero
+    if "render_encode" in sys.modules:
+        cache = sys.modules["render_encode"]._scene_cache
+        samples += [({"cache": "scene_jpeg", "result": "hit"}, cache.hits),
+                    ({"cache": "scene_jpeg", "result": "miss"}, cache.misses)]
+    if "render_arena" in sys.modules:
+        stats = sys.modules["render_arena"].arena_stats()
+        samples += [({"cache": "buffer_arena", "result": "hit"}, stats["allocations_avoided"]),
+                    ({"cache": "buffer_arena", "result": "miss"}, stats["allocations"])]
+    yield "slab_render_cache_requests_total", "Render cache lookups by cache and result", "counter", samples
+
+
+def _reset_caches():
+    import sys
+    if "render_encode" in sys.modules:
+        sys.modules["render_encode"]._scene_cache.reset_counters()
+    if "render_arena" in sys.modules:
+        sys.modules["render_arena"].reset_arena_stats()
+
+
+REGISTRY.add_collector(_process_samples)
+REGISTRY.add_collector(_cache_samples, reset=_reset_caches)
+
+
+def spool_collector(spool):
+    """Collector reporting a spool directory's job counts as queue depth"""
+    def collect():
+        yield ("slab_render_spool_jobs", "Jobs in the render spool by state", "gauge",
+               [({"state": state}, count) for state, count in sorted(spool.counts().items())])
+    return collect
+
+
+def serve(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve GET /metrics on a daemon thread; returns the server"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.exposition().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_textfile(path, registry=REGISTRY):
+    """Write the exposition atomically for node_exporter's textfile collector"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(registry.exposition())
+    os.replace(temp_path, path)
+
+
+def start_textfile_writer(path, interval=DEFAULT_TEXTFILE_INTERVAL, registry=REGISTRY):
+    """
+    Rewrite the textfile every interval seconds on a daemon thread
+
+    Returns:
+        callable: Stops the writer after a final write
+    """
+    stopping = threading.Event()
+
+    def run():
+        while not stopping.wait(interval):
+            write_textfile(path, registry)
+
+    write_textfile(path, registry)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+
+    def stop():
+        stopping.set()
+        thread.join()
+        write_textfile(path, registry)
+    return stop
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Slab Colour Palettes
+Goal: Give every catalog slab a small dominant-colour palette the inventory can filter on
+Tools: Python, NumPy, Pillow
+
+Each product's slab photo is thumbnailed, a fixed random sample of its
+pixels is converted to CIE Lab and clustered with k-means (k-means++
+seeding, Lloyd iterations as whole-array NumPy operations). Clusters
+closer than a just-noticeable difference are merged, so a plain white
+stone gets one or two colours rather than five shades of white. Each
+palette colour is named with a colour family (white, gray, black, beige,
+brown, gold, red, green, blue, purple) from its Lab lightness, chroma and
+hue.
+
+Palettes are cached by the slab's content hash, so products sharing a
+photo are clustered once and a run only clusters new or changed images.
+The colour table maps each product to its palette and families, and each
+family to the products where it covers at least MIN_FAMILY_WEIGHT of the
+slab, so a colour facet is a dictionary lookup:
+
+    {"products": {"1042": {"colors": [{"hex": "#e8e4dc", "weight": 0.61,
+                                       "family": "white", "lab": [...]}, ...],
+                           "families": ["white", "gray"]}},
+     "families": {"white": ["1042", ...], ...}}
+
+    python slab_render.py palette index products.json
+    python slab_render.py palette filter white
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from render_catalog import FileFingerprints, load_manifest
+from render_io import default_workers, read_json, write_json_atomic
+
+TABLE_VERSION = 1
+DEFAULT_TABLE_PATH = os.path.join("upload", "catalog", "colors.json")
+DEFAULT_COLORS = 5
+THUMBNAIL_SIZE = 256
+SAMPLE_PIXELS = 4096
+ITERATIONS = 20
+# Clusters closer than this (CIE76 delta E) are the same colour to a customer
+MERGE_DELTA_E = 8.0
+# Share of a slab a family needs to make the slab show up under it
+MIN_FAMILY_WEIGHT = 0.15
+# Below this chroma a colour is white, gray or black
+NEUTRAL_CHROMA = 10.0
+FAMILIES = ("white", "gray", "black", "beige", "brown", "gold", "red", "green", "blue", "purple")
+
+
+def color_family(lab):
+    """Colour family of a Lab colour"""
+    import math
+    lightness, a, b = (float(value) for value in lab)
+    chroma = math.hypot(a, b)
+    if chroma < NEUTRAL_CHROMA:
+        return "white" if lightness >= 80 else "black" if lightness < 25 else "gray"
+    hue = math.degrees(math.atan2(b, a)) % 360
+    if hue < 35 or hue >= 340:
+        return "red" if chroma >= 30 else "brown"
+    if hue < 105:
+        if lightness >= 70 and chroma < 30:
+            return "beige"
+        return "gold" if chroma >= 35 and hue >= 60 else "brown"
+    if hue < 200:
+        return "green"
+    if hue < 290:
+        return "blue"
+    return "purple"
+
+
+def kmeans(points, k, rng, iterations=ITERATIONS):
+    """
+    Cluster points (n x d float32) into at most k clusters
+
+    Returns:
+        tuple: (centers k' x d, labels n) with k' <= k, no empty clusters
+    """
+    import numpy as np
+    # k-means++: each new center is drawn in proportion to its squared distance to the nearest chosen one
+    centers = [points[rng.integers(len(points))]]
+    nearest = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = nearest.sum()
+        if total <= 0:
+            break
+        centers.append(points[rng.choice(len(points), p=nearest / total)])
+        nearest = np.minimum(nearest, ((points - centers[-1]) ** 2).sum(axis=1))
+    centers = np.array(centers, dtype=np.float32)
+
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centers))
+        sums = np.stack([np.bincount(labels, weights=points[:, axis], minlength=len(centers))
+                         for axis in range(points.shape[1])], axis=1)
+        used = counts > 0
+        updated = (sums[used] / counts[used, None]).astype(np.float32)
+        if used.all() and np.abs(updated - centers).max() < 0.05:
+            break
+        centers = updated
+    labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    return centers, labels
+
+
+def dominant_colors(rgb, colors=DEFAULT_COLORS, samples=SAMPLE_PIXELS, seed=0):
+    """
+    Dominant colours of an image
+
+    Args:
+        rgb: HxWx3 uint8 array, ideally a thumbnail
+        colors: Most colours to return
+        samples: Pixels clustered; a fixed seed keeps palettes reproducible
+
+    Returns:
+        list: Dicts with hex, lab, weight (share of the pixels) and family, heaviest first
+    """
+    import numpy as np
+    from render_similar import rgb_to_lab
+    pixels = rgb.reshape(-1, 3)
+    rng = np.random.default_rng(seed)
+    if len(pixels) > samples:
+        pixels = pixels[rng.choice(len(pixels), samples, replace=False)]
+    lab = rgb_to_lab(pixels)
+    _, labels = kmeans(lab, colors, rng)
+
+    # Merge the closest pair until every pair is a visible difference apart
+    while True:
+        present = np.unique(labels)
+        if len(present) < 2:
+            break
+        means = np.array([lab[labels == index].mean(axis=0) for index in present])
+        gaps = np.sqrt(((means[:, None, :] - means[None, :, :]) ** 2).sum(axis=2))
+        np.fill_diagonal(gaps, np.inf)
+        first, second = np.unravel_index(gaps.argmin(), gaps.shape)
+        if gaps[first, second] >= MERGE_DELTA_E:
+            break
+        labels[labels == present[second]] = present[first]
+
+    palette = []
+    for index in np.unique(labels):
+        members = labels == index
+        center = lab[members].mean(axis=0)
+        red, green, blue = (int(round(value)) for value in pixels[members].mean(axis=0))
+        palette.append({"hex": f"#{red:02x}{green:02x}{blue:02x}", "lab": [round(float(v), 1) for v in center],
+                        "weight": round(float(members.mean()), 3), "family": color_family(center)})
+    return sorted(palette, key=lambda color: -color["weight"])
+
+
+def image_palette(path, colors=DEFAULT_COLORS):
+    """Dominant colours of an image file, from its upright thumbnail"""
+    from render_resample import load_thumbnail
+    return dominant_colors(load_thumbnail(path, THUMBNAIL_SIZE, "RGB"), colors)
+
+
+def palette_families(palette, min_weight=MIN_FAMILY_WEIGHT):
+    """Families covering at least min_weight of the slab, most covered first"""
+    weights = {}
+    for color in palette:
+        weights[color["family"]] = weights.get(color["family"], 0) + color["weight"]
+    return [family for family, weight in sorted(weights.items(), key=lambda item: -item[1]) if weight >= min_weight]
+
+
+def run_palettes(manifest_path, table_path=DEFAULT_TABLE_PATH, colors=DEFAULT_COLORS, workers=1, force=False):
+    """
+    Extract the palettes of new and changed slabs and rewrite the colour table
+
+    Returns:
+        dict: Counts of products, clustered images, cached (reused) products and failed products
+    """
+    settings = hashlib.sha256(json.dumps({"colors": colors, "samples": SAMPLE_PIXELS, "size": THUMBNAIL_SIZE,
+                                          "merge": MERGE_DELTA_E}, sort_keys=True).encode()).hexdigest()
+    table = read_json(table_path, default={})
+    if table.get("version") != TABLE_VERSION or table.get("settings") != settings or force:
+        table = {"version": TABLE_VERSION, "settings": settings, "palettes": {}, "files": table.get("files", {})}
+    files = FileFingerprints(table["files"])
+    products = load_manifest(manifest_path)
+    summary = {"products": len(products), "clustered": 0, "cached": 0, "failed": 0}
+
+    digests = {}
+    pending = {}
+    for product in products:
+        try:
+            digest = files.get(product["slab_image"])
+        except OSError as e:
+            summary["failed"] += 1
+            print(f"❌ Product {product['product_id']}: {e}")
+            continue
+        digests[product["product_id"]] = digest
+        if digest not in table["palettes"]:
+            pending.setdefault(digest, product["slab_image"])
+
+    errors = {}
+    try:
+        if workers > 1 and len(pending) > 1:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(image_palette, path, colors): digest for digest, path in pending.items()}
+                for future in as_completed(futures):
+                    error = future.exception()
+                    if error is None:
+                        table["palettes"][futures[future]] = future.result()
+                    else:
+                        errors[futures[future]] = error
+        else:
+            for digest, path in pending.items():
+                try:
+                    table["palettes"][digest] = image_palette(path, colors)
+                except Exception as e:
+                    errors[digest] = e
+        summary["clustered"] = len(pending) - len(errors)
+
+        entries = {}
+        families = {family: [] for family in FAMILIES}
+        for product_id, digest in digests.items():
+            if digest in errors:
+                summary["failed"] += 1
+                print(f"❌ Product {product_id}: {errors[digest]}")
+                continue
+            if digest not in pending:
+                summary["cached"] += 1
+            palette = table["palettes"][digest]
+            entries[product_id] = {"digest": digest, "colors": palette, "families": palette_families(palette)}
+            for family in entries[product_id]["families"]:
+                families[family].append(product_id)
+        table["products"] = entries
+        table["families"] = families
+        # Drop palettes and fingerprints no product uses any more
+        live = set(digests.values())
+        table["palettes"] = {digest: palette for digest, palette in table["palettes"].items() if digest in live}
+        paths = {os.path.abspath(product["slab_image"]) for product in products}
+        table["files"] = {key: value for key, value in files.memo.items() if key in paths}
+    finally:
+        # Keep finished palettes even if the run is interrupted
+        table["generated_at"] = time.time()
+        write_json_atomic(table_path, table)
+    return summary
+
+
+def palette_command(argv):
+    """CLI for ``slab_render.py palette``"""
+    parser = argparse.ArgumentParser(prog="slab_render.py palette",
+                                     description="Dominant-colour table of catalog slabs for colour filtering")
+    parser.add_argument("--table", default=DEFAULT_TABLE_PATH, help="Colour table (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_parser = commands.add_parser("index", help="Extract palettes of new and changed slabs")
+    index_parser.add_argument("manifest", help="Product manifest (JSON or CSV, as for catalog)")
+    index_parser.add_argument("--colors", type=int, default=DEFAULT_COLORS,
+                              help="Most colours per slab (default: %(default)s)")
+    index_parser.add_argument("--workers", type=int, default=default_workers(), help="Parallel processes")
+    index_parser.add_argument("--force", action="store_true", help="Re-cluster every slab")
+    filter_parser = commands.add_parser("filter", help="List the products showing colour families")
+    filter_parser.add_argument("families", nargs="+", choices=FAMILIES)
+    args = parser.parse_args(argv)
+
+    if args.command == "index":
+        started = time.perf_counter()
+        summary = run_palettes(args.manifest, args.table, colors=args.colors, workers=args.workers,
+                               force=args.force)
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        print(json.dumps(summary, sort_keys=True))
+        return 1 if summary["failed"] else 0
+
+    table = read_json(args.table)
+    matches = set.intersection(*(set(table["families"][family]) for family in args.families))
+    for product_id in sorted(matches):
+        colors = " ".join(f"{color['hex']}:{color['weight']:.0%}" for color in table["products"][product_id]["colors"])
+        print(f"🎨 {product_id}  {colors}")
+    if not matches:
+        print(f"🎨 No products in {' + '.join(args.families)}")
+    return 0
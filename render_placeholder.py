@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Render Placeholders
+Goal: Tiny stand-ins for a render (inline JPEG and blurhash) that pages can paint before the image loads
+Tools: Python, NumPy, Pillow
+
+Both placeholders are computed from the composited array the render pass
+already holds, so they cost one small downscale and no extra decode.
+"""
+
+import base64
+import io
+
+from render_resample import resize
+
+LQIP_MAX_SIZE = 16
+LQIP_QUALITY = 30
+BLURHASH_COMPONENTS = (4, 3)
+# Blurhash factors are accurate enough from a small proxy of the image
+BLURHASH_PROXY_SIZE = 32
+
+BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _fit(size, max_size):
+    width, height = size
+    ratio = min(1.0, max_size / max(width, height))
+    return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+
+def _base83(value, length):
+    return "".join(BASE83[(value // 83 ** (length - 1 - i)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(array):
+    import numpy as np
+    v = array.astype(np.float64) / 255.0
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value):
+    v = min(1.0, max(0.0, value))
+    srgb = v * 12.92 if v <= 0.0031308 else 1.055 * v ** (1 / 2.4) - 0.055
+    return int(srgb * 255 + 0.5)
+
+
+def blurhash(array, components=BLURHASH_COMPONENTS):
+    """
+    Blurhash string of an HxWx3 uint8 array
+
+    Follows the reference encoder; the DCT factors are computed for all
+    components at once with matrix products.
+    """
+    import numpy as np
+    components_x, components_y = components
+    height, width = array.shape[:2]
+    if max(width, height) > BLURHASH_PROXY_SIZE:
+        array = resize(array, _fit((width, height), BLURHASH_PROXY_SIZE), "pil-box")
+        height, width = array.shape[:2]
+
+    linear = _srgb_to_linear(array)
+    basis_x = np.cos(np.pi * np.outer(np.arange(components_x), np.arange(width)) / width)
+    basis_y = np.cos(np.pi * np.outer(np.arange(components_y), np.arange(height)) / height)
+    factors = np.einsum("jy,ix,yxc->jic", basis_y, basis_x, linear) / (width * height)
+    factors *= 2
+    factors[0, 0] /= 2
+    factors = factors.reshape(-1, 3)
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((components_x - 1) + (components_y - 1) * 9, 1)
+    if len(ac):
+        quantized_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        maximum = (quantized_max + 1) / 166
+        result += _base83(quantized_max, 1)
+    else:
+        maximum = 1
+        result += _base83(0, 1)
+
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    scaled = np.sign(ac / maximum) * np.abs(ac / maximum) ** 0.5
+    quantized = np.clip(np.floor(scaled * 9 + 9.5), 0, 18).astype(int)
+    for r, g, b in quantized:
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def lqip_data_uri(array, max_size=LQIP_MAX_SIZE, quality=LQIP_QUALITY):
+    """A few-hundred-byte JPEG of the image as a data: URI"""
+    from PIL import Image
+    height, width = array.shape[:2]
+    small = resize(array, _fit((width, height), max_size), "pil-box")
+    buffer = io.BytesIO()
+    Image.fromarray(small).save(buffer, "JPEG", quality=quality, optimize=True)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def placeholder(array):
+    """Placeholder entry for the render result manifest"""
+    height, width = array.shape[:2]
+    return {"width": width, "height": height, "lqip": lqip_data_uri(array), "blurhash": blurhash(array)}
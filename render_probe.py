@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Image Header Probe
+Goal: Check and route uploaded images from their headers, before anything is decoded
+Tools: Python (struct), Pillow for other formats
+
+The probe reads the few bytes of a JPEG, PNG, WebP or GIF header that give
+its format, dimensions, color mode and (JPEG EXIF) orientation, plus the
+tail of JPEGs and PNGs to catch truncated uploads: the end marker must be
+there, though metadata may follow it. It does not import Pillow for these,
+so a batch of files is checked in milliseconds; other formats (TIFF, BMP,
+AVIF, ...) are identified by opening them lazily with Pillow, which reads
+only their headers. Images Pillow can't read, truncated images and images
+larger than the pixel limit are rejected with a reason; the rest are
+routed to the full, draft or tiled render path by the memory budget (see
+render_memory.py).
+
+    python slab_render.py probe upload/*.jpg --memory-budget-mb 512
+"""
+
+import argparse
+import json
+import os
+import struct
+
+from render_memory import default_budget_bytes
+
+# Bigger than any slab photo we sell; past this an upload is a mistake or a decompression bomb
+DEFAULT_MAX_PIXELS = 400_000_000
+# Bytes per pixel of the decoded Pillow image for each mode
+PIXEL_BYTES = {"1": 1, "L": 1, "P": 1, "I;16": 2, "I;16L": 2, "I;16B": 2, "LA": 4, "RGB": 4, "RGBA": 4,
+               "CMYK": 4, "I": 4, "F": 4}
+# Bytes at the end of a JPEG or PNG searched for its end marker; camera and
+# phone metadata is often appended after it
+TAIL_BYTES = 1 << 20
+JPEG_EOI = b"\xff\xd9"
+PNG_IEND = b"IEND\xaeB`\x82"
+JPEG_COMPONENT_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+PNG_COLOR_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+# SOFn markers; C4 (DHT), C8 (JPG) and CC (DAC) share the range but are not frames
+JPEG_FRAME_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class ProbeError(ValueError):
+    """The header is missing, unsupported or inconsistent"""
+
+
+def _exif_orientation(data):
+    """Orientation tag (1-8) from an APP1 Exif payload, or None"""
+    if not data.startswith(b"Exif\0\0") or len(data) < 14:
+        return None
+    tiff = data[6:]
+    endian = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if endian is None:
+        return None
+    try:
+        (ifd,) = struct.unpack_from(endian + "I", tiff, 4)
+        (count,) = struct.unpack_from(endian + "H", tiff, ifd)
+        for index in range(count):
+            tag, kind, _, value = struct.unpack_from(endian + "HHI4s", tiff, ifd + 2 + index * 12)
+            if tag == 0x0112 and kind == 3:
+                return struct.unpack_from(endian + "H", value)[0]
+    except struct.error:
+        pass
+    return None
+
+
+def _probe_jpeg(f):
+    info = {"format": "JPEG", "orientation": None}
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if byte != b"\xff":
+            raise ProbeError("JPEG marker expected" if byte else "JPEG ends before its frame header")
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            raise ProbeError("JPEG ends before its frame header")
+        code = marker[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        header = f.read(2)
+        if len(header) < 2:
+            raise ProbeError("JPEG ends before its frame header")
+        (length,) = struct.unpack(">H", header)
+        if code in JPEG_FRAME_MARKERS:
+            frame = f.read(6)
+            if len(frame) < 6:
+                raise ProbeError("JPEG frame header is truncated")
+            _, height, width, components = struct.unpack(">BHHB", frame)
+            if components not in JPEG_COMPONENT_MODES:
+                raise ProbeError(f"JPEG has {components} color components")
+            info.update(width=width, height=height, mode=JPEG_COMPONENT_MODES[components],
+                        progressive=code in (0xC2, 0xC6, 0xCA, 0xCE))
+            break
+        if code == 0xDA:
+            raise ProbeError("JPEG scan starts before its frame header")
+        if code == 0xE1 and info["orientation"] is None:
+            info["orientation"] = _exif_orientation(f.read(length - 2))
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+    # Scan data escapes 0xFF bytes, so an EOI after the frame header ends the image
+    info["truncated"] = not _tail_contains(f, JPEG_EOI)
+    return info
+
+
+def _tail_contains(f, marker):
+    """Whether marker occurs in the last TAIL_BYTES of f, after its current position"""
+    size = os.fstat(f.fileno()).st_size
+    f.seek(max(f.tell(), size - TAIL_BYTES))
+    return marker in f.read()
+
+
+def _probe_png(f, head):
+    if head[12:16] != b"IHDR":
+        raise ProbeError("PNG does not start with IHDR")
+    width, height, depth, color = struct.unpack(">IIBB", head[16:26])
+    if color not in PNG_COLOR_MODES:
+        raise ProbeError(f"PNG has unknown color type {color}")
+    mode = PNG_COLOR_MODES[color]
+    if mode == "L" and depth == 16:
+        mode = "I;16"
+    elif mode == "L" and depth == 1:
+        mode = "1"
+    return {"format": "PNG", "width": width, "height": height, "mode": mode, "orientation": None,
+            "truncated": not _tail_contains(f, PNG_IEND)}
+
+
+def _probe_webp(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        if head[23:26] != b"\x9d\x01\x2a":
+            raise ProbeError("WebP VP8 frame has no start code")
+        width, height = struct.unpack("<HH", head[26:30])
+        width, height, alpha = width & 0x3FFF, height & 0x3FFF, False
+    elif chunk == b"VP8L":
+        if head[20] != 0x2F:
+            raise ProbeError("WebP VP8L frame has no signature")
+        (bits,) = struct.unpack("<I", head[21:25])
+        width, height, alpha = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, bool(bits >> 28 & 1)
+    elif chunk == b"VP8X":
+        flags = head[20]
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        alpha = bool(flags & 0x10)
+    else:
+        raise ProbeError(f"WebP has unknown chunk {chunk!r}")
+    return {"format": "WEBP", "width": width, "height": height, "mode": "RGBA" if alpha else "RGB",
+            "orientation": None, "truncated": False}
+
+
+def _probe_pillow(path):
+    from PIL import Image, UnidentifiedImageError
+    # The pixel limit is checked by the probe, with its own message
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        with Image.open(path) as image:
+            orientation = image.getexif().get(0x0112)
+            return {"format": image.format, "width": image.width, "height": image.height, "mode": image.mode,
+                    "orientation": orientation, "truncated": False}
+    except UnidentifiedImageError:
+        raise ProbeError("not an image Pillow can read")
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+
+def probe_image(path, max_pixels=DEFAULT_MAX_PIXELS):
+    """
+    Format, size, mode and orientation of an image from its header
+
+    Returns:
+        dict: path, format, width, height, mode, orientation, decoded_bytes
+        (Pillow's in-memory size), file bytes, and error (None if the image
+        can be rendered)
+    """
+    info = {"path": path, "format": None, "width": None, "height": None, "mode": None, "orientation": None,
+            "decoded_bytes": None, "bytes": None, "error": None}
+    try:
+        with open(path, "rb") as f:
+            info["bytes"] = os.fstat(f.fileno()).st_size
+            head = f.read(32)
+            if head.startswith(b"\xff\xd8"):
+                info.update(_probe_jpeg(f))
+            elif head.startswith(b"\x89PNG\r\n\x1a\n"):
+                info.update(_probe_png(f, head))
+            elif head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+                info.update(_probe_webp(head))
+            elif head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+                width, height = struct.unpack("<HH", head[6:10])
+                info.update(format="GIF", width=width, height=height, mode="P", truncated=False)
+            else:
+                info.update(_probe_pillow(path))
+    except (OSError, ProbeError, struct.error, IndexError) as e:
+        info["error"] = str(e) or type(e).__name__
+        return info
+
+    pixels = info["width"] * info["height"]
+    info["decoded_bytes"] = pixels * PIXEL_BYTES.get(info["mode"], 4)
+    if info.pop("truncated"):
+        info["error"] = f"{info['format']} is truncated"
+    elif not pixels:
+        info["error"] = "image has no pixels"
+    elif pixels > max_pixels:
+        info["error"] = f"{info['width']}x{info['height']} is over the {max_pixels:,} pixel limit"
+    return info
+
+
+def require_image(path, max_pixels=DEFAULT_MAX_PIXELS):
+    """Probe an image and raise ValueError if it can't be rendered"""
+    info = probe_image(path, max_pixels)
+    if info["error"]:
+        raise ValueError(f"{path}: {info['error']}")
+    return info
+
+
+def probe_command(argv, plan):
+    """
+    CLI for ``slab_render.py probe``
+
+    ``plan`` picks the render mode for a slab, taking the kitchen, slab and
+    mask paths and a memory budget in bytes.
+    """
+    from render_io import BASE_DIR
+    parser = argparse.ArgumentParser(prog="slab_render.py probe",
+                                     description="Check images from their headers and route slabs to a render mode")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--kitchen", default=os.path.join(BASE_DIR, "kitchen.jpg"),
+                        help="Scene the slabs are routed for (default: the bundled kitchen)")
+    parser.add_argument("--mask", default=os.path.join(BASE_DIR, "mask.png"), help="Mask for that scene")
+    parser.add_argument("--memory-budget-mb", type=float,
+                        help="Route each slab to full, draft or tiled rendering for this budget "
+                             "(default: SLAB_RENDER_MEMORY_BUDGET_MB)")
+    parser.add_argument("--max-pixels", type=int, default=DEFAULT_MAX_PIXELS,
+                        help="Reject images with more pixels (default: %(default)s)")
+    parser.add_argument("--no-route", action="store_true",
+                        help="Only check the images, e.g. kitchen and mask uploads, without routing them as slabs")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per image")
+    args = parser.parse_args(argv)
+
+    budget = int(args.memory_budget_mb * 2**20) if args.memory_budget_mb else default_budget_bytes()
+    rejected = 0
+    for path in args.images:
+        info = probe_image(path, args.max_pixels)
+        if not info["error"] and not args.no_route:
+            info["route"] = "full"
+            if budget:
+                try:
+                    info["route"] = plan(args.kitchen, path, args.mask, budget)["mode"]
+                except ValueError as e:
+                    info["error"] = str(e)
+        if info["error"] or args.no_route:
+            info["route"] = None
+        if info["error"]:
+            rejected += 1
+        if args.json:
+            print(json.dumps(info, sort_keys=True))
+        elif info["error"]:
+            print(f"❌ {path}: {info['error']}")
+        else:
+            route = f" → {info['route']}" if info["route"] else ""
+            print(f"✅ {path}: {info['format']} {info['width']}x{info['height']} {info['mode']}, "
+                  f"{info['decoded_bytes'] / 2**20:.0f} MiB decoded{route}")
+    return 1 if rejected else 0
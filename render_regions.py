@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Multi-Region Scenes
+Goal: Render several labeled countertop regions, each with its own slab and framing, in one pass
+Tools: Python, NumPy
+
+A region scene is a JSON file (or a catalog scene entry) like:
+
+    {
+        "image": "kitchen.jpg",
+        "regions": [
+            {"label": "perimeter", "mask": "perimeter.png"},
+            {"label": "island", "mask": "island.png", "coverage": 2.0},
+            {"label": "backsplash", "mask": "backsplash.png", "slab": "subway.jpg", "rotate": 90}
+        ]
+    }
+
+Regions are painted in order, so later regions cover earlier ones where
+their masks overlap. Framing per region:
+    slab      - optional pinned slab; otherwise the slab given for the label,
+                or the render's default slab
+    coverage  - how far the slab is scaled past the scene (default 1.5)
+    center    - [x, y] fraction of the slab the window is centred on
+    rotate    - 0, 90, 180 or 270 degrees counter-clockwise, applied first
+"""
+
+import argparse
+import os
+
+from render_encode import PRESETS, default_preset
+from render_io import read_json, write_json_atomic
+from render_resample import AUTO, available_backends
+
+DEFAULT_COVERAGE = 1.5
+ROTATIONS = (0, 90, 180, 270)
+
+
+def normalize_region(region, base):
+    """Validate a region definition and resolve its paths against base"""
+    if not region.get("label") or not region.get("mask"):
+        raise ValueError(f"Scene region needs a label and a mask: {region}")
+    normalized = {
+        "label": region["label"],
+        "mask": os.path.join(base, region["mask"]),
+        "coverage": float(region.get("coverage", DEFAULT_COVERAGE)),
+        "center": [float(value) for value in region.get("center", (0.5, 0.5))],
+        "rotate": int(region.get("rotate", 0)),
+    }
+    if region.get("slab"):
+        normalized["slab"] = os.path.join(base, region["slab"])
+    if normalized["coverage"] < 1:
+        raise ValueError(f"Region {region['label']} coverage must be at least 1")
+    if not all(0 <= value <= 1 for value in normalized["center"]) or len(normalized["center"]) != 2:
+        raise ValueError(f"Region {region['label']} center must be two fractions between 0 and 1")
+    if normalized["rotate"] not in ROTATIONS:
+        raise ValueError(f"Region {region['label']} rotate must be one of {ROTATIONS}")
+    return normalized
+
+
+def normalize_scene(scene, base):
+    """
+    Resolve a scene definition's paths against base
+
+    Single-mask scenes ({"image", "mask"}) are returned unchanged apart from
+    their paths; region scenes get their regions validated.
+    """
+    normalized = {key: os.path.join(base, value) for key, value in scene.items() if isinstance(value, str)}
+    if "regions" in scene:
+        regions = [normalize_region(region, base) for region in scene["regions"]]
+        labels = [region["label"] for region in regions]
+        if not regions or len(set(labels)) != len(labels):
+            raise ValueError("Scene regions must be a non-empty list with unique labels")
+        normalized["regions"] = regions
+    elif "mask" not in normalized:
+        raise ValueError("Scene needs a mask or a list of regions")
+    return normalized
+
+
+def load_scene(path):
+    """Read a single region scene file"""
+    return normalize_scene(read_json(path), os.path.dirname(os.path.abspath(path)))
+
+
+def assign_slabs(regions, slabs=None, default_slab=None):
+    """
+    Regions with the slab each will be rendered with
+
+    Args:
+        slabs: Optional {label: slab path}, overriding pinned slabs
+        default_slab: Slab for regions with neither
+    """
+    slabs = slabs or {}
+    unknown = set(slabs) - {region["label"] for region in regions}
+    if unknown:
+        raise ValueError(f"No scene region labeled {', '.join(sorted(unknown))}")
+    assigned = []
+    for region in regions:
+        slab = slabs.get(region["label"]) or region.get("slab") or default_slab
+        if not slab:
+            raise ValueError(f"No slab for scene region {region['label']}")
+        assigned.append(dict(region, slab=slab))
+    return assigned
+
+
+def mask_bounds(alpha):
+    """
+    Bounding box (x0, y0, x1, y1) of the non-zero pixels of a mask
+
+    Returns:
+        tuple or None: None when the mask is empty
+    """
+    import numpy as np
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if not len(rows):
+        return None
+    columns = np.flatnonzero(alpha[rows[0]:rows[-1] + 1].any(axis=0))
+    return int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1
+
+
+def sub_box(box, size, bounds):
+    """Part of a source box (x0, y0, x1, y1) that maps onto the output pixels in bounds"""
+    x0, y0, x1, y1 = box
+    scale_x, scale_y = (x1 - x0) / size[0], (y1 - y0) / size[1]
+    return (x0 + bounds[0] * scale_x, y0 + bounds[1] * scale_y,
+            x0 + bounds[2] * scale_x, y0 + bounds[3] * scale_y)
+
+
+def parse_slab_argument(text):
+    """``label=path`` or a bare default slab path"""
+    label, separator, path = text.partition("=")
+    if separator and label and not os.path.exists(text):
+        return label, path
+    return None, text
+
+
+def scene_command(argv, render):
+    """CLI for ``slab_render.py scene``"""
+    parser = argparse.ArgumentParser(prog="slab_render.py scene",
+                                     description="Render every region of a multi-region scene in one pass")
+    parser.add_argument("scene", help="Region scene JSON")
+    parser.add_argument("output_image")
+    parser.add_argument("--slab", action="append", default=[], metavar="[LABEL=]PATH",
+                        help="Slab for a region label, or the default slab without a label")
+    parser.add_argument("--resample", default=AUTO, choices=[AUTO] + available_backends(),
+                        help="Resampling backend (default: calibrated for this host)")
+    parser.add_argument("--preset", default=default_preset(), choices=list(PRESETS),
+                        help="Encoder preset (default: %(default)s)")
+    parser.add_argument("--partial-encode", action="store_true",
+                        help="Re-encode only the masked MCUs into the scene's cached JPEG")
+    parser.add_argument("--manifest", help="Write the render result to this JSON file")
+    args = parser.parse_args(argv)
+
+    scene = load_scene(args.scene)
+    if "regions" not in scene:
+        parser.error("scene has no regions; render single-mask scenes with slab_render.py directly")
+    slabs, default_slab = {}, None
+    for text in args.slab:
+        label, path = parse_slab_argument(text)
+        if label:
+            slabs[label] = os.path.abspath(path)
+        else:
+            default_slab = os.path.abspath(path)
+
+    inputs = {"kitchen": scene["image"], "regions": assign_slabs(scene["regions"], slabs, default_slab),
+              "output": args.output_image, "resample": args.resample, "preset": args.preset,
+              "partial": args.partial_encode}
+    result = render(inputs)
+
+    for region in result["regions"]:
+        print(f"🪨 {region['label']}: {os.path.basename(region['slab'])}"
+              f"{'' if region['bounds'] else ' (empty mask, skipped)'}")
+    encoded = result["encode"]
+    print(f"🗜️ Encoded {encoded['format']} ({encoded['preset']}): "
+          f"{encoded['bytes'] / 1024:.1f} KiB in {encoded['encode_seconds'] * 1000:.1f} ms")
+    print(f"✅ Scene render saved to: {result['output']}")
+    if args.manifest:
+        write_json_atomic(args.manifest, result)
+        print(f"🧾 Result manifest saved to: {args.manifest}")
+    return 0
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Resampling Backends
+Goal: Resize render arrays with PIL or OpenCV filters and pick the fastest acceptable one per scale
+Tools: Python, NumPy, Pillow, OpenCV
+
+Backends are named ``<library>-<filter>``; ``pil-lanczos`` is the reference
+the others are measured against. ``auto`` looks up the backend calibrated
+for the requested scale factor in the host profile and falls back to the
+reference when the host has not been calibrated.
+"""
+
+import argparse
+import importlib.util
+import math
+import os
+import statistics
+import time
+
+from render_io import BASE_DIR, load_host_profile, update_host_profile
+
+REFERENCE_BACKEND = "pil-lanczos"
+AUTO = "auto"
+DEFAULT_THRESHOLD_DB = 32.0
+DEFAULT_SCALES = (0.25, 0.5, 0.75, 1.5, 2.0, 3.0)
+# Share of the calibration sample trimmed from each side to make its sub-pixel box
+CALIBRATION_INSET = 0.1
+
+PIL_FILTERS = {
+    "pil-lanczos": "LANCZOS",
+    "pil-bicubic": "BICUBIC",
+    "pil-hamming": "HAMMING",
+    "pil-bilinear": "BILINEAR",
+    "pil-box": "BOX",
+}
+CV2_FLAGS = {
+    "cv2-area": "INTER_AREA",
+    "cv2-lanczos4": "INTER_LANCZOS4",
+    "cv2-cubic": "INTER_CUBIC",
+    "cv2-linear": "INTER_LINEAR",
+}
+# Source pixels either side of a sample the OpenCV filters read (LANCZOS4's radius)
+CV2_SUPPORT = 4
+
+
+def _pil_resize(source, size, box, filter_name):
+    import numpy as np
+    from PIL import Image
+    resampling = getattr(Image.Resampling, filter_name)
+    image = Image.fromarray(source) if isinstance(source, np.ndarray) else source
+    return np.asarray(image.resize(size, resampling, box=box))
+
+
+def _cv2_resize(source, size, box, flag_name):
+    import cv2
+    import numpy as np
+    if box is None:
+        return cv2.resize(np.ascontiguousarray(source), size, interpolation=getattr(cv2, flag_name))
+    scale_x, scale_y = (box[2] - box[0]) / size[0], (box[3] - box[1]) / size[1]
+    if flag_name == "INTER_AREA" and max(scale_x, scale_y) > 1:
+        # warpAffine has no area filter; Pillow's box filter is the same area average over a sub-pixel box
+        return _pil_resize(source, size, box, "BOX")
+    # Map each output pixel centre into the sub-pixel box, as Pillow does, and
+    # interpolate there; only the box plus the filter's support is read
+    width, height = source.size if not isinstance(source, np.ndarray) else (source.shape[1], source.shape[0])
+    window = (max(0, math.floor(box[0]) - CV2_SUPPORT), max(0, math.floor(box[1]) - CV2_SUPPORT),
+              min(width, math.ceil(box[2]) + CV2_SUPPORT), min(height, math.ceil(box[3]) + CV2_SUPPORT))
+    if isinstance(source, np.ndarray):
+        source = source[window[1]:window[3], window[0]:window[2]]
+    else:
+        source = np.asarray(source.crop(window))
+    matrix = np.array([[scale_x, 0, box[0] - window[0] + scale_x / 2 - 0.5],
+                       [0, scale_y, box[1] - window[1] + scale_y / 2 - 0.5]])
+    return cv2.warpAffine(np.ascontiguousarray(source), matrix, size,
+                          flags=getattr(cv2, flag_name) | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE)
+
+
+def available_backends():
+    """Backends usable on this host, reference first"""
+    backends = list(PIL_FILTERS)
+    # Checked without importing cv2, which is slow to load and only needed for cv2 resizes
+    if importlib.util.find_spec("cv2") is None:
+        return backends
+    return backends + list(CV2_FLAGS)
+
+
+def resolve_backend(backend, scale, profile=None):
+    """
+    Concrete backend for a resize by ``scale``
+
+    ``auto`` picks the calibrated backend for the nearest calibrated scale.
+    """
+    if backend != AUTO:
+        return backend
+    calibration = (profile if profile is not None else load_host_profile()).get("resample", {})
+    scales = calibration.get("scales")
+    if not scales:
+        return REFERENCE_BACKEND
+    nearest = min(scales, key=lambda s: abs(math.log(float(s)) - math.log(scale)))
+    choice = scales[nearest]["backend"]
+    return choice if choice in available_backends() else REFERENCE_BACKEND
+
+
+def backend_settings(backend, profile=None):
+    """What decides the filters ``backend`` resizes with on this host: the calibrated choices for ``auto``"""
+    if backend != AUTO:
+        return backend
+    calibration = (profile if profile is not None else load_host_profile()).get("resample", {})
+    return {scale: result["backend"] for scale, result in calibration.get("scales", {}).items()}
+
+
+def resize(array, size, backend=AUTO, box=None, profile=None):
+    """
+    Resize an HxW or HxWxC uint8 array to ``size`` (width, height)
+
+    Args:
+        array: Array, or an open PIL image to resample a window of without
+            converting the whole image
+        box: Optional (x0, y0, x1, y1) source region to resample, in pixels
+        backend: Backend name, or ``auto`` to use the host calibration
+    """
+    import numpy as np
+    if box:
+        src_w, src_h = box[2] - box[0], box[3] - box[1]
+    elif isinstance(array, np.ndarray):
+        src_w, src_h = array.shape[1], array.shape[0]
+    else:
+        src_w, src_h = array.size
+    scale = math.sqrt((size[0] / src_w) * (size[1] / src_h))
+    backend = resolve_backend(backend, scale, profile)
+    if backend in PIL_FILTERS:
+        return _pil_resize(array, size, box, PIL_FILTERS[backend])
+    if backend in CV2_FLAGS:
+        return _cv2_resize(array, size, box, CV2_FLAGS[backend])
+    raise ValueError(f"Unknown resampling backend: {backend}")
+
+
+def load_thumbnail(path, max_size, mode="RGB"):
+    """
+    Decode an image upright (EXIF orientation applied) with its long side at most max_size
+
+    JPEGs are decoded at the coarsest draft scale that still covers the
+    thumbnail, so a thumbnail of a large photo costs a fraction of a full
+    decode.
+    """
+    import numpy as np
+    from PIL import Image, ImageOps
+    image = Image.open(path)
+    ratio = min(1.0, max_size / max(image.size))
+    image.draft(mode, (math.ceil(image.width * ratio), math.ceil(image.height * ratio)))
+    image = ImageOps.exif_transpose(image).convert(mode)
+    image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    return np.asarray(image)
+
+
+def psnr(a, b):
+    """Peak signal-to-noise ratio between two uint8 arrays, in dB"""
+    import numpy as np
+    mse = np.mean((a.astype(np.float32) - b.astype(np.float32)) ** 2)
+    return float("inf") if mse == 0 else float(10 * math.log10(255.0 ** 2 / mse))
+
+
+def calibrate(sample, scales=DEFAULT_SCALES, threshold_db=DEFAULT_THRESHOLD_DB, repeats=3):
+    """
+    Benchmark every backend at each scale on this host
+
+    For each scale the fastest backend whose output stays within
+    ``threshold_db`` PSNR of the reference is selected. Resizes are timed
+    and compared on a sub-pixel box of the sample, the way renders frame
+    their slabs, so a backend that misaligns boxes is not picked.
+
+    Returns:
+        dict: Calibration section for the host profile
+    """
+    results = {}
+    height, width = sample.shape[:2]
+    box = (width * CALIBRATION_INSET + 0.37, height * CALIBRATION_INSET + 0.61,
+           width * (1 - CALIBRATION_INSET) - 0.29, height * (1 - CALIBRATION_INSET) - 0.43)
+    for scale in scales:
+        size = (max(1, round((box[2] - box[0]) * scale)), max(1, round((box[3] - box[1]) * scale)))
+        reference = resize(sample, size, REFERENCE_BACKEND, box=box)
+        timings, similarity = {}, {}
+        for backend in available_backends():
+            samples = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                output = resize(sample, size, backend, box=box)
+                samples.append(time.perf_counter() - started)
+            timings[backend] = statistics.median(samples)
+            similarity[backend] = psnr(reference, output)
+        accepted = [b for b in timings if similarity[b] >= threshold_db]
+        best = min(accepted, key=timings.get)
+        results[str(scale)] = {
+            "backend": best,
+            "seconds": {b: round(t, 6) for b, t in timings.items()},
+            "psnr_db": {b: (round(p, 2) if math.isfinite(p) else None) for b, p in similarity.items()},
+        }
+    return {"threshold_db": threshold_db, "calibrated_at": time.time(),
+            "sample_shape": list(sample.shape), "scales": results}
+
+
+def calibrate_command(argv):
+    """CLI for ``slab_render.py calibrate-resample``"""
+    import numpy as np
+    parser = argparse.ArgumentParser(prog="slab_render.py calibrate-resample",
+                                     description="Pick the fastest acceptable resampling backend per scale factor")
+    parser.add_argument("--sample", default=os.path.join(BASE_DIR, "slab.jpg"), help="Image to benchmark with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD_DB,
+                        help="Minimum PSNR in dB against %s" % REFERENCE_BACKEND)
+    parser.add_argument("--scales", type=lambda text: [float(s) for s in text.split(",")],
+                        default=list(DEFAULT_SCALES), help="Comma-separated scale factors")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per backend and scale")
+    parser.add_argument("--profile", help="Host profile to update (default: render_profile.json)")
+    parser.add_argument("--dry-run", action="store_true", help="Print results without saving them")
+    args = parser.parse_args(argv)
+
+    from PIL import Image
+    sample = np.asarray(Image.open(args.sample).convert("RGB"))
+    calibration = calibrate(sample, args.scales, args.threshold, args.repeats)
+
+    for scale, result in calibration["scales"].items():
+        reference = result["seconds"][REFERENCE_BACKEND]
+        print(f"📐 scale {scale}: {result['backend']} "
+              f"({reference / result['seconds'][result['backend']]:.1f}x faster than {REFERENCE_BACKEND})")
+        for backend, seconds in sorted(result["seconds"].items(), key=lambda item: item[1]):
+            db = result["psnr_db"][backend]
+            print(f"   {backend:<14} {seconds * 1000:8.2f} ms  {'ref' if db is None else f'{db:.1f} dB'}")
+
+    if not args.dry_run:
+        update_host_profile("resample", calibration, args.profile)
+        print("✅ Saved resampling calibration to host profile")
+    return 0
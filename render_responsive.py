@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Responsive Upload Variants
+Goal: Serve uploaded avatars, profile and portfolio images at the sizes pages show them, in AVIF and WebP
+Tools: Python, Pillow, NumPy
+
+Every image under the upload directories below is decoded once (JPEGs at
+the smallest draft scale that covers the largest variant), turned upright
+from its EXIF orientation and resized to each width of its directory's
+set. Widths above the original are dropped; an original narrower than the
+largest width also gets a variant at its own width, so it is still served
+in a modern format. Each size is written in every format of the
+"responsive" encoder preset the host can write.
+
+Variant files are named by the original's content hash, so re-uploads of
+the same image share them, and a run only rebuilds images whose content
+or the variant settings changed. The manifest maps each original's URL to
+its variants (grouped by format, narrowest first) and a placeholder, for
+the server to build srcset/<picture> markup from:
+
+    {"images": {"/upload/avatars/a.png": {"width": 900, "height": 900,
+        "variants": {"AVIF": [{"url": ..., "width": 64, "height": 64, "bytes": ...}, ...],
+                     "WEBP": [...]},
+        "placeholder": {...}}}}
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from render_catalog import FileFingerprints
+from render_encode import PRESETS, format_available, save_options
+from render_io import default_workers, read_json, write_json_atomic
+from render_probe import probe_image
+
+RESPONSIVE_PRESET = "responsive"
+MANIFEST_VERSION = 1
+DEFAULT_UPLOAD_DIR = "upload"
+DEFAULT_OUTPUT_DIR = os.path.join("upload", "responsive")
+# Widths per upload directory: sidebar and card avatars, profile headers, portfolio galleries and lightboxes
+WIDTH_SETS = {
+    "avatars": (64, 128, 256),
+    "profile-images": (128, 256, 512),
+    "portfolio-images": (480, 960, 1440, 1920),
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+
+def variant_widths(width, widths):
+    """Widths to build for an original of width, never upscaling"""
+    chosen = [w for w in widths if w < width]
+    if width <= max(widths):
+        chosen.append(width)
+    return chosen
+
+
+def variant_settings(formats):
+    """Everything besides the original's content that decides the variant files"""
+    return {"widths": WIDTH_SETS, "formats": formats, "preset": PRESETS[RESPONSIVE_PRESET]}
+
+
+def build_variants(path, digest, widths, formats, output_dir, url_prefix):
+    """
+    Decode one original and write its variants
+
+    Returns:
+        dict: Original size, variants by format and placeholder
+    """
+    import numpy as np
+    from PIL import Image, ImageOps
+    from render_placeholder import placeholder
+    from render_resample import resize
+
+    image = Image.open(path)
+    width, height = image.size
+    orientation = image.getexif().get(0x0112, 1)
+    upright_width = height if orientation in (5, 6, 7, 8) else width
+    largest = min(max(widths), upright_width)
+    if orientation in (5, 6, 7, 8):
+        image.draft("RGB", (round(largest * width / height), largest))
+    else:
+        image.draft("RGB", (largest, round(largest * height / width)))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    array = np.asarray(image.convert("RGBA" if has_alpha else "RGB"))
+    # Sizes come from the original's upright dimensions, not the draft-reduced decode
+    upright_height = width if orientation in (5, 6, 7, 8) else height
+
+    entry = {"width": upright_width, "height": upright_height, "variants": {name: [] for name in formats},
+             "placeholder": placeholder(np.ascontiguousarray(array[:, :, :3]))}
+    os.makedirs(output_dir, exist_ok=True)
+    for target in variant_widths(upright_width, widths):
+        size = (target, max(1, round(upright_height * target / upright_width)))
+        resized = array if size == (array.shape[1], array.shape[0]) else resize(array, size)
+        variant = Image.fromarray(resized)
+        for name in formats:
+            filename = f"{digest[:16]}-{target}w.{name.lower()}"
+            output = os.path.join(output_dir, filename)
+            # Width sets overlap, so concurrent builds of one upload can write the same variant
+            temp_path = os.path.join(output_dir, f".{filename}.{uuid.uuid4().hex}.tmp")
+            variant.save(temp_path, name, **save_options(RESPONSIVE_PRESET, name))
+            os.replace(temp_path, output)
+            entry["variants"][name].append({"url": f"{url_prefix}/{filename}", "width": size[0],
+                                            "height": size[1], "bytes": os.path.getsize(output)})
+    return entry
+
+
+def _variants_exist(entry, output_dir):
+    return all(os.path.exists(os.path.join(output_dir, os.path.basename(variant["url"])))
+               for variants in entry["variants"].values() for variant in variants)
+
+
+def find_uploads(upload_dir):
+    """(path, url, width set name) of every image in the upload directories with a width set"""
+    uploads = []
+    for name in sorted(WIDTH_SETS):
+        directory = os.path.join(upload_dir, name)
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                uploads.append((os.path.join(directory, filename), f"/upload/{name}/{filename}", name))
+    return uploads
+
+
+def run_responsive(upload_dir=DEFAULT_UPLOAD_DIR, output_dir=DEFAULT_OUTPUT_DIR, manifest_path=None,
+                   workers=1, force=False, dry_run=False, prune=False):
+    """
+    Build the variants of every new or changed upload and update the manifest
+
+    Returns:
+        dict: Counts of images, built, skipped, failed and pruned variant files
+    """
+    manifest_path = manifest_path or os.path.join(output_dir, "manifest.json")
+    formats = [name for name in PRESETS[RESPONSIVE_PRESET]["formats"] if format_available(name)]
+    if not formats:
+        raise RuntimeError("This Pillow build can write none of the responsive formats")
+    settings = hashlib.sha256(json.dumps(variant_settings(formats), sort_keys=True).encode()).hexdigest()
+    manifest = read_json(manifest_path, default={})
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != settings:
+        manifest = {"version": MANIFEST_VERSION, "settings": settings, "images": {}, "files": manifest.get("files", {})}
+    # The server serves the upload directory at /upload
+    url_prefix = "/upload/" + os.path.relpath(output_dir, upload_dir).replace(os.sep, "/")
+
+    files = FileFingerprints(manifest["files"])
+    uploads = find_uploads(upload_dir)
+    images = {}
+    # Identical uploads (same content and width set) are built once
+    pending = {}
+    summary = {"images": len(uploads), "built": 0, "skipped": 0, "failed": 0, "pruned": 0}
+    for path, url, width_set in uploads:
+        digest = files.get(path)
+        previous = manifest["images"].get(url)
+        if not force and previous and previous["digest"] == digest and _variants_exist(previous, output_dir):
+            images[url] = previous
+            summary["skipped"] += 1
+            continue
+        probe = probe_image(path)
+        if probe["error"]:
+            summary["failed"] += 1
+            print(f"❌ {url}: {probe['error']}")
+            continue
+        pending.setdefault((digest, width_set), []).append((path, url))
+    if dry_run:
+        for urls in pending.values():
+            for _, url in urls:
+                print(f"🔄 Would build variants of {url}")
+        return summary
+
+    def record(key, entry=None, error=None):
+        for _, url in pending[key]:
+            if error is not None:
+                summary["failed"] += 1
+                print(f"❌ {url}: {error}")
+            else:
+                summary["built"] += 1
+                images[url] = dict(entry, digest=key[0], width_set=key[1])
+
+    finished = False
+    try:
+        jobs = {key: (urls[0][0], key[0], WIDTH_SETS[key[1]], formats, output_dir, url_prefix)
+                for key, urls in pending.items()}
+        if workers > 1 and len(jobs) > 1:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(build_variants, *job): key for key, job in jobs.items()}
+                for future in as_completed(futures):
+                    error = future.exception()
+                    record(futures[future], None if error else future.result(), error)
+        else:
+            for key, job in jobs.items():
+                try:
+                    entry = build_variants(*job)
+                except Exception as e:
+                    record(key, error=e)
+                else:
+                    record(key, entry)
+        finished = True
+        if prune and os.path.isdir(output_dir):
+            referenced = {os.path.basename(variant["url"]) for entry in images.values()
+                          for variants in entry["variants"].values() for variant in variants}
+            for filename in os.listdir(output_dir):
+                if filename.rsplit(".", 1)[-1].upper() in formats and filename not in referenced:
+                    os.unlink(os.path.join(output_dir, filename))
+                    summary["pruned"] += 1
+    finally:
+        # Keep finished variants even if the run is interrupted; only a full run drops removed uploads
+        manifest["images"] = images if finished else dict(manifest["images"], **images)
+        manifest["generated_at"] = time.time()
+        write_json_atomic(manifest_path, manifest)
+    return summary
+
+
+def responsive_command(argv):
+    """CLI for ``slab_render.py responsive``"""
+    parser = argparse.ArgumentParser(prog="slab_render.py responsive",
+                                     description="Build AVIF/WebP size variants of uploaded images")
+    parser.add_argument("--upload-dir", default=DEFAULT_UPLOAD_DIR,
+                        help="Directory holding %s (default: %%(default)s)" % ", ".join(sorted(WIDTH_SETS)))
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Directory for the variants")
+    parser.add_argument("--manifest", help="Manifest path (default: <output-dir>/manifest.json)")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Parallel processes")
+    parser.add_argument("--force", action="store_true", help="Rebuild every image's variants")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the images that would be built")
+    parser.add_argument("--prune", action="store_true", help="Delete variants no upload uses any more")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    summary = run_responsive(args.upload_dir, args.output_dir, args.manifest, workers=args.workers,
+                             force=args.force, dry_run=args.dry_run, prune=args.prune)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(summary, sort_keys=True))
+    return 1 if summary["failed"] else 0
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Partial JPEG Re-Encoding
+Goal: Re-encode only the MCUs a slab changes and splice them into the scene's cached JPEG
+Tools: Python, NumPy, Pillow (libjpeg restart markers)
+
+The scene is encoded once as a baseline JPEG with a restart marker after
+every MCU. Restart markers reset DC prediction and byte-align the entropy
+coder, so each MCU's scan segment is self-contained. For a render, the MCUs
+touched by the mask are packed side by side into a small image and encoded
+with the same quantization and (standard) Huffman tables; their segments
+replace the scene's segments at the same positions. Encode cost scales with
+the countertop area instead of the whole frame, and the result decodes to
+the same pixels as a full encode.
+
+Requires baseline, non-optimized JPEG: progressive scans and per-image
+Huffman tables cannot be spliced.
+"""
+
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+
+from render_io import BASE_DIR
+
+CACHE_DIR = os.environ.get("SLAB_RENDER_CACHE", os.path.join(BASE_DIR, ".render_cache"))
+
+# MCU size in pixels (width, height) per chroma subsampling
+MCU_SIZES = {"4:4:4": (8, 8), "4:2:2": (16, 8), "4:2:0": (16, 16)}
+# Packed MCU images are at most this many MCUs wide
+PACK_COLUMNS = 64
+
+SOS = b"\xff\xda"
+EOI = b"\xff\xd9"
+RESTART_MARKERS = [bytes((0xFF, 0xD0 + index)) for index in range(8)]
+RESTART_PATTERN = re.compile(rb"\xff[\xd0-\xd7]")
+
+
+def splice_options(options):
+    """Baseline, non-optimized variant of JPEG save options, with a restart marker per MCU"""
+    return {"quality": options["quality"], "subsampling": options["subsampling"],
+            "progressive": False, "optimize": False, "restart_marker_blocks": 1}
+
+
+def parse_jpeg(data):
+    """
+    Split a single-scan JPEG into its header and restart intervals
+
+    Returns:
+        tuple: (header bytes through the SOS segment, list of interval bytes)
+    """
+    position = 2  # SOI
+    while True:
+        if data[position] != 0xFF:
+            raise ValueError("Malformed JPEG segment")
+        marker = data[position:position + 2]
+        length = int.from_bytes(data[position + 2:position + 4], "big")
+        position += 2 + length
+        if marker == SOS:
+            break
+    end = data.rindex(EOI)
+    intervals = RESTART_PATTERN.split(data[position:end])
+    return data[:position], intervals
+
+
+def assemble_jpeg(header, intervals):
+    """Join scan intervals with cycling RST0-RST7 markers"""
+    count = len(intervals)
+    markers = (RESTART_MARKERS * (count // 8 + 1))[:count - 1] + [EOI]
+    return header + b"".join(itertools.chain.from_iterable(zip(intervals, markers)))
+
+
+def encode_intervals(array, options):
+    """Encode an array and return its header and per-MCU intervals"""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, "JPEG", **splice_options(options))
+    return parse_jpeg(buffer.getvalue())
+
+
+def dirty_mcus(alpha, mcu_size):
+    """Boolean grid of the MCUs where alpha is non-zero"""
+    import numpy as np
+    mcu_w, mcu_h = mcu_size
+    height, width = alpha.shape
+    rows, cols = -(-height // mcu_h), -(-width // mcu_w)
+    if (rows * mcu_h, cols * mcu_w) != (height, width):
+        alpha = np.pad(alpha, ((0, rows * mcu_h - height), (0, cols * mcu_w - width)))
+    # Reduce MCU rows first, then columns; much faster than one 4-D reduction
+    row_max = alpha.reshape(rows, mcu_h, cols * mcu_w).max(axis=1)
+    return row_max.reshape(rows, cols, mcu_w).max(axis=2) > 0
+
+
+def pack_mcus(image, indices, mcu_size):
+    """
+    Copy the MCUs at ``indices`` (row, col) into a compact image, row-major
+
+    The image is edge-padded to whole MCUs first, the way libjpeg pads the
+    right edge, so right edge MCUs encode identically. libjpeg pads the
+    bottom edge per component after downsampling instead, so MCUs of a
+    partial last MCU row must not be packed.
+    """
+    import numpy as np
+    mcu_w, mcu_h = mcu_size
+    height, width = image.shape[:2]
+    rows, cols = -(-height // mcu_h), -(-width // mcu_w)
+    if (rows * mcu_h, cols * mcu_w) != (height, width):
+        image = np.pad(image, ((0, rows * mcu_h - height), (0, cols * mcu_w - width), (0, 0)), mode="edge")
+    tiles = image.reshape(rows, mcu_h, cols, mcu_w, 3)[indices[:, 0], :, indices[:, 1]]
+
+    count = len(indices)
+    pack_cols = min(count, PACK_COLUMNS)
+    pack_rows = -(-count // pack_cols)
+    packed = np.zeros((pack_rows * pack_cols, mcu_h, mcu_w, 3), dtype=np.uint8)
+    packed[:count] = tiles
+    return packed.reshape(pack_rows, pack_cols, mcu_h, mcu_w, 3).transpose(0, 2, 1, 3, 4).reshape(
+        pack_rows * mcu_h, pack_cols * mcu_w, 3)
+
+
+class SceneJpegCache:
+    """
+    Per-MCU scene encodings, kept in memory and on disk
+
+    Entries are keyed by the scene file's path, size and mtime together with
+    the encode options and Pillow version, so a changed scene or encoder
+    never reuses stale intervals.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = os.path.join(cache_dir, "scenes")
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, scene_path, options):
+        import PIL
+        stat = os.stat(scene_path)
+        identity = [os.path.abspath(scene_path), stat.st_size, stat.st_mtime_ns,
+                    splice_options(options), PIL.__version__]
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+    def get(self, scene_path, scene, options):
+        """Header and intervals of the scene, encoding it on first use"""
+        key = self.key(scene_path, options)
+        if key in self.entries:
+            self.hits += 1
+            return self.entries[key]
+
+        cached_path = os.path.join(self.cache_dir, f"{key}.jpg")
+        if os.path.exists(cached_path):
+            self.hits += 1
+            with open(cached_path, "rb") as f:
+                entry = parse_jpeg(f.read())
+        else:
+            self.misses += 1
+            entry = encode_intervals(scene, options)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{cached_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(assemble_jpeg(*entry))
+            os.replace(temp_path, cached_path)
+        self.entries[key] = entry
+        return entry
+
+    def reset_counters(self):
+        """Zero the hit and miss counts, keeping the entries"""
+        self.hits = self.misses = 0
+
+
+def splice_encode(scene_path, scene, result, alpha, options, cache):
+    """
+    JPEG bytes of ``result`` built from the cached scene plus re-encoded dirty MCUs
+
+    Args:
+        scene: Scene array as decoded from scene_path
+        result: Composited array; equal to scene wherever alpha is zero
+        alpha: Mask the composite was blended with
+        options: JPEG save options (quality and subsampling are used)
+
+    Returns:
+        tuple: (JPEG bytes, number of MCUs re-encoded, total MCUs)
+    """
+    import numpy as np
+    mcu_size = MCU_SIZES[options["subsampling"]]
+    header, scene_intervals = cache.get(scene_path, scene, options)
+    dirty = dirty_mcus(alpha, mcu_size)
+    if len(scene_intervals) != dirty.size:
+        raise ValueError("Cached scene does not match the render's MCU layout")
+
+    indices = np.argwhere(dirty)
+    intervals = list(scene_intervals)
+    rows, cols = dirty.shape
+    packed = indices
+    # libjpeg pads the bottom edge after chroma downsampling, which an edge-padded
+    # packed MCU can't reproduce; a partial last MCU row is re-encoded as it is
+    if result.shape[0] % mcu_size[1] and dirty[-1].any():
+        packed = indices[indices[:, 0] != rows - 1]
+        _, row_intervals = encode_intervals(np.ascontiguousarray(result[(rows - 1) * mcu_size[1]:]), options)
+        for col in np.flatnonzero(dirty[-1]).tolist():
+            intervals[(rows - 1) * cols + col] = row_intervals[col]
+    if len(packed):
+        _, packed_intervals = encode_intervals(pack_mcus(result, packed, mcu_size), options)
+        positions = (packed[:, 0] * cols + packed[:, 1]).tolist()
+        for position, interval in zip(positions, packed_intervals):
+            intervals[position] = interval
+    return assemble_jpeg(header, intervals), len(indices), dirty.size
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Spool-Directory Render Queue
+Goal: Share render work between hosts through a directory on a shared filesystem
+Tools: Python (atomic renames, no broker)
+
+Layout of a spool directory:
+    incoming/  job files waiting for a worker (<job_id>.json)
+    claimed/   job files owned by a worker (<job_id>@<host>-<pid>.json)
+    done/      finished jobs with their render result
+    failed/    jobs that raised, or ran out of attempts
+
+A worker claims a job by renaming it from incoming/ into claimed/. Rename is
+atomic on a single filesystem, so exactly one worker wins each job. While a
+job renders, the worker touches its claim file; claims not touched within
+the lease timeout belong to a dead worker and are renamed back to incoming/.
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from render_io import read_json, write_json_atomic
+from render_capture import configure as configure_capture
+from render_memory import set_default_budget
+from render_metrics import DEFAULT_TEXTFILE_INTERVAL, REGISTRY, serve, spool_collector, start_textfile_writer
+from render_warmup import DEFAULT_ROUNDS, remove_ready_file, report_warmup, warm_up, write_ready_file
+
+INCOMING = "incoming"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+SPOOL_DIRS = (INCOMING, CLAIMED, DONE, FAILED)
+
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def _job_id(filename):
+    """Job id from an incoming, claimed or finished job file name"""
+    return filename[:-len(".json")].split("@", 1)[0]
+
+
+class RenderSpool:
+    """Producer and worker operations on one spool directory"""
+
+    def __init__(self, root, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.root = root
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        for name in SPOOL_DIRS:
+            os.makedirs(self.path(name), exist_ok=True)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def submit(self, inputs, job_id=None):
+        """Drop a job file into incoming/ and return its id"""
+        job_id = job_id or uuid.uuid4().hex
+        if "@" in job_id or os.sep in job_id:
+            raise ValueError(f"Invalid spool job id: {job_id}")
+        job = {"job_id": job_id, "inputs": inputs, "attempts": 0, "submitted_at": time.time()}
+        write_json_atomic(self.path(INCOMING, f"{job_id}.json"), job)
+        return job_id
+
+    def counts(self):
+        """Number of job files in each spool directory"""
+        return {
+            name: sum(1 for entry in os.scandir(self.path(name)) if entry.name.endswith(".json"))
+            for name in SPOOL_DIRS
+        }
+
+    def claim(self):
+        """
+        Claim the oldest incoming job
+
+        Returns:
+            tuple: (claim_path, job) or None when the queue is empty
+        """
+        entries = []
+        for entry in os.scandir(self.path(INCOMING)):
+            if not entry.name.endswith(".json") or entry.name.startswith("."):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry))
+            except FileNotFoundError:
+                continue  # Claimed by another worker since the scan
+        entries.sort(key=lambda item: item[0])
+        for _, entry in entries:
+            claim_path = self.path(CLAIMED, f"{_job_id(entry.name)}@{self.owner}.json")
+            try:
+                # The lease starts before the claim is published: a renamed file
+                # keeps its mtime, and reclaim_stale would take an old one as expired
+                os.utime(entry.path)
+                os.rename(entry.path, claim_path)
+                job = read_json(claim_path)
+                job["attempts"] = job.get("attempts", 0) + 1
+                job["claimed_by"] = self.owner
+                write_json_atomic(claim_path, job)
+            except FileNotFoundError:
+                continue  # Another worker won this job
+            return claim_path, job
+        return None
+
+    def reclaim_stale(self):
+        """
+        Return expired claims to incoming/, or fail them after too many attempts
+
+        Returns:
+            list: Ids of the jobs that were reclaimed
+        """
+        reclaimed = []
+        cutoff = time.time() - self.lease_seconds
+        for entry in os.scandir(self.path(CLAIMED)):
+            if not entry.name.endswith(".json") or entry.name.startswith("."):
+                continue
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                job = read_json(entry.path)
+            except FileNotFoundError:
+                continue
+            job_id = _job_id(entry.name)
+            exhausted = job.get("attempts", 0) >= self.max_attempts
+            target = self.path(FAILED if exhausted else INCOMING, f"{job_id}.json")
+            try:
+                os.rename(entry.path, target)
+            except FileNotFoundError:
+                continue  # Another worker reclaimed it first
+            if exhausted:
+                job["error"] = f"Lease expired after {job['attempts']} attempts"
+                write_json_atomic(target, job)
+            reclaimed.append(job_id)
+        return reclaimed
+
+    def finish(self, claim_path, job, result=None, error=None):
+        """Record the outcome in done/ or failed/ and release the claim"""
+        job = dict(job, finished_at=time.time())
+        if error is None:
+            job["result"] = result
+            target_dir = DONE
+        else:
+            job["error"] = str(error)
+            target_dir = FAILED
+        write_json_atomic(self.path(target_dir, f"{job['job_id']}.json"), job)
+        try:
+            os.unlink(claim_path)
+        except FileNotFoundError:
+            pass
+
+    def _heartbeat(self, claim_path, stop):
+        """Keep the claim fresh while its job renders"""
+        interval = max(self.lease_seconds / 4, 0.5)
+        while not stop.wait(interval):
+            try:
+                os.utime(claim_path)
+            except FileNotFoundError:
+                return
+
+    def work(self, render, once=False, poll_interval=1.0, idle_exit=False):
+        """
+        Claim and render jobs until stopped
+
+        Args:
+            render: Callable taking the job inputs and returning a result dict
+            once: Process at most one job
+            poll_interval: Seconds to sleep when the queue is empty
+            idle_exit: Return as soon as the queue is empty
+
+        Returns:
+            int: Number of jobs processed
+        """
+        processed = 0
+        while True:
+            self.reclaim_stale()
+            claimed = self.claim()
+            if claimed is None:
+                if once or idle_exit:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            claim_path, job = claimed
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=(claim_path, stop), daemon=True)
+            heartbeat.start()
+            try:
+                result = render(job["inputs"])
+            except Exception as e:
+                self.finish(claim_path, job, error=e)
+                print(f"❌ Spool job {job['job_id']} failed: {e}")
+            else:
+                self.finish(claim_path, job, result=result)
+                print(f"✅ Spool job {job['job_id']} done")
+            finally:
+                stop.set()
+                heartbeat.join()
+            processed += 1
+            if once:
+                return processed
+
+
+def spool_command(argv, render):
+    """
+    Producer and worker CLI: ``submit``, ``work`` and ``status``
+
+    ``render`` is the callable used by workers, taking the job inputs.
+    """
+    parser = argparse.ArgumentParser(prog="slab_render.py spool", description="Spool-directory render queue")
+    parser.add_argument("spool_dir", help="Spool directory shared by producers and workers")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="Seconds before an untouched claim is reclaimed")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="Claims allowed per job before it is failed")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = commands.add_parser("submit", help="Queue a render job")
+    submit_parser.add_argument("kitchen_image")
+    submit_parser.add_argument("slab_image")
+    submit_parser.add_argument("mask_image")
+    submit_parser.add_argument("output_image")
+    submit_parser.add_argument("--job-id", help="Job id (default: random)")
+    submit_parser.add_argument("--product-id", type=int, help="Product the render belongs to")
+
+    work_parser = commands.add_parser("work", help="Claim and render queued jobs")
+    work_parser.add_argument("--once", action="store_true", help="Process at most one job")
+    work_parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+    work_parser.add_argument("--poll", type=float, default=1.0, help="Seconds between polls of an empty queue")
+    work_parser.add_argument("--warmup", action="store_true",
+                             help="Render the bundled sample scene before claiming jobs and record the host baseline")
+    work_parser.add_argument("--warmup-rounds", type=int, default=DEFAULT_ROUNDS, help="Warmup renders")
+    work_parser.add_argument("--ready-file", help="Create this file once the worker is warm; removed on exit")
+    work_parser.add_argument("--metrics-port", type=int,
+                             help="Serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    work_parser.add_argument("--metrics-file",
+                             help="Rewrite Prometheus metrics to this file (node_exporter textfile collector)")
+    work_parser.add_argument("--metrics-interval", type=float, default=DEFAULT_TEXTFILE_INTERVAL,
+                             help="Seconds between metrics file rewrites (default: %(default)s)")
+    work_parser.add_argument("--memory-budget-mb", type=float,
+                             help="Memory budget per render; larger jobs decode the slab reduced or render tiled")
+    work_parser.add_argument("--capture-dir", help="Write flamegraph profiles of slow or sampled renders here")
+    work_parser.add_argument("--capture-slow-ms", type=float, help="Capture renders slower than this")
+    work_parser.add_argument("--capture-every", type=int, help="Capture every Nth render")
+
+    commands.add_parser("status", help="Show job counts per spool directory")
+
+    args = parser.parse_args(argv)
+    spool = RenderSpool(args.spool_dir, lease_seconds=args.lease, max_attempts=args.max_attempts)
+
+    if args.command == "submit":
+        inputs = {
+            "kitchen": os.path.abspath(args.kitchen_image),
+            "slab": os.path.abspath(args.slab_image),
+            "mask": os.path.abspath(args.mask_image),
+            "output": os.path.abspath(args.output_image),
+        }
+        if args.product_id is not None:
+            inputs["product_id"] = args.product_id
+        print(spool.submit(inputs, job_id=args.job_id))
+    elif args.command == "work":
+        server = stop_metrics = None
+        try:
+            # Not ready until warm: the ready file only appears after a successful warmup
+            stats = None
+            if args.warmup:
+                stats = warm_up(render, args.warmup_rounds)
+                report_warmup(stats)
+            if args.memory_budget_mb:
+                set_default_budget(args.memory_budget_mb)
+            if args.capture_dir:
+                configure_capture(args.capture_dir, args.capture_slow_ms, args.capture_every)
+            # Metrics start after warmup, and the sample renders it observed are
+            # cleared before anything is exposed, so they aren't counted as traffic
+            if args.metrics_port or args.metrics_file:
+                REGISTRY.reset()
+                REGISTRY.add_collector(spool_collector(spool))
+            if args.metrics_port:
+                server = serve(args.metrics_port)
+            if args.metrics_file:
+                stop_metrics = start_textfile_writer(args.metrics_file, args.metrics_interval)
+            if args.ready_file:
+                write_ready_file(args.ready_file, stats)
+            processed = spool.work(render, once=args.once, poll_interval=args.poll, idle_exit=args.drain)
+        except KeyboardInterrupt:
+            return 130
+        finally:
+            if args.ready_file:
+                remove_ready_file(args.ready_file)
+            if server:
+                server.shutdown()
+            if stop_metrics:
+                stop_metrics()
+        print(f"🧾 Processed {processed} spool job(s)")
+    elif args.command == "status":
+        print(json.dumps(spool.counts(), sort_keys=True))
+    return 0
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Startup Profiling
+Goal: Show which imports a slab_render.py invocation pays for before it does any work
+Tools: Python (-X importtime)
+
+``slab_render.py --profile-startup [args...]`` re-runs the CLI with the
+given arguments under ``python -X importtime`` and summarizes the report:
+the slowest imports by cumulative time and the packages that cost the
+most in total. Heavy dependencies (NumPy, Pillow, OpenCV) are only
+imported on the code paths that use them, so e.g. ``journal list`` should
+not show them at all.
+"""
+
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("numpy", "PIL", "cv2")
+DEFAULT_TOP = 15
+
+
+def parse_importtime(text):
+    """
+    Parse ``-X importtime`` output
+
+    Returns:
+        list: Dicts with module, self_us, cumulative_us and depth, in report order
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        entries.append({"module": module, "self_us": int(fields[0]), "cumulative_us": int(fields[1]),
+                        "depth": (len(name) - len(module) - 1) // 2})
+    return entries
+
+
+def summarize(entries, top=DEFAULT_TOP):
+    """Slowest imports, per-package totals and which heavy modules were loaded"""
+    packages = {}
+    for entry in entries:
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+    return {
+        "total_us": sum(entry["self_us"] for entry in entries),
+        "modules": len(entries),
+        "slowest": sorted(entries, key=lambda entry: entry["cumulative_us"], reverse=True)[:top],
+        "packages": sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top],
+        "heavy": [name for name in HEAVY_MODULES if name in packages],
+    }
+
+
+def profile_startup(script, argv, top=DEFAULT_TOP):
+    """Run the script with argv under -X importtime and print the import cost summary"""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", script] + argv,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - started
+    summary = summarize(parse_importtime(completed.stderr), top)
+
+    print(f"⏱️ {' '.join(['slab_render.py'] + argv)}: {wall * 1000:.0f} ms wall, "
+          f"{summary['total_us'] / 1000:.1f} ms importing {summary['modules']} modules")
+    print(f"📦 Heavy modules loaded: {', '.join(summary['heavy']) or 'none'}")
+    print("\nSlowest imports (cumulative):")
+    for entry in summary["slowest"]:
+        print(f"   {entry['cumulative_us'] / 1000:8.1f} ms  {'  ' * entry['depth']}{entry['module']}")
+    print("\nPackages (self time):")
+    for package, self_us in summary["packages"]:
+        print(f"   {self_us / 1000:8.1f} ms  {package}")
+    return completed.returncode
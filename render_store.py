@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Render Output Store
+Goal: Keep upload/ bounded - index renderer output, evict least recently used renders, sweep orphans
+Tools: Python, SQLite
+
+Files managed under the upload root:
+    render_<product>_<ts>.jpg   renders served from the product gallery
+    catalog/*.jpg               catalog pre-renders
+    rendering/*                 uploaded kitchen and mask assets
+    slab_<id>.jpg               temporary slab downloads (orphaned after a render)
+    *.tmp                       partial writes left by an interrupted render
+
+Avatars, portfolio and profile images are user content and never touched.
+Images listed in the gallery manifest, current catalog renders and the
+inputs of unfinished journal jobs are protected from eviction and sweeping.
+
+Eviction goes by last access. The renderer records every file it writes,
+and the server notes the managed files it serves in an access log
+(render_access.json: {"accesses": {"/upload/<path>": <unix seconds>}}),
+which scan and sweep fold into the index before they look at it. File
+mtimes and atimes only stand in for files with no recorded access.
+
+    python slab_render.py store scan
+    python slab_render.py store sweep --budget 2G
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from render_io import read_json
+
+DEFAULT_ROOT = os.environ.get("RENDER_STORE_ROOT", "upload")
+INDEX_NAME = "render_store.sqlite3"
+GALLERY_MANIFEST_NAME = "gallery_manifest.json"
+ACCESS_LOG_NAME = "render_access.json"
+DEFAULT_TEMP_TTL = 60 * 60
+
+RENDER = "render"
+ASSET = "asset"
+TEMP_SLAB = "temp_slab"
+PARTIAL = "partial"
+
+MANAGED_SUBDIRS = {"catalog": RENDER, "rendering": ASSET}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".avif")
+RENDER_PATTERN = re.compile(r"^render_\d+_\d+\.\w+$")
+TEMP_SLAB_PATTERN = re.compile(r"^slab_\d+\.\w+$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+"""
+
+
+def parse_size(text):
+    """Parse a size such as ``500M`` or ``2G`` into bytes"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*", str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
+
+
+def classify(name, subdir=None):
+    """Kind of a file the renderer writes, or None for files the store leaves alone"""
+    if name.endswith(".tmp"):
+        return PARTIAL
+    if subdir is not None:
+        return MANAGED_SUBDIRS[subdir] if name.lower().endswith(IMAGE_EXTENSIONS) else None
+    if RENDER_PATTERN.match(name):
+        return RENDER
+    if TEMP_SLAB_PATTERN.match(name):
+        return TEMP_SLAB
+    return None
+
+
+class RenderStore:
+    """Index and housekeeping for renderer output under the upload root"""
+
+    def __init__(self, root=DEFAULT_ROOT, index_path=None):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.conn = sqlite3.connect(index_path or os.path.join(self.root, INDEX_NAME),
+                                    timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def relpath(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def record(self, path, accessed_at=None):
+        """Note a write or read of a managed file so LRU eviction sees it"""
+        rel = self.relpath(path)
+        if rel.startswith(".."):
+            return False
+        parts = rel.split(os.sep)
+        subdir = parts[0] if len(parts) == 2 and parts[0] in MANAGED_SUBDIRS else None
+        kind = classify(parts[-1], subdir) if len(parts) <= 2 else None
+        if kind is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        now = accessed_at or time.time()
+        self.conn.execute(
+            "INSERT INTO files (path, kind, size, mtime, last_access) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+            "last_access = MAX(files.last_access, excluded.last_access)",
+            (rel, kind, stat.st_size, stat.st_mtime, now),
+        )
+        return True
+
+    def import_accesses(self, log_path=None):
+        """
+        Record the accesses in the server's access log and remove it
+
+        The log is renamed aside before it is read, so accesses the server
+        flushes meanwhile land in a new log for the next run.
+
+        Returns:
+            int: Accesses recorded
+        """
+        log_path = log_path or os.path.join(self.root, ACCESS_LOG_NAME)
+        claimed = f"{log_path}.{os.getpid()}.importing"
+        try:
+            os.rename(log_path, claimed)
+        except FileNotFoundError:
+            return 0
+        try:
+            accesses = read_json(claimed).get("accesses", {})
+            recorded = 0
+            with self.conn:
+                for url, accessed_at in accesses.items():
+                    if url.startswith("/upload/"):
+                        path = os.path.join(self.root, os.path.normpath(url[len("/upload/"):]))
+                        recorded += self.record(path, float(accessed_at))
+            return recorded
+        finally:
+            os.unlink(claimed)
+
+    def scan(self):
+        """
+        Walk the managed directories once and refresh the index
+
+        Returns:
+            list: Entry dicts with path, kind, size, mtime and last_access
+        """
+        known = {row[0]: row[1] for row in self.conn.execute("SELECT path, last_access FROM files")}
+        entries = []
+
+        def visit(directory, subdir):
+            try:
+                iterator = os.scandir(directory)
+            except FileNotFoundError:
+                return
+            with iterator:
+                for entry in iterator:
+                    if subdir is None and entry.is_dir(follow_symlinks=False):
+                        if entry.name in MANAGED_SUBDIRS:
+                            visit(entry.path, entry.name)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    kind = classify(entry.name, subdir)
+                    if kind is None:
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    rel = entry.name if subdir is None else os.path.join(subdir, entry.name)
+                    # atime is only a hint (relatime/noatime mounts); recorded accesses win
+                    last_access = max(known.get(rel, 0), stat.st_mtime, stat.st_atime)
+                    entries.append({"path": rel, "kind": kind, "size": stat.st_size,
+                                    "mtime": stat.st_mtime, "last_access": last_access})
+
+        visit(self.root, None)
+        # Upserted rather than rebuilt, so recorded accesses survive the scan
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO files (path, kind, size, mtime, last_access) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET kind = excluded.kind, size = excluded.size, "
+                "mtime = excluded.mtime, last_access = MAX(files.last_access, excluded.last_access)",
+                [(e["path"], e["kind"], e["size"], e["mtime"], e["last_access"]) for e in entries],
+            )
+            self.conn.executemany("DELETE FROM files WHERE path = ?",
+                                  [(path,) for path in set(known) - {e["path"] for e in entries}])
+        return entries
+
+    def protected_paths(self, gallery_manifest=None, catalog_state=None, journal=None):
+        """
+        Relative paths that must survive eviction and sweeping
+
+        Returns:
+            tuple: (protected paths, whether the gallery manifest was found).
+            Without the manifest gallery images cannot be told apart from
+            unreferenced renders, so eviction must not run.
+        """
+        protected = set()
+        manifest_path = gallery_manifest or os.path.join(self.root, GALLERY_MANIFEST_NAME)
+        manifest_found = os.path.exists(manifest_path)
+        if manifest_found:
+            manifest = read_json(manifest_path)
+            urls = manifest.get("images", []) if isinstance(manifest, dict) else manifest
+            for url in urls:
+                if url.startswith("/upload/"):
+                    protected.add(os.path.normpath(url[len("/upload/"):]))
+
+        state_path = catalog_state or os.path.join(self.root, "catalog", "catalog_state.json")
+        if os.path.exists(state_path):
+            for scenes in read_json(state_path).get("renders", {}).values():
+                protected.update(self.relpath(render["output"]) for render in scenes.values())
+
+        if journal and os.path.exists(journal):
+            from render_journal import RenderJournal
+            store_journal = RenderJournal(journal)
+            try:
+                for job in store_journal.unfinished():
+                    paths = [path for path in job["inputs"].values() if isinstance(path, str)]
+                    for region in job["inputs"].get("regions", []):
+                        paths += [region["mask"], region["slab"]]
+                    protected.update(self.relpath(path) for path in paths)
+            finally:
+                store_journal.close()
+        return protected, manifest_found
+
+    def _delete(self, entry):
+        try:
+            os.unlink(os.path.join(self.root, entry["path"]))
+        except FileNotFoundError:
+            pass
+        self.conn.execute("DELETE FROM files WHERE path = ?", (entry["path"],))
+
+    def sweep_orphans(self, entries, protected, temp_ttl=DEFAULT_TEMP_TTL, dry_run=False):
+        """Delete stale temporary slab downloads and partial writes"""
+        cutoff = time.time() - temp_ttl
+        removed = []
+        for entry in entries:
+            if entry["kind"] not in (TEMP_SLAB, PARTIAL) or entry["mtime"] >= cutoff:
+                continue
+            if entry["path"] in protected:
+                continue
+            if not dry_run:
+                self._delete(entry)
+            removed.append(entry)
+        return removed
+
+    def enforce_budget(self, entries, protected, budget_bytes, dry_run=False):
+        """Evict least recently used renders and assets until the store fits the budget"""
+        live = [entry for entry in entries if entry["kind"] in (RENDER, ASSET)]
+        total = sum(entry["size"] for entry in live)
+        evicted = []
+        for entry in sorted(live, key=lambda e: e["last_access"]):
+            if total <= budget_bytes:
+                break
+            if entry["path"] in protected:
+                continue
+            if not dry_run:
+                self._delete(entry)
+            total -= entry["size"]
+            evicted.append(entry)
+        return evicted, total
+
+
+def record_outputs(paths, root=DEFAULT_ROOT):
+    """
+    Record files the renderer just wrote, if any are managed by the store
+
+    The index is only opened when a path lies under the upload root, and
+    bookkeeping failures never fail the render that wrote the files.
+    """
+    root = os.path.abspath(root)
+    paths = [path for path in paths if os.path.abspath(path).startswith(root + os.sep)]
+    if not paths:
+        return 0
+    try:
+        store = RenderStore(root)
+        try:
+            return sum(store.record(path) for path in paths)
+        finally:
+            store.close()
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Could not record renders in the store index: {e}", file=sys.stderr)
+        return 0
+
+
+def store_command(argv):
+    """CLI for ``slab_render.py store``: ``scan``, ``sweep`` and ``touch``"""
+    parser = argparse.ArgumentParser(prog="slab_render.py store",
+                                     description="Manage renderer output under the upload directory")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="Upload directory (default: %(default)s)")
+    parser.add_argument("--access-log", help="Server access log to record (default: <root>/%s)" % ACCESS_LOG_NAME)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("scan", help="Index managed files and print a size summary")
+
+    sweep_parser = commands.add_parser("sweep", help="Delete orphans and evict renders over the budget")
+    sweep_parser.add_argument("--budget", type=parse_size, help="Disk budget for renders and assets, e.g. 2G")
+    sweep_parser.add_argument("--temp-ttl", type=float, default=DEFAULT_TEMP_TTL,
+                              help="Seconds before temporary files count as orphaned")
+    sweep_parser.add_argument("--gallery-manifest", help="Gallery manifest (default: <root>/%s)" % GALLERY_MANIFEST_NAME)
+    sweep_parser.add_argument("--catalog-state", help="Catalog state file protecting catalog renders")
+    sweep_parser.add_argument("--journal", help="Render journal whose unfinished jobs are protected")
+    sweep_parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+
+    touch_parser = commands.add_parser("touch", help="Record an access to managed files")
+    touch_parser.add_argument("paths", nargs="+")
+
+    args = parser.parse_args(argv)
+    store = RenderStore(args.root)
+    try:
+        if args.command == "touch":
+            unmanaged = [path for path in args.paths if not store.record(path)]
+            for path in unmanaged:
+                print(f"⚠️ Not a managed render file: {path}", file=sys.stderr)
+            return 1 if unmanaged else 0
+
+        started = time.perf_counter()
+        accesses = store.import_accesses(args.access_log)
+        entries = store.scan()
+        summary = {"files": len(entries), "bytes": sum(entry["size"] for entry in entries), "accesses": accesses}
+        for entry in entries:
+            summary[f"{entry['kind']}_bytes"] = summary.get(f"{entry['kind']}_bytes", 0) + entry["size"]
+
+        if args.command == "sweep":
+            journal = args.journal
+            if journal is None:
+                from render_journal import DEFAULT_JOURNAL_PATH
+                journal = DEFAULT_JOURNAL_PATH
+            protected, manifest_found = store.protected_paths(args.gallery_manifest, args.catalog_state, journal)
+            if not manifest_found:
+                print("⚠️ Gallery manifest not found; skipping eviction and sweeping only orphans", file=sys.stderr)
+            removed = store.sweep_orphans(entries, protected, args.temp_ttl, args.dry_run)
+            summary["orphans_removed"] = len(removed)
+            summary["orphan_bytes"] = sum(entry["size"] for entry in removed)
+            if args.budget is not None and manifest_found:
+                evicted, remaining = store.enforce_budget(entries, protected, args.budget, args.dry_run)
+                summary["evicted"] = len(evicted)
+                summary["evicted_bytes"] = sum(entry["size"] for entry in evicted)
+                summary["managed_bytes_after"] = remaining
+            summary["dry_run"] = args.dry_run
+
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        print(json.dumps(summary, sort_keys=True))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(store_command(sys.argv[1:]))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tiled Rendering Helpers
+Goal: Render very large scenes in horizontal strips and stream the JPEG out strip by strip
+Tools: Python, NumPy, Pillow (libjpeg restart markers)
+
+Each strip is encoded on its own as a baseline JPEG whose restart interval
+spans exactly one strip. Those encodings share their tables with a
+whole-image encode and differ only in the frame height, so the output is
+the first strip's header (with the full height patched in) followed by
+every strip's scan data separated by restart markers. Only one strip of
+pixels and one strip of encoded bytes are held at a time.
+
+Progressive and optimized JPEG need the whole image before writing, so
+tiled output is always baseline with standard Huffman tables.
+"""
+
+import io
+import time
+
+from render_placeholder import BLURHASH_PROXY_SIZE
+from render_splice import EOI, MCU_SIZES, RESTART_MARKERS, parse_jpeg
+
+DEFAULT_STRIP_HEIGHT = 256
+# Longest side of the downscale kept for placeholders while strips stream past;
+# the blurhash proxy size, so the blurhash matches a whole-frame render's
+PREVIEW_SIZE = BLURHASH_PROXY_SIZE
+
+
+def preview_size(size):
+    """Placeholder preview size (width, height) for a render of size"""
+    ratio = min(1.0, PREVIEW_SIZE / max(size))
+    return max(1, round(size[0] * ratio)), max(1, round(size[1] * ratio))
+
+SOF0 = b"\xff\xc0"
+# The DRI restart interval is a 16-bit count of MCUs
+MAX_RESTART_INTERVAL = 0xFFFF
+
+
+def strip_height_for(strip_height, options, width=None):
+    """
+    Strip height rounded up to whole MCU rows of the encode options
+
+    With width, the height is also capped so one strip's MCUs fit in a
+    restart interval; wide 4:4:4 renders would otherwise overflow it.
+    """
+    mcu_width, mcu_height = MCU_SIZES[options["subsampling"]]
+    mcu_rows = max(1, -(-strip_height // mcu_height))
+    if width is not None:
+        mcu_rows = max(1, min(mcu_rows, MAX_RESTART_INTERVAL // -(-width // mcu_width)))
+    return mcu_rows * mcu_height
+
+
+def strips(height, strip_height):
+    """(top, bottom) rows of each strip"""
+    for top in range(0, height, strip_height):
+        yield top, min(height, top + strip_height)
+
+
+def patch_frame_height(header, height):
+    """Baseline JPEG header with the SOF0 frame height replaced"""
+    position = header.index(SOF0) + 5
+    return header[:position] + height.to_bytes(2, "big") + header[position + 2:]
+
+
+class StreamingJpegWriter:
+    """
+    Write a baseline JPEG one strip at a time
+
+    Strips must be written top to bottom, each ``strip_height`` rows tall
+    except the last.
+    """
+
+    def __init__(self, fp, size, options, strip_height):
+        self.fp = fp
+        self.width, self.height = size
+        self.strip_height = strip_height
+        mcu_height = MCU_SIZES[options["subsampling"]][1]
+        if strip_height % mcu_height:
+            raise ValueError(f"Strip height must be a multiple of {mcu_height} rows")
+        if strip_height != strip_height_for(strip_height, options, self.width):
+            raise ValueError(f"Strips of {strip_height} rows overflow the JPEG restart interval "
+                             f"at {self.width} pixels wide")
+        self.options = {"quality": options["quality"], "subsampling": options["subsampling"],
+                        "progressive": False, "optimize": False,
+                        "restart_marker_rows": strip_height // mcu_height}
+        self.rows_written = 0
+        self.bytes_written = 0
+        self.strips_written = 0
+        self.encode_seconds = 0.0
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.bytes_written += len(data)
+
+    def write_strip(self, array):
+        """Encode the next strip (an HxWx3 uint8 array) and append its scan data"""
+        from PIL import Image
+        rows = array.shape[0]
+        if array.shape[1] != self.width or (rows != self.strip_height and
+                                            self.rows_written + rows != self.height):
+            raise ValueError("Strip does not match the writer's layout")
+        started = time.perf_counter()
+        buffer = io.BytesIO()
+        Image.fromarray(array).save(buffer, "JPEG", **self.options)
+        header, intervals = parse_jpeg(buffer.getvalue())
+        self.encode_seconds += time.perf_counter() - started
+        if self.strips_written == 0:
+            self._write(patch_frame_height(header, self.height))
+        else:
+            self._write(RESTART_MARKERS[(self.strips_written - 1) % 8])
+        self._write(intervals[0])
+        self.rows_written += rows
+        self.strips_written += 1
+
+    def close(self):
+        """Finish the file; every row must have been written"""
+        if self.rows_written != self.height:
+            raise ValueError(f"Only {self.rows_written} of {self.height} rows were written")
+        self._write(EOI)
+
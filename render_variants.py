@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Variant Sweep
+Goal: Render many placements of one slab (rotations, mirroring, offsets) from a single resampled texture
+Tools: Python, NumPy
+
+The slab is resampled once, at a scale that covers the scene in every
+orientation. Each variant is then a rotated or mirrored view of that
+texture with a scene-sized window cut from it, so a variant costs one
+composite and one encode instead of a decode and resample. Since the
+texture must cover the scene in every rotation, variants are framed at a
+slightly different scale than single renders (see texture_size).
+
+Variant specs join options with "+":
+    original           the centred, unrotated framing
+    rot90 / rot180 / rot270
+                       rotate the slab counter-clockwise
+    mirror / flip      mirror left-right / top-bottom
+    shift=X,Y          move the window by X, Y in -1..1 of the spare texture
+                       on each axis (-1 is the left/top edge)
+
+e.g. ``rot90+shift=0.5,0`` or ``mirror+rot180``.
+"""
+
+import argparse
+import math
+import os
+import re
+
+from render_encode import PRESETS, default_preset
+from render_resample import AUTO, available_backends
+
+DEFAULT_VARIANTS = ("original", "rot90", "rot180", "mirror", "shift=-0.5,0", "shift=0.5,0")
+DEFAULT_CELL_WIDTH = 512
+
+
+def parse_variant(spec):
+    """Parse a variant spec into its name, rotation, mirroring and offset"""
+    variant = {"name": spec, "rotate": 0, "mirror": False, "flip": False, "offset": [0.0, 0.0]}
+    for option in spec.split("+"):
+        if option == "original":
+            continue
+        if option in ("rot90", "rot180", "rot270"):
+            variant["rotate"] = int(option[3:])
+        elif option in ("mirror", "flip"):
+            variant[option] = True
+        elif option.startswith("shift="):
+            try:
+                offset = [float(value) for value in option[len("shift="):].split(",")]
+            except ValueError:
+                offset = []
+            if len(offset) != 2 or not all(-1 <= value <= 1 for value in offset):
+                raise ValueError(f"Variant shift needs two values between -1 and 1: {spec}")
+            variant["offset"] = offset
+        else:
+            raise ValueError(f"Unknown variant option {option!r} in {spec}")
+    return variant
+
+
+def variant_filename(name):
+    """File-name-safe form of a variant spec"""
+    return re.sub(r"[^A-Za-z0-9.-]+", "_", name).strip("_") or "variant"
+
+
+def texture_size(slab_size, size, coverage):
+    """
+    Size of the one texture every variant is cut from
+
+    The slab is scaled so a scene-sized window fits in any of the four
+    rotations, coverage times over. That is framing over the whole scene
+    like render_countertop's, not over the mask's bounding box, but against
+    the scene's longest side: a non-square scene shows the veins a little
+    larger than a single render does. A slab smaller than the texture is
+    always resampled up; variants don't repeat it at native resolution the
+    way a render with --extend does.
+    """
+    width, height = size
+    longest = max(width, height)
+    scale = max(longest / slab_size[0], longest / slab_size[1]) * coverage
+    return max(longest, round(slab_size[0] * scale)), max(longest, round(slab_size[1] * scale))
+
+
+def variant_view(texture, size, variant):
+    """
+    Scene-sized window of the texture for a variant, as a view (no copy)
+    """
+    import numpy as np
+    view = texture
+    if variant["mirror"]:
+        view = view[:, ::-1]
+    if variant["flip"]:
+        view = view[::-1]
+    if variant["rotate"]:
+        view = np.rot90(view, variant["rotate"] // 90)
+    width, height = size
+    spare_x, spare_y = view.shape[1] - width, view.shape[0] - height
+    x = int(round(spare_x * (1 + variant["offset"][0]) / 2))
+    y = int(round(spare_y * (1 + variant["offset"][1]) / 2))
+    return view[y:y + height, x:x + width]
+
+
+def grid_layout(count, size, columns=None, cell_width=DEFAULT_CELL_WIDTH):
+    """
+    Columns, rows and cell size (width, height) of the variant grid
+    """
+    columns = columns or math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    cell_width = min(cell_width, size[0])
+    cell_height = max(1, round(size[1] * cell_width / size[0]))
+    return columns, rows, (cell_width, cell_height)
+
+
+def variants_command(argv, render):
+    """CLI for ``slab_render.py variants``"""
+    parser = argparse.ArgumentParser(prog="slab_render.py variants",
+                                     description="Render several placements of a slab from one resampled texture")
+    parser.add_argument("kitchen_image")
+    parser.add_argument("slab_image")
+    parser.add_argument("mask_image")
+    parser.add_argument("--variant", action="append", metavar="SPEC",
+                        help="Variant spec, repeatable (default: %s)" % " ".join(DEFAULT_VARIANTS))
+    parser.add_argument("--output-dir",
+                        help="Write each variant as <output-dir>/<slab>_<variant>.jpg (or the preset's .avif/.webp)")
+    parser.add_argument("--grid", help="Write all variants side by side into this one image")
+    parser.add_argument("--grid-columns", type=int, help="Grid columns (default: square-ish)")
+    parser.add_argument("--cell-width", type=int, default=DEFAULT_CELL_WIDTH, help="Grid cell width in pixels")
+    parser.add_argument("--resample", default=AUTO, choices=[AUTO] + available_backends(),
+                        help="Resampling backend (default: calibrated for this host)")
+    parser.add_argument("--preset", default=default_preset(), choices=list(PRESETS),
+                        help="Encoder preset (default: %(default)s)")
+    parser.add_argument("--partial-encode", action="store_true",
+                        help="Write variant files by re-encoding only the masked MCUs")
+    args = parser.parse_args(argv)
+    if not args.output_dir and not args.grid:
+        parser.error("give --output-dir, --grid or both")
+
+    variants = [parse_variant(spec) for spec in args.variant or DEFAULT_VARIANTS]
+    inputs = {"kitchen": os.path.abspath(args.kitchen_image), "slab": os.path.abspath(args.slab_image),
+              "mask": os.path.abspath(args.mask_image), "variants": variants,
+              "output": args.grid or args.output_dir, "output_dir": args.output_dir, "grid": args.grid,
+              "grid_columns": args.grid_columns, "cell_width": args.cell_width,
+              "resample": args.resample, "preset": args.preset, "partial": args.partial_encode}
+    result = render(inputs)
+
+    for variant in result["variants"]:
+        if variant.get("output"):
+            print(f"🪨 {variant['name']}: {variant['output']}")
+    if result.get("grid"):
+        print(f"🔲 Grid of {len(result['variants'])} variants saved to: {result['grid']['output']}")
+    print(f"✅ Rendered {len(result['variants'])} variants in {result['seconds'] * 1000:.0f} ms")
+    return 0
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Render Warmup
+Goal: Bring a render worker to steady-state latency before it takes jobs, and keep a baseline of that latency per host
+Tools: Python
+
+A warmup renders the bundled kitchen.jpg / slab.jpg / mask.png a few times
+into a scratch directory. The first round pays for the cold page cache,
+lazy codec and library initialization and first-touch allocations; the
+rest show what a warm worker costs. The timings are saved in the host
+profile under "warmup", and a warm round much slower than the saved
+baseline is reported, which catches a degraded host before it takes
+traffic.
+
+Workers that warm up only write their ready file once the warmup has
+finished, so a readiness probe (``test -f <ready file>``) keeps traffic
+away until then.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+from render_io import BASE_DIR, load_host_profile, update_host_profile, write_json_atomic
+
+DEFAULT_ROUNDS = 3
+# Warm renders this much slower than the host baseline are flagged
+REGRESSION_FACTOR = 1.5
+
+
+def warmup_inputs(output):
+    """Render job inputs for the bundled sample scene"""
+    return {"kitchen": os.path.join(BASE_DIR, "kitchen.jpg"), "slab": os.path.join(BASE_DIR, "slab.jpg"),
+            "mask": os.path.join(BASE_DIR, "mask.png"), "output": output}
+
+
+def warm_up(render, rounds=DEFAULT_ROUNDS, profile_path=None, record=True):
+    """
+    Render the sample scene ``rounds`` times and record the timings
+
+    Args:
+        render: Callable taking render job inputs, as used by the worker
+        record: Save the timings as the host's warmup baseline
+
+    Returns:
+        dict: Cold and warm seconds, the previous baseline and whether the
+        warm time regressed against it
+    """
+    previous = load_host_profile(profile_path).get("warmup")
+    samples = []
+    with tempfile.TemporaryDirectory(prefix="slab-render-warmup-") as scratch:
+        for index in range(max(1, rounds)):
+            started = time.perf_counter()
+            result = render(warmup_inputs(os.path.join(scratch, f"warmup_{index}.jpg")))
+            samples.append(time.perf_counter() - started)
+
+    warm = samples[1:] or samples
+    baseline = {
+        "cold_seconds": round(samples[0], 6),
+        "warm_seconds": round(statistics.median(warm), 6),
+        "rounds": len(samples),
+        "width": result.get("width"),
+        "height": result.get("height"),
+        "host": socket.gethostname(),
+        "measured_at": time.time(),
+    }
+    regressed = bool(previous and baseline["warm_seconds"] > previous["warm_seconds"] * REGRESSION_FACTOR)
+    if record:
+        update_host_profile("warmup", baseline, profile_path)
+    return dict(baseline, previous=previous, regressed=regressed)
+
+
+def report_warmup(stats):
+    """Print a warmup summary"""
+    print(f"🔥 Warmup: first render {stats['cold_seconds'] * 1000:.0f} ms, "
+          f"warm {stats['warm_seconds'] * 1000:.0f} ms over {stats['rounds']} rounds")
+    if stats["regressed"]:
+        print(f"⚠️ Warm render is slower than this host's baseline "
+              f"({stats['previous']['warm_seconds'] * 1000:.0f} ms)")
+
+
+def write_ready_file(path, stats):
+    """Mark this worker ready for a readiness probe"""
+    write_json_atomic(path, {"pid": os.getpid(), "host": socket.gethostname(), "ready_at": time.time(),
+                             "warm_seconds": stats["warm_seconds"] if stats else None})
+
+
+def remove_ready_file(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def warmup_command(argv, render):
+    """CLI for ``slab_render.py warmup``"""
+    parser = argparse.ArgumentParser(prog="slab_render.py warmup",
+                                     description="Render the bundled sample scene and record this host's baseline")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Sample renders, the first one cold")
+    parser.add_argument("--profile", help="Host profile to update (default: render_profile.json)")
+    parser.add_argument("--dry-run", action="store_true", help="Print timings without saving them")
+    parser.add_argument("--json", action="store_true", help="Print the timings as JSON")
+    args = parser.parse_args(argv)
+
+    stats = warm_up(render, args.rounds, args.profile, record=not args.dry_run)
+    if args.json:
+        print(json.dumps(stats, sort_keys=True))
+    else:
+        report_warmup(stats)
+        if not args.dry_run:
+            print("✅ Saved warmup baseline to host profile")
+    return 1 if stats["regressed"] else 0
@@ -1,4 +1,10 @@
 import { storage } from "./storage";
+import { exec } from "child_process";
+import { promisify } from "util";
+import path from "path";
+import fs from "fs/promises";
+
+const execAsync = promisify(exec);
 
 /**
  * Clean up expired AI-generated gallery images
@@ -36,4 +42,85 @@ export async function cleanupExpiredGalleryImages(): Promise<void> {
   } catch (error) {
     console.error('Error cleaning up expired images:', error);
   }
-}
\ No newline at end of file
+}
+
+/**
+ * Write the list of gallery image URLs for the Python render store
+ * Renders referenced here are never evicted by render_store.py
+ */
+export async function exportGalleryManifest(): Promise<string> {
+  const allProducts = await storage.getProducts();
+  const images: string[] = [];
+
+  for (const product of allProducts) {
+    const productImages = await storage.getGalleryImages(product.id);
+    images.push(...productImages.map((image) => image.imageUrl));
+    if (product.imageUrl) {
+      images.push(product.imageUrl);
+    }
+  }
+
+  const uploadDir = path.join(process.cwd(), 'upload');
+  const manifestPath = path.join(uploadDir, 'gallery_manifest.json');
+  const tempPath = `${manifestPath}.tmp`;
+  await fs.mkdir(uploadDir, { recursive: true });
+  await fs.writeFile(tempPath, JSON.stringify({ generatedAt: new Date().toISOString(), images }));
+  await fs.rename(tempPath, manifestPath);
+  return manifestPath;
+}
+
+// Renders, catalog pre-renders and render assets served since the last flush, by URL
+const renderAccesses = new Map<string, number>();
+const MANAGED_RENDER_PATH = /^\/(render_\d+_\d+\.\w+|(catalog|rendering)\/[^/]+)$/;
+
+/**
+ * Note a request for a file under /upload so render_store.py evicts by real use
+ */
+export function noteRenderAccess(urlPath: string): void {
+  if (MANAGED_RENDER_PATH.test(urlPath)) {
+    renderAccesses.set(`/upload${urlPath}`, Date.now() / 1000);
+  }
+}
+
+/**
+ * Merge the noted render accesses into upload/render_access.json for render_store.py
+ */
+export async function flushRenderAccesses(): Promise<void> {
+  if (renderAccesses.size === 0) {
+    return;
+  }
+  const uploadDir = path.join(process.cwd(), 'upload');
+  const logPath = path.join(uploadDir, 'render_access.json');
+  const tempPath = `${logPath}.tmp`;
+  let accesses: Record<string, number> = {};
+  try {
+    accesses = JSON.parse(await fs.readFile(logPath, 'utf8')).accesses ?? {};
+  } catch {
+    // No log yet, or render_store.py took it
+  }
+  const flushed = new Map(renderAccesses);
+  renderAccesses.clear();
+  flushed.forEach((accessedAt, url) => {
+    accesses[url] = Math.max(accesses[url] ?? 0, accessedAt);
+  });
+  await fs.mkdir(uploadDir, { recursive: true });
+  await fs.writeFile(tempPath, JSON.stringify({ accesses }));
+  await fs.rename(tempPath, logPath);
+}
+
+/**
+ * Sweep orphaned render files and evict old renders over the disk budget
+ * The budget comes from RENDER_STORE_BUDGET (e.g. "2G"); without it only orphans are removed
+ */
+export async function sweepRenderStore(): Promise<void> {
+  try {
+    await exportGalleryManifest();
+    await flushRenderAccesses();
+    const budget = process.env.RENDER_STORE_BUDGET;
+    const command = `python slab_render.py store sweep${budget ? ` --budget "${budget}"` : ''}`;
+    const { stdout } = await execAsync(command);
+    console.log('Render store sweep:', stdout.trim());
+  } catch (error) {
+    console.error('Error sweeping render store:', error);
+  }
+}
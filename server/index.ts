@@ -2,6 +2,8 @@ import express, { type Request, Response, NextFunction } from "express";
 import session from "express-session";
 import { registerRoutes } from "./routes";
 import { taskScheduler } from "./scheduled-tasks";
+import { resumeInterruptedPythonRenders } from "./python-rendering";
+import { noteRenderAccess } from "./cleanup-expired-images";
 import { setupVite, serveStatic, log } from "./vite";
 import path from "path";
 
@@ -14,7 +16,13 @@ declare module "express-session" {
 
 const app = express();
 
-// Serve static files from upload directory
+// Serve static files from upload directory, noting render accesses for the render store's eviction
+app.use('/upload', (req, _res, next) => {
+  if (req.method === 'GET') {
+    noteRenderAccess(req.path);
+  }
+  next();
+});
 app.use('/upload', express.static(path.join(process.cwd(), 'upload')));
 
 // Increase body size limit for file uploads and large requests
@@ -164,6 +172,11 @@ app.use((req, res, next) => {
         console.error('Failed to start scheduled tasks:', error);
         log('Scheduled maintenance tasks failed to start - will retry later');
       }
+
+      // Finish Python renders that a previous process left behind
+      resumeInterruptedPythonRenders().catch((error) => {
+        console.error('Failed to resume interrupted Python renders:', error);
+      });
     }, 10000); // Wait 10 seconds for database to stabilize
   });
 })();
@@ -1,9 +1,12 @@
-import { exec } from 'child_process';
+import { exec, execFile } from 'child_process';
 import { promisify } from 'util';
 import path from 'path';
 import fs from 'fs/promises';
+import crypto from 'crypto';
+import { storage } from './storage';
 
 const execAsync = promisify(exec);
+const execFileAsync = promisify(execFile);
 
 export interface PythonRenderRequest {
   productId: number;
@@ -13,11 +16,59 @@ export interface PythonRenderRequest {
   productName: string;
 }
 
+// Renders currently running, keyed by their inputs. Identical requests that
+// arrive while a render is in flight share its result instead of spawning
+// another Python process.
+const inFlightRenders = new Map<string, Promise<string | null>>();
+
+/**
+ * Build the coalescing key for a render request
+ * Only fields that change the rendered pixels take part in the key
+ */
+function renderRequestKey(request: PythonRenderRequest): string {
+  return crypto
+    .createHash('sha1')
+    .update(JSON.stringify([
+      request.productId,
+      request.slabImageUrl,
+      request.kitchenImageUrl || '',
+      request.maskImageUrl || ''
+    ]))
+    .digest('hex');
+}
+
+/**
+ * Check whether an identical render is already running
+ * Callers that join an in-flight render should not repeat its side effects
+ */
+export function isPythonRenderInFlight(request: PythonRenderRequest): boolean {
+  return inFlightRenders.has(renderRequestKey(request));
+}
+
 /**
  * Generate countertop render using Python-based image processing
  * This provides an alternative to AI-based rendering with more control
+ * Concurrent identical requests are coalesced into a single Python render
+ */
+export function generatePythonCountertopRender(request: PythonRenderRequest): Promise<string | null> {
+  const key = renderRequestKey(request);
+  const inFlight = inFlightRenders.get(key);
+  if (inFlight) {
+    console.log(`🔁 Joining in-flight Python render for product ${request.productId}`);
+    return inFlight;
+  }
+
+  const render = runPythonCountertopRender(request).finally(() => {
+    inFlightRenders.delete(key);
+  });
+  inFlightRenders.set(key, render);
+  return render;
+}
+
+/**
+ * Run a single Python render process for the request
  */
-export async function generatePythonCountertopRender(request: PythonRenderRequest): Promise<string | null> {
+async function runPythonCountertopRender(request: PythonRenderRequest): Promise<string | null> {
   try {
     console.log(`🐍 Starting Python-based rendering for product ${request.productId}`);
     
@@ -31,6 +82,15 @@ export async function generatePythonCountertopRender(request: PythonRenderReques
       throw new Error('Failed to download slab image');
     }
 
+    // Reject a corrupt, truncated or oversized slab from its header before the render decodes it
+    const problem = await probeImage(slabPath, { kitchenPath, maskPath });
+    if (problem) {
+      if (slabPath !== request.slabImageUrl) {
+        await fs.unlink(slabPath).catch(() => {});
+      }
+      throw new Error(`Slab image rejected: ${problem}`);
+    }
+
     // Generate unique output filename
     const timestamp = Date.now();
     const outputPath = path.join(process.cwd(), 'upload', `render_${request.productId}_${timestamp}.jpg`);
@@ -38,11 +98,16 @@ export async function generatePythonCountertopRender(request: PythonRenderReques
     // Ensure upload directory exists
     await fs.mkdir(path.dirname(outputPath), { recursive: true });
 
-    // Run Python script
-    const command = `python slab_render.py "${kitchenPath}" "${slabPath}" "${maskPath}" "${outputPath}"`;
-    console.log(`🔄 Executing: ${command}`);
+    // Run Python script; the job is journaled so an interrupted render can be resumed.
+    // Arguments are passed as an argv array, never through a shell
+    const jobId = path.basename(outputPath);
+    const args = [
+      'slab_render.py', '--journal', '--job-id', jobId, '--product-id', String(request.productId),
+      '--', kitchenPath, slabPath, maskPath, outputPath
+    ];
+    console.log(`🔄 Executing: python ${args.join(' ')}`);
     
-    const { stdout, stderr } = await execAsync(command);
+    const { stdout, stderr } = await execFileAsync('python', args);
     
     if (stderr) {
       console.error('Python script stderr:', stderr);
@@ -114,6 +179,34 @@ async function downloadImage(imageUrl: string, filename: string): Promise<string
   }
 }
 
+/**
+ * Check an image from its header with the Python probe
+ * Slabs are also routed for the scene they will be rendered into; kitchen and
+ * mask uploads (no scene) only get the header checks
+ * Returns the reason it can't be rendered, or null if it is fine
+ */
+async function probeImage(
+  filePath: string,
+  scene?: { kitchenPath: string; maskPath: string }
+): Promise<string | null> {
+  // The path comes from an uploaded file name, so it is passed as an argument, never through a shell
+  const args = ['slab_render.py', 'probe', '--json'];
+  args.push(...(scene ? ['--kitchen', scene.kitchenPath, '--mask', scene.maskPath] : ['--no-route']));
+  args.push('--', filePath);
+  let stdout = '';
+  try {
+    ({ stdout } = await execFileAsync('python', args));
+  } catch (error: any) {
+    // The probe exits non-zero when it rejects the image
+    stdout = error.stdout || '';
+  }
+  try {
+    return JSON.parse(stdout.trim().split('\n').pop() || '').error;
+  } catch {
+    return 'image could not be probed';
+  }
+}
+
 /**
  * Upload custom kitchen or mask image for rendering
  */
@@ -128,6 +221,14 @@ export async function uploadRenderingAsset(
     
     const filePath = path.join(uploadDir, `${type}_${Date.now()}_${filename}`);
     await fs.writeFile(filePath, file);
+
+    // Reject corrupt, truncated or oversized images from their headers before any render decodes them
+    const problem = await probeImage(filePath);
+    if (problem) {
+      await fs.unlink(filePath).catch(() => {});
+      console.error(`Rejected rendering asset ${filename}: ${problem}`);
+      return null;
+    }
     
     // Return relative path for web access
     return `/upload/rendering/${path.basename(filePath)}`;
@@ -136,4 +237,58 @@ export async function uploadRenderingAsset(
     console.error('Error uploading rendering asset:', error);
     return null;
   }
-}
\ No newline at end of file
+}
+
+/**
+ * Save a finished Python render to the product gallery
+ */
+export async function savePythonRenderToGallery(productId: number, productName: string, renderUrl: string): Promise<void> {
+  await storage.createGalleryImage({
+    productId,
+    imageUrl: renderUrl,
+    title: `${productName} Kitchen Visualization`,
+    description: `Realistic kitchen countertop render showing ${productName} natural stone`,
+    installationType: 'kitchen',
+    isAiGenerated: false,
+    isActive: true,
+    sortOrder: 0
+  });
+}
+
+/**
+ * Resume Python render jobs left unfinished by a restart or crash
+ * Recovered renders are saved to their product gallery like a normal render
+ */
+export async function resumeInterruptedPythonRenders(): Promise<number> {
+  let stdout = '';
+  try {
+    ({ stdout } = await execAsync('python slab_render.py journal --json resume'));
+  } catch (error: any) {
+    // A non-zero exit means some jobs failed again; the rest still completed
+    stdout = error.stdout || '';
+    console.error('Some journaled Python renders failed to resume:', error.stderr || error.message);
+  }
+
+  let recovered = 0;
+  for (const line of stdout.split('\n')) {
+    if (!line.startsWith('{')) continue;
+    try {
+      const job = JSON.parse(line);
+      const productId = job.inputs?.product_id;
+      if (job.state !== 'done' || typeof productId !== 'number') continue;
+
+      const product = await storage.getProduct(productId);
+      if (!product) continue;
+
+      await savePythonRenderToGallery(productId, product.name, `/upload/${path.basename(job.inputs.output)}`);
+      recovered++;
+    } catch (error) {
+      console.error('Failed to restore resumed Python render:', error);
+    }
+  }
+
+  if (recovered > 0) {
+    console.log(`🐍 Resumed ${recovered} interrupted Python render(s)`);
+  }
+  return recovered;
+}
@@ -9,7 +9,7 @@ import { sendQuoteEmail } from "./email";
 import { login, register, logout, getCurrentUser, requireAuth, requireRole, requireInventoryAccess, requirePricingAccess, hashPassword, verifyPassword } from "./auth";
 import { analyzeClientPurchases } from "./client-analysis";
 import { processSlabUpload } from "./ai-rendering";
-import { generatePythonCountertopRender, uploadRenderingAsset } from "./python-rendering";
+import { generatePythonCountertopRender, isPythonRenderInFlight, savePythonRenderToGallery, uploadRenderingAsset } from "./python-rendering";
 import { validateProductData, optimizeQuoteCalculations, cleanupExpiredData, generateHealthReport } from "./database-maintenance";
 import { db } from "./db";
 import { sql } from "drizzle-orm";
@@ -1133,24 +1133,21 @@ export async function registerRoutes(app: Express): Promise<Server> {
       }
       
       // Generate Python-based render
-      const renderUrl = await generatePythonCountertopRender({
+      const renderRequest = {
         productId: id,
         slabImageUrl: product.imageUrl,
         productName: product.name
-      });
+      };
+      // Requests that join an identical in-flight render share its result;
+      // only the request that started it saves the gallery image
+      const joinedInFlight = isPythonRenderInFlight(renderRequest);
+      const renderUrl = await generatePythonCountertopRender(renderRequest);
       
       if (renderUrl) {
         // Save the generated render to the product gallery
-        await storage.createGalleryImage({
-          productId: id,
-          imageUrl: renderUrl,
-          title: `${product.name} Kitchen Visualization`,
-          description: `Realistic kitchen countertop render showing ${product.name} natural stone`,
-          installationType: 'kitchen',
-          isAiGenerated: false,
-          isActive: true,
-          sortOrder: 0
-        });
+        if (!joinedInFlight) {
+          await savePythonRenderToGallery(id, product.name, renderUrl);
+        }
         
         res.json({ renderUrl, message: 'Python render generated successfully' });
       } else {
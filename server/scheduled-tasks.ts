@@ -1,5 +1,5 @@
 import { validateProductData, optimizeQuoteCalculations, cleanupExpiredData, generateHealthReport } from "./database-maintenance";
-import { cleanupExpiredGalleryImages } from "./cleanup-expired-images";
+import { cleanupExpiredGalleryImages, flushRenderAccesses, sweepRenderStore } from "./cleanup-expired-images";
 
 /**
  * Scheduled maintenance tasks to keep the CRM system running optimally
@@ -44,12 +44,22 @@ class TaskScheduler {
       try {
         await cleanupExpiredData();
         await cleanupExpiredGalleryImages();
+        await sweepRenderStore();
         console.log('Expired data cleaned up successfully');
       } catch (error) {
         console.error('Data cleanup failed:', error);
       }
     });
 
+    // Hand served renders to the render store hourly so a restart loses at most an hour of accesses
+    this.scheduleInterval('render-access-flush', 60 * 60 * 1000, async () => {
+      try {
+        await flushRenderAccesses();
+      } catch (error) {
+        console.error('Render access flush failed:', error);
+      }
+    });
+
     // Generate health report every 24 hours (reduced frequency to prevent connection issues)
     this.scheduleInterval('health-report', 24 * 60 * 60 * 1000, async () => {
       try {
@@ -5,13 +5,472 @@ Goal: Replace countertop in a kitchen image with a slab texture
 Tools: Python, OpenCV, rembg, NumPy, Pillow
 """
 
-import cv2
-import numpy as np
-from PIL import Image
+import argparse
 import sys
 import os
+import time
 
-def slab_to_countertop_replacement(kitchen_path, slab_path, mask_path, output_path):
+from render_journal import DEFAULT_JOURNAL_PATH, RenderJournal, job_id_for, journal_command, run_job
+from render_spool import spool_command
+from render_warmup import warmup_command
+from render_catalog import catalog_command
+from render_resample import AUTO, available_backends, calibrate_command, resize
+from render_encode import (DEFAULT_PRESET, FORMAT_EXTENSIONS, PRESETS, bench_command, default_preset, encode,
+                           encode_partial, open_stream, output_format, stream_stats)
+from render_tiled import DEFAULT_STRIP_HEIGHT, preview_size, strips
+from render_regions import mask_bounds, scene_command, sub_box
+from render_variants import DEFAULT_CELL_WIDTH, grid_layout, texture_size, variant_filename, variant_view, variants_command
+from render_placeholder import placeholder
+from render_io import write_json_atomic
+from render_arena import arena_for, arena_stats
+from render_metrics import observe_render, time_stage
+from render_capture import capture_render
+from render_memory import account_memory, default_budget_bytes, plan_render
+from render_probe import probe_command, require_image
+from render_responsive import responsive_command
+from render_dedupe import dedupe_command
+from render_extend import MODES as EXTEND_MODES, extended_frame
+from render_similar import similar_command
+from render_palette import palette_command
+from render_autotune import autotune_command
+from render_store import record_outputs, store_command
+
+# How far the slab is scaled past the kitchen so its texture reads clearly
+SLAB_COVERAGE = 1.5
+
+def load_rgb(path):
+    """Decode an image into an HxWx3 uint8 array"""
+    import numpy as np
+    from PIL import Image
+    return np.asarray(Image.open(path).convert("RGB"))
+
+def load_mask(path, size, resample=AUTO):
+    """Decode a grayscale mask resized to size (width, height)"""
+    import numpy as np
+    from PIL import Image
+    mask = np.asarray(Image.open(path).convert("L"))
+    if (mask.shape[1], mask.shape[0]) != size:
+        mask = resize(mask, size, resample)
+    return mask
+
+def slab_box(slab_size, size, coverage=SLAB_COVERAGE, center=(0.5, 0.5)):
+    """
+    Source box (x0, y0, x1, y1) of the slab that frames a scene of size
+    
+    The slab is scaled coverage times past the scene so the texture reads
+    clearly, and the window around center (fractions of the slab) is
+    cropped to the scene.
+    """
+    width, height = size
+    slab_width, slab_height = slab_size
+    scale_factor = max(width / slab_width, height / slab_height) * coverage
+    x_offset = int((int(slab_width * scale_factor) - width) * center[0])
+    y_offset = int((int(slab_height * scale_factor) - height) * center[1])
+    return (x_offset / scale_factor, y_offset / scale_factor,
+            (x_offset + width) / scale_factor, (y_offset + height) / scale_factor)
+
+def slab_decode_size(slab_size, size, coverage=SLAB_COVERAGE):
+    """Smallest slab size that still has a source pixel for every scene pixel"""
+    x0, y0, x1, y1 = slab_box(slab_size, size, coverage)
+    scale = size[0] / (x1 - x0)
+    return int(slab_size[0] * scale), int(slab_size[1] * scale)
+
+def upscales(slab_size, size, coverage=SLAB_COVERAGE):
+    """Whether framing the slab over a scene of size scales it up"""
+    x0, y0, x1, y1 = slab_box(slab_size, size, coverage)
+    return x1 - x0 < size[0]
+
+def frame_slab(slab, size, resample=AUTO, extend=None):
+    """
+    Scale the slab to cover the scene and crop its center to size
+    
+    Only the centered window that survives the crop is resampled, straight
+    to the output size. With extend ("tile" or "mirror"), a slab that would
+    be scaled up is repeated at native resolution instead (see render_extend.py).
+    """
+    slab_size = (slab.shape[1], slab.shape[0])
+    if extend and upscales(slab_size, size):
+        return extended_frame(slab, size, extend, resample)
+    box = slab_box(slab_size, size)
+    return resize(slab, size, resample, box=box)
+
+def composite(kitchen, slab, alpha, arena=None, out=None):
+    """
+    Blend slab over kitchen where alpha (0-255) allows, rounding like alpha_composite
+    
+    With an arena the working planes and the result come from its reused
+    buffers, so the returned array is overwritten by the next composite.
+    out (arena only) receives the result instead and may be kitchen itself.
+    """
+    import numpy as np
+    if arena is None:
+        a = alpha[:, :, None].astype(np.uint16)
+        blended = slab.astype(np.uint16) * a + kitchen.astype(np.uint16) * (255 - a) + 127
+        return (blended // 255).astype(np.uint8)
+    
+    shape = kitchen.shape
+    a = arena.get("alpha", shape[:2] + (1,), np.uint16)
+    blended = arena.get("blended", shape, np.uint16)
+    scratch = arena.get("scratch", shape, np.uint16)
+    result = arena.get("composite", shape, np.uint8) if out is None else out
+    np.copyto(a, alpha[:, :, None])
+    np.multiply(slab, a, out=blended)
+    np.subtract(255, a, out=a)
+    np.multiply(kitchen, a, out=scratch)
+    blended += scratch
+    blended += 127
+    # blended // 255 without a division: exact for blended <= 255 * 255 + 127
+    np.right_shift(blended, 8, out=scratch)
+    scratch += blended
+    scratch += 1
+    scratch >>= 8
+    np.copyto(result, scratch, casting="unsafe")
+    return result
+
+def open_large_image(path):
+    """Open an image lazily without Pillow's decompression bomb limit"""
+    from PIL import Image
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        return Image.open(path)
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+def decode_image(image, mode, draft_size=None):
+    """
+    Decode an opened image into mode
+    
+    With draft_size, JPEGs are decoded at the smallest 1/2, 1/4 or 1/8
+    scale that still covers it.
+    """
+    if draft_size:
+        image.draft(mode, draft_size)
+    image.load()
+    return image if image.mode == mode else image.convert(mode)
+
+def render_countertop_tiled(kitchen_path, slab_path, mask_path, output_path, resample=AUTO,
+                            preset=DEFAULT_PRESET, strip_height=None, extend=None):
+    """
+    Render in horizontal strips, streaming the JPEG out as strips finish
+    
+    Working memory is bounded by the strip size: the kitchen and mask are
+    held as decoded 8-bit images, the slab is decoded only as finely as the
+    scene needs, and each strip resamples just its window of the slab and
+    mask. Output is a baseline JPEG with the preset's quality and
+    subsampling. A slab extended instead of upscaled (see frame_slab) is
+    small by definition, so its scene-sized texture is built up front and
+    strips are cut from it.
+    
+    Returns:
+        dict: Render result shaped like render_countertop's
+    """
+    import numpy as np
+    with time_stage("decode"):
+        kitchen = decode_image(open_large_image(kitchen_path), "RGB")
+        size = width, height = kitchen.size
+    
+        # Decode the slab at the coarsest JPEG scale that still covers its scaled size
+        slab = open_large_image(slab_path)
+        slab_size = slab.size
+        texture = None
+        if extend and upscales(slab_size, size):
+            texture = extended_frame(np.asarray(decode_image(slab, "RGB")), size, extend, resample)
+        else:
+            x0, y0, x1, y1 = slab_box(slab_size, size)
+            slab = decode_image(slab, "RGB", slab_decode_size(slab_size, size))
+            reduction = slab_size[0] / slab.size[0]
+            x0, y0, x1, y1 = x0 / reduction, y0 / reduction, x1 / reduction, y1 / reduction
+    
+        mask = decode_image(open_large_image(mask_path), "L")
+        mask_scale = mask.size[1] / height
+    
+    # Placeholder source: strips are box-filtered across as they pass and the
+    # narrow column is box-filtered down at the end, the two passes Pillow
+    # makes over a whole frame
+    preview_width, preview_height = preview_size(size)
+    columns = np.empty((height, preview_width, 3), np.uint8)
+    
+    # Resample, composite and encode interleave strip by strip
+    with time_stage("strips"):
+        temp_path = f"{output_path}.tmp"
+        with open(temp_path, "wb") as f:
+            writer = open_stream(f, size, preset, strip_height)
+            arena = arena_for((width, writer.strip_height))
+            slab_rows = (y1 - y0) / height if texture is None else None
+            for top, bottom in strips(height, writer.strip_height):
+                rows = bottom - top
+                scene = np.asarray(kitchen.crop((0, top, width, bottom)))
+                if texture is not None:
+                    slab_strip = texture[top:bottom]
+                else:
+                    slab_strip = resize(slab, (width, rows), resample,
+                                        box=(x0, y0 + top * slab_rows, x1, y0 + bottom * slab_rows))
+                if mask.size == size:
+                    alpha = np.asarray(mask.crop((0, top, width, bottom)))
+                else:
+                    alpha = resize(mask, (width, rows), resample,
+                                   box=(0, top * mask_scale, mask.size[0], bottom * mask_scale))
+                result = composite(scene, slab_strip, alpha, arena)
+                writer.write_strip(result)
+                columns[top:bottom] = resize(result, (preview_width, rows), "pil-box")
+            writer.close()
+        os.replace(temp_path, output_path)
+    
+    return {"output": output_path, "width": width, "height": height, "encode": stream_stats(preset, writer),
+            "placeholder": dict(placeholder(resize(columns, (preview_width, preview_height), "pil-box")),
+                                width=width, height=height),
+            "buffers": arena_stats()}
+
+def render_scene(kitchen_path, regions, output_path, resample=AUTO, preset=DEFAULT_PRESET, partial=False):
+    """
+    Render every region of a multi-region scene with one decode and one encode
+    
+    Args:
+        regions: Regions with label, mask, slab and framing (see render_regions.py),
+            painted in order
+    
+    Each region resamples its slab only over the bounding box of its mask
+    and blends into the scene in place; a slab shared by regions is
+    decoded once.
+    
+    Returns:
+        dict: Render result shaped like render_countertop's, plus the
+        regions with their mask bounds
+    """
+    import numpy as np
+    kitchen = load_rgb(kitchen_path)
+    size = (kitchen.shape[1], kitchen.shape[0])
+    arena = arena_for(size)
+    final_result = arena.get("scene", kitchen.shape)
+    np.copyto(final_result, kitchen)
+    if partial:
+        # Union of the region masks: the MCUs that differ from the scene
+        coverage = arena.get("coverage", kitchen.shape[:2])
+        coverage.fill(0)
+    
+    slabs = {}
+    rendered = []
+    for region in regions:
+        alpha = load_mask(region["mask"], size, resample)
+        bounds = mask_bounds(alpha)
+        rendered.append({"label": region["label"], "slab": region["slab"], "bounds": bounds})
+        if bounds is None:
+            continue
+        if region["slab"] not in slabs:
+            slabs[region["slab"]] = load_rgb(region["slab"])
+        slab = np.rot90(slabs[region["slab"]], region.get("rotate", 0) // 90)
+        
+        x0, y0, x1, y1 = bounds
+        box = slab_box((slab.shape[1], slab.shape[0]), size, region.get("coverage", SLAB_COVERAGE),
+                       region.get("center", (0.5, 0.5)))
+        window = resize(np.ascontiguousarray(slab), (x1 - x0, y1 - y0), resample, box=sub_box(box, size, bounds))
+        target = final_result[y0:y1, x0:x1]
+        composite(target, window, alpha[y0:y1, x0:x1], arena, out=target)
+        if partial:
+            np.maximum(coverage[y0:y1, x0:x1], alpha[y0:y1, x0:x1], out=coverage[y0:y1, x0:x1])
+    
+    temp_path = f"{output_path}.tmp"
+    if partial:
+        encoded = encode_partial(kitchen_path, kitchen, final_result, coverage, temp_path, preset)
+    else:
+        encoded = encode(final_result, temp_path, preset, resample, name=output_path)
+    os.replace(temp_path, output_path)
+    
+    return {"output": output_path, "width": size[0], "height": size[1], "encode": encoded,
+            "placeholder": placeholder(final_result), "regions": rendered, "buffers": arena_stats()}
+
+def render_variant_sweep(kitchen_path, slab_path, mask_path, variants, output_dir=None, grid_path=None,
+                         grid_columns=None, cell_width=DEFAULT_CELL_WIDTH, resample=AUTO, preset=DEFAULT_PRESET,
+                         partial=False):
+    """
+    Render several placements of one slab from a single resampled texture
+    
+    Args:
+        variants: Parsed variant specs (see render_variants.py)
+        output_dir: Write each variant here as <slab>_<variant>.jpg (.avif or
+            .webp for presets that write those)
+        grid_path: Write all variants, downscaled to cell_width, into one image
+    
+    Returns:
+        dict: Per-variant outputs and encode stats, the grid's, and the sweep time
+    """
+    import numpy as np
+    started = time.perf_counter()
+    kitchen = load_rgb(kitchen_path)
+    size = (kitchen.shape[1], kitchen.shape[0])
+    alpha = load_mask(mask_path, size, resample)
+    slab = load_rgb(slab_path)
+    slab_size = (slab.shape[1], slab.shape[0])
+    
+    # Grid cells are composited at cell size from their own downscaled
+    # texture, scene and mask, so the grid costs about one render
+    if grid_path:
+        columns, rows, cell_size = grid_layout(len(variants), size, grid_columns, cell_width)
+        grid = np.full((rows * cell_size[1], columns * cell_size[0], 3), 255, np.uint8)
+        cell_texture = resize(slab, texture_size(slab_size, cell_size, SLAB_COVERAGE), resample)
+        cell_kitchen = resize(kitchen, cell_size, resample)
+        cell_alpha = resize(alpha, cell_size, resample)
+        cell_arena = arena_for(cell_size)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        texture = resize(slab, texture_size(slab_size, size, SLAB_COVERAGE), resample)
+        arena = arena_for(size)
+    del slab
+    stem = os.path.splitext(os.path.basename(slab_path))[0]
+    extension = ".jpg" if partial else FORMAT_EXTENSIONS[output_format(preset)]
+    
+    rendered = []
+    for index, variant in enumerate(variants):
+        entry = {"name": variant["name"]}
+        if output_dir:
+            final_result = composite(kitchen, variant_view(texture, size, variant), alpha, arena)
+            output_path = os.path.join(output_dir, f"{stem}_{variant_filename(variant['name'])}{extension}")
+            temp_path = f"{output_path}.tmp"
+            if partial:
+                entry["encode"] = encode_partial(kitchen_path, kitchen, final_result, alpha, temp_path, preset)
+            else:
+                entry["encode"] = encode(final_result, temp_path, preset, resample)
+            os.replace(temp_path, output_path)
+            entry["output"] = output_path
+        if grid_path:
+            row, column = divmod(index, columns)
+            top, left = row * cell_size[1], column * cell_size[0]
+            cell = grid[top:top + cell_size[1], left:left + cell_size[0]]
+            composite(cell_kitchen, variant_view(cell_texture, cell_size, variant), cell_alpha, cell_arena, out=cell)
+        rendered.append(entry)
+    
+    result = {"output": grid_path or output_dir, "width": size[0], "height": size[1], "variants": rendered,
+              "grid": None}
+    if grid_path:
+        temp_path = f"{grid_path}.tmp"
+        encoded = encode(grid, temp_path, preset, resample, name=grid_path)
+        os.replace(temp_path, grid_path)
+        result["grid"] = {"output": grid_path, "columns": columns, "rows": rows, "encode": encoded,
+                          "placeholder": placeholder(grid)}
+    result["seconds"] = round(time.perf_counter() - started, 6)
+    result["buffers"] = arena_stats()
+    return result
+
+def slab_scale(kitchen_path, slab_path, coverage=SLAB_COVERAGE):
+    """Factor framing scales the slab by for a scene, from the image headers"""
+    kitchen, slab = require_image(kitchen_path), require_image(slab_path)
+    size = (kitchen["width"], kitchen["height"])
+    x0, y0, x1, y1 = slab_box((slab["width"], slab["height"]), size, coverage)
+    return size[0] / (x1 - x0)
+
+def plan_memory(kitchen_path, slab_path, mask_path, budget_bytes, strip_height=None):
+    """Choose full, draft or tiled rendering for a memory budget from the image headers (see render_memory.py)"""
+    kitchen, slab, mask = (require_image(path) for path in (kitchen_path, slab_path, mask_path))
+    size, slab_size = (kitchen["width"], kitchen["height"]), (slab["width"], slab["height"])
+    return plan_render(size, slab_size, (mask["width"], mask["height"]), slab_decode_size(slab_size, size),
+                       slab["format"], budget_bytes, strip_height)
+
+def render_countertop(kitchen_path, slab_path, mask_path, output_path, resample=AUTO, preset=DEFAULT_PRESET,
+                      partial=False, tiled=False, strip_height=None, draft=False, memory_budget=None,
+                      extend=None):
+    """
+    Render the slab into the kitchen countertop and save it to output_path
+    
+    Raises on any failure. The output is written to a temporary file and
+    renamed into place, so output_path only ever holds a complete render.
+    With partial, only the MCUs under the mask are re-encoded and spliced
+    into the kitchen's cached JPEG encoding. With tiled, the render runs in
+    strips of strip_height rows (see render_countertop_tiled). With draft, a
+    JPEG slab is decoded at the coarsest scale that still covers the scene.
+    With extend ("tile" or "mirror"), a slab too small to cover the scene is
+    repeated at native resolution rather than upscaled. With memory_budget
+    (bytes), full, draft or tiled rendering is chosen from the image headers
+    to stay under it; a budget that needs tiling overrides partial.
+    
+    Returns:
+        dict: Render result with the output path, dimensions, encode stats
+        and a placeholder (inline JPEG and blurhash) for the page to paint first,
+        plus the process's buffer arena counters and any memory plan
+    """
+    # Corrupt, truncated or absurdly large inputs, and an output name the preset
+    # can't write, are refused before decoding
+    output_format(preset, output_path)
+    plan = None
+    if memory_budget:
+        plan = plan_memory(kitchen_path, slab_path, mask_path, memory_budget, strip_height)
+        if plan["mode"] == "tiled" and not tiled:
+            tiled, partial = True, False
+        draft = draft or plan["mode"] == "draft"
+    else:
+        for path in (kitchen_path, slab_path, mask_path):
+            require_image(path)
+    
+    if tiled:
+        if partial:
+            raise ValueError("Partial encoding cannot be combined with a tiled render")
+        result = render_countertop_tiled(kitchen_path, slab_path, mask_path, output_path, resample, preset,
+                                         strip_height, extend)
+        return dict(result, memory_plan=plan) if plan else result
+    
+    # Load images
+    with time_stage("decode"):
+        kitchen = load_rgb(kitchen_path)
+        size = (kitchen.shape[1], kitchen.shape[0])
+        if draft:
+            import numpy as np
+            slab = open_large_image(slab_path)
+            slab = np.asarray(decode_image(slab, "RGB", slab_decode_size(slab.size, size)))
+        else:
+            slab = load_rgb(slab_path)
+    
+    # Scale the slab over the kitchen and resize the mask to match
+    # (white areas of the mask show the slab, black areas keep the kitchen)
+    with time_stage("resample"):
+        slab_framed = frame_slab(slab, size, resample, extend)
+        alpha = load_mask(mask_path, size, resample)
+    
+    # Composite: slab on top of kitchen where mask allows, in this resolution's reused buffers
+    with time_stage("composite"):
+        final_result = composite(kitchen, slab_framed, alpha, arena_for(size))
+    
+    # Save result
+    temp_path = f"{output_path}.tmp"
+    with time_stage("encode"):
+        if partial:
+            encoded = encode_partial(kitchen_path, kitchen, final_result, alpha, temp_path, preset)
+        else:
+            encoded = encode(final_result, temp_path, preset, resample, name=output_path)
+        os.replace(temp_path, output_path)
+    
+    with time_stage("placeholder"):
+        preview = placeholder(final_result)
+    result = {"output": output_path, "width": size[0], "height": size[1], "encode": encoded,
+              "placeholder": preview, "buffers": arena_stats()}
+    return dict(result, memory_plan=plan) if plan else result
+
+def report_render(result, manifest_path=None):
+    """Print a finished render and optionally write its result manifest"""
+    print(f"✅ Slab rendering completed successfully!")
+    print(f"📁 Output saved to: {result['output']}")
+    encoded = result.get("encode")
+    if encoded:
+        print(f"🗜️ Encoded {encoded['format']} ({encoded['preset']}): "
+              f"{encoded['bytes'] / 1024:.1f} KiB in {encoded['encode_seconds'] * 1000:.1f} ms")
+        if encoded.get("mode") == "partial":
+            print(f"🧩 Re-encoded {encoded['mcus_encoded']} of {encoded['mcus_total']} MCUs")
+        elif encoded.get("mode") == "tiled":
+            print(f"🧱 Streamed {encoded['strips']} strips")
+    plan = result.get("memory_plan")
+    if plan:
+        print(f"🧮 Memory budget {plan['budget_bytes'] / 2**20:.0f} MiB: rendered {plan['mode']} "
+              f"(estimated {plan['estimates'][plan['mode']] / 2**20:.0f} MiB)")
+    memory = result.get("memory")
+    if memory:
+        print(f"📈 Peak memory {memory['peak_bytes'] / 2**20:.0f} MiB "
+              f"({memory['added_bytes'] / 2**20:+.0f} MiB during the render)")
+    if manifest_path:
+        write_json_atomic(manifest_path, result)
+        print(f"🧾 Result manifest saved to: {manifest_path}")
+
+def slab_to_countertop_replacement(kitchen_path, slab_path, mask_path, output_path, resample=AUTO,
+                                   preset=DEFAULT_PRESET, partial=False, manifest_path=None, tiled=False,
+                                   strip_height=None, memory_budget=None, extend=None):
     """
     Replace countertop in kitchen image with slab texture using mask
     
@@ -20,82 +479,175 @@ def slab_to_countertop_replacement(kitchen_path, slab_path, mask_path, output_pa
         slab_path: Path to slab texture image
         mask_path: Path to mask (white = areas to replace, black = keep)
         output_path: Path to save the final rendered image
+        resample: Resampling backend name, or "auto" for the host calibration
+        preset: Encoder preset name (gallery, thumbnail or print)
+        partial: Re-encode only the masked MCUs into the kitchen's cached JPEG
+        manifest_path: Optional path for the JSON render result
+        tiled: Render in strips with memory bounded by strip_height rows
+        memory_budget: Bytes the render should stay under, choosing draft or tiled rendering
+        extend: "tile" or "mirror" to repeat a small slab instead of upscaling it
     
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        # Load images
-        kitchen = Image.open(kitchen_path).convert("RGBA")
-        slab = Image.open(slab_path).convert("RGBA")
-        mask = Image.open(mask_path).convert("L")  # Grayscale mask
-        
-        # Scale slab to be large enough to show the texture clearly
-        # Make slab larger than kitchen to ensure good coverage
-        scale_factor = max(kitchen.width / slab.width, kitchen.height / slab.height) * 1.5
-        new_width = int(slab.width * scale_factor)
-        new_height = int(slab.height * scale_factor)
-        
-        # Resize slab with high quality
-        slab_resized = slab.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Center the slab over the kitchen image
-        if slab_resized.width > kitchen.width:
-            x_offset = (slab_resized.width - kitchen.width) // 2
-            slab_resized = slab_resized.crop((x_offset, 0, x_offset + kitchen.width, slab_resized.height))
-        
-        if slab_resized.height > kitchen.height:
-            y_offset = (slab_resized.height - kitchen.height) // 2
-            slab_resized = slab_resized.crop((0, y_offset, slab_resized.width, y_offset + kitchen.height))
-        
-        # If slab is still smaller than kitchen, resize to match
-        if slab_resized.width != kitchen.width or slab_resized.height != kitchen.height:
-            slab_resized = slab_resized.resize(kitchen.size, Image.Resampling.LANCZOS)
-        
-        # Resize mask to match kitchen image dimensions
-        mask_resized = mask.resize(kitchen.size)
-        
-        # Convert mask to RGBA for proper compositing
-        mask_rgba = Image.new("RGBA", kitchen.size, (0, 0, 0, 0))
-        mask_rgba.paste(mask_resized, (0, 0))
-        
-        # Create alpha channel from mask (white areas become opaque, black areas transparent)
-        alpha = np.array(mask_resized)
-        
-        # Apply mask to slab - only show slab where mask is white
-        slab_with_alpha = slab_resized.copy()
-        slab_array = np.array(slab_with_alpha)
-        slab_array[:, :, 3] = alpha  # Set alpha channel based on mask
-        slab_masked = Image.fromarray(slab_array, 'RGBA')
-        
-        # Composite: slab on top of kitchen where mask allows
-        result = Image.alpha_composite(kitchen, slab_masked)
-        
-        # Convert back to RGB for final output
-        final_result = result.convert("RGB")
-        
-        # Save result
-        final_result.save(output_path, "JPEG", quality=95)
-        
-        print(f"✅ Slab rendering completed successfully!")
-        print(f"📁 Output saved to: {output_path}")
+        result = render_countertop(kitchen_path, slab_path, mask_path, output_path, resample, preset, partial,
+                                   tiled, strip_height, memory_budget=memory_budget, extend=extend)
+        report_render(result, manifest_path)
         return True
         
     except Exception as e:
         print(f"❌ Error during slab rendering: {str(e)}")
         return False
 
+def render_mode(inputs):
+    """Metrics label for the kind of render a job's inputs ask for"""
+    if "variants" in inputs:
+        return "variants"
+    if "regions" in inputs:
+        return "scene"
+    if inputs.get("tiled"):
+        return "tiled"
+    return "partial" if inputs.get("partial") else "full"
+
+def render_job(inputs):
+    """
+    Render a journaled job from its recorded inputs, counting it in the
+    render metrics and capturing its profile if it is slow (render_capture.py)
+    """
+    mode = render_mode(inputs)
+    with observe_render(mode) as observation, capture_render(inputs, mode, observation):
+        with account_memory() as memory:
+            result = dispatch_render(inputs)
+        observation["result"] = dict(result, memory=memory.summary())
+    # Fresh renders under upload/ start out recently used for the store's LRU eviction
+    record_outputs(output_files(result))
+    return observation["result"]
+
+def output_files(result):
+    """Files a render result wrote"""
+    paths = [variant["output"] for variant in result.get("variants", []) if variant.get("output")]
+    if result.get("grid"):
+        paths.append(result["grid"]["output"])
+    elif "variants" not in result:
+        paths.append(result["output"])
+    return paths
+
+def dispatch_render(inputs):
+    """Run the render a job's inputs describe"""
+    if "variants" in inputs:
+        return render_variant_sweep(inputs["kitchen"], inputs["slab"], inputs["mask"], inputs["variants"],
+                                    output_dir=inputs.get("output_dir"), grid_path=inputs.get("grid"),
+                                    grid_columns=inputs.get("grid_columns"),
+                                    cell_width=inputs.get("cell_width", DEFAULT_CELL_WIDTH),
+                                    resample=inputs.get("resample", AUTO),
+                                    preset=inputs.get("preset") or default_preset(),
+                                    partial=inputs.get("partial", False))
+    if "regions" in inputs:
+        return render_scene(inputs["kitchen"], inputs["regions"], inputs["output"],
+                            resample=inputs.get("resample", AUTO),
+                            preset=inputs.get("preset") or default_preset(),
+                            partial=inputs.get("partial", False))
+    return render_countertop(inputs["kitchen"], inputs["slab"], inputs["mask"], inputs["output"],
+                             resample=inputs.get("resample", AUTO),
+                             preset=inputs.get("preset") or default_preset(),
+                             partial=inputs.get("partial", False),
+                             tiled=inputs.get("tiled", False),
+                             strip_height=inputs.get("strip_height"),
+                             draft=inputs.get("draft", False),
+                             memory_budget=inputs.get("memory_budget") or default_budget_bytes(),
+                             extend=inputs.get("extend"))
+
+def journaled_render(journal_path, job_id, inputs, manifest_path=None):
+    """
+    Record the render in the journal, then run it
+    
+    Returns:
+        bool: True if the job finished successfully
+    """
+    journal = RenderJournal(journal_path)
+    try:
+        journal.enqueue(job_id, inputs)
+        job = run_job(journal, job_id, render_job)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return False
+    finally:
+        journal.close()
+    
+    if job["state"] == "failed":
+        print(f"❌ Error during slab rendering: {job['error']}")
+        return False
+    report_render(job["result"], manifest_path)
+    return True
+
+# Subcommands dispatched on the first argument; anything else is a render
+COMMANDS = {
+    "journal": lambda argv: journal_command(argv, render_job),
+    "spool": lambda argv: spool_command(argv, render_job),
+    "catalog": lambda argv: catalog_command(argv, render_job),
+    "scene": lambda argv: scene_command(argv, render_job),
+    "variants": lambda argv: variants_command(argv, render_job),
+    "calibrate-resample": calibrate_command,
+    "bench-encoders": bench_command,
+    "warmup": lambda argv: warmup_command(argv, render_job),
+    "probe": lambda argv: probe_command(argv, plan_memory),
+    "responsive": responsive_command,
+    "dedupe": dedupe_command,
+    "similar": similar_command,
+    "palette": palette_command,
+    "autotune": lambda argv: autotune_command(argv, render_job, slab_scale),
+    "store": store_command,
+}
+
 def main():
     """Main function to run the slab replacement"""
-    if len(sys.argv) != 5:
-        print("Usage: python slab_render.py <kitchen_image> <slab_image> <mask_image> <output_image>")
-        print("Example: python slab_render.py kitchen.jpg slab.jpg mask.png final_render.jpg")
-        sys.exit(1)
+    if "--profile-startup" in sys.argv[1:]:
+        from render_startup import profile_startup
+        argv = [arg for arg in sys.argv[1:] if arg != "--profile-startup"]
+        sys.exit(profile_startup(os.path.abspath(__file__), argv or ["--help"]))
     
-    kitchen_path = sys.argv[1]
-    slab_path = sys.argv[2]
-    mask_path = sys.argv[3]
-    output_path = sys.argv[4]
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
+    
+    parser = argparse.ArgumentParser(
+        usage="python slab_render.py <kitchen_image> <slab_image> <mask_image> <output_image> [options]\n"
+              "       python slab_render.py {%s} ...\n"
+              "       python slab_render.py --profile-startup [args...]" % ",".join(COMMANDS),
+        epilog="Example: python slab_render.py kitchen.jpg slab.jpg mask.png final_render.jpg",
+    )
+    parser.add_argument("kitchen_image")
+    parser.add_argument("slab_image")
+    parser.add_argument("mask_image")
+    parser.add_argument("output_image")
+    parser.add_argument("--journal", nargs="?", const=DEFAULT_JOURNAL_PATH,
+                        help="Record the job in a durable journal (default: %s)" % DEFAULT_JOURNAL_PATH)
+    parser.add_argument("--job-id", help="Journal job id (default: output file name and a digest of the inputs)")
+    parser.add_argument("--resample", default=AUTO, choices=[AUTO] + available_backends(),
+                        help="Resampling backend (default: calibrated for this host)")
+    parser.add_argument("--preset", default=default_preset(), choices=list(PRESETS),
+                        help="Encoder preset (default: %(default)s)")
+    parser.add_argument("--partial-encode", action="store_true",
+                        help="Re-encode only the masked MCUs into the kitchen's cached JPEG (baseline JPEG presets)")
+    parser.add_argument("--tiled", action="store_true",
+                        help="Render in horizontal strips and stream the JPEG out, for very large scenes and slabs")
+    parser.add_argument("--strip-height", type=int,
+                        help="Rows per strip in tiled mode, rounded up to whole MCU rows (default: %d)"
+                             % DEFAULT_STRIP_HEIGHT)
+    parser.add_argument("--memory-budget-mb", type=float,
+                        help="Keep the render under this much memory, decoding the slab at a reduced scale or "
+                             "rendering tiled as needed (default: SLAB_RENDER_MEMORY_BUDGET_MB)")
+    parser.add_argument("--extend", choices=EXTEND_MODES,
+                        help="Repeat a slab too small for the scene at native resolution (tiled with "
+                             "blended seams, or mirrored) instead of upscaling it")
+    parser.add_argument("--manifest", help="Write the render result (encode stats, placeholder) to this JSON file")
+    parser.add_argument("--product-id", type=int, help="Product the render belongs to, kept with the journaled job")
+    args = parser.parse_args()
+    
+    kitchen_path = args.kitchen_image
+    slab_path = args.slab_image
+    mask_path = args.mask_image
+    output_path = args.output_image
     
     # Check if input files exist
     for path in [kitchen_path, slab_path, mask_path]:
@@ -109,7 +661,27 @@ def main():
     print(f"📸 Output will be saved to: {output_path}")
     print("\n🔄 Processing...")
     
-    success = slab_to_countertop_replacement(kitchen_path, slab_path, mask_path, output_path)
+    if args.journal:
+        inputs = {"kitchen": kitchen_path, "slab": slab_path, "mask": mask_path, "output": output_path,
+                  "resample": args.resample, "preset": args.preset, "partial": args.partial_encode}
+        if args.tiled:
+            inputs.update(tiled=True, strip_height=args.strip_height)
+        if args.extend:
+            inputs["extend"] = args.extend
+        if args.memory_budget_mb:
+            inputs["memory_budget"] = int(args.memory_budget_mb * 2**20)
+        if args.product_id is not None:
+            inputs["product_id"] = args.product_id
+        job_id = args.job_id or job_id_for(inputs)
+        success = journaled_render(args.journal, job_id, inputs, args.manifest)
+    else:
+        success = slab_to_countertop_replacement(kitchen_path, slab_path, mask_path, output_path,
+                                                 resample=args.resample, preset=args.preset,
+                                                 partial=args.partial_encode, manifest_path=args.manifest,
+                                                 tiled=args.tiled, strip_height=args.strip_height,
+                                                 memory_budget=int(args.memory_budget_mb * 2**20)
+                                                 if args.memory_budget_mb else default_budget_bytes(),
+                                                 extend=args.extend)
     
     if success:
         print("\n✅ DONE! Your countertop rendering is complete.")
@@ -0,0 +1,41 @@
+"""
+Autotune sweeps render with the profile being tuned
+
+With --profile the sweep renders must read tuned settings from that
+profile rather than the default one the process started with.
+"""
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+import render_io  # noqa: E402
+from render_autotune import autotune  # noqa: E402
+from render_io import load_host_profile, write_json_atomic  # noqa: E402
+
+seen = []
+
+
+def fake_render(inputs):
+    seen.append(load_host_profile().get("marker"))
+
+
+def test_sweep_reads_chosen_profile(tmp_path, monkeypatch):
+    default = str(tmp_path / "default_profile.json")
+    chosen = str(tmp_path / "chosen_profile.json")
+    write_json_atomic(default, {"marker": "default"})
+    write_json_atomic(chosen, {"marker": "chosen"})
+    monkeypatch.setattr(render_io, "HOST_PROFILE_PATH", default)
+    seen.clear()
+
+    section = autotune(fake_render, None, [{"kitchen": "k.jpg", "slab": "s.jpg"}], knobs=("strip_height",),
+                       strip_heights=(64, 128), repeats=1, profile_path=chosen)
+
+    assert seen and set(seen) == {"chosen"}
+    assert section["settings"]["strip_height"] in (64, 128)
+    assert load_host_profile(chosen)["autotune"]["settings"] == section["settings"]
+    # The process profile is restored once the sweep is done
+    assert render_io.HOST_PROFILE_PATH == default
+    assert load_host_profile()["marker"] == "default"
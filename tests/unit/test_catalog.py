@@ -0,0 +1,59 @@
+"""
+Catalog renders are named after the format their preset writes
+
+Presets that don't write JPEG (thumbnail, responsive) must render to their
+own extension, and switching presets must not leave the old render behind.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+import render_io  # noqa: E402
+from render_catalog import run_catalog  # noqa: E402
+from render_encode import FORMAT_EXTENSIONS, output_format  # noqa: E402
+from slab_render import render_job  # noqa: E402
+
+
+def write_catalog(directory):
+    width, height = 320, 240
+    y, x = np.mgrid[0:height, 0:width]
+    kitchen = np.stack([x * 255 // width, y * 255 // height, np.full_like(x, 128)], axis=2).astype(np.uint8)
+    Image.fromarray(kitchen).save(os.path.join(directory, "kitchen.jpg"))
+    Image.fromarray(np.full((120, 160, 3), 200, np.uint8)).save(os.path.join(directory, "slab.jpg"))
+    mask = np.zeros((height, width), np.uint8)
+    mask[60:180, 40:280] = 255
+    Image.fromarray(mask).save(os.path.join(directory, "mask.png"))
+    with open(os.path.join(directory, "scenes.json"), "w") as f:
+        json.dump({"kitchen": {"image": "kitchen.jpg", "mask": "mask.png"}}, f)
+    with open(os.path.join(directory, "products.json"), "w") as f:
+        json.dump([{"product_id": "p1", "slab_image": "slab.jpg"}], f)
+
+
+@pytest.mark.parametrize("preset", ["thumbnail", "responsive"])
+def test_catalog_renders_non_jpeg_presets(tmp_path, monkeypatch, preset):
+    monkeypatch.setattr(render_io, "HOST_PROFILE_PATH", str(tmp_path / "render_profile.json"))
+    write_catalog(str(tmp_path))
+    output_dir = str(tmp_path / "catalog")
+    options = dict(output_dir=output_dir, scenes_path=str(tmp_path / "scenes.json"))
+
+    summary = run_catalog(str(tmp_path / "products.json"), render_job, preset=preset, **options)
+    assert summary["rendered"] == 1 and summary["failed"] == 0
+    image_format = output_format(preset)
+    output = os.path.join(output_dir, f"p1_kitchen{FORMAT_EXTENSIONS[image_format]}")
+    assert Image.open(output).format == image_format
+
+    # Unchanged inputs and preset: nothing to redo
+    assert run_catalog(str(tmp_path / "products.json"), render_job, preset=preset, **options)["stale"] == 0
+
+    # Back to a JPEG preset: the render moves to .jpg and the old file goes
+    summary = run_catalog(str(tmp_path / "products.json"), render_job, preset="gallery", **options)
+    assert summary["rendered"] == 1
+    assert sorted(os.listdir(output_dir)) == ["catalog_state.json", "p1_kitchen.jpg"]
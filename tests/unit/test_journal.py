@@ -0,0 +1,67 @@
+"""
+Resuming the journal re-runs jobs whose worker died
+
+A row left running by a process that no longer exists must be rendered
+again by ``journal resume`` (counting another attempt), while a job still
+running in a live process is left alone.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+from render_journal import DONE, RUNNING, RenderJournal, journal_command  # noqa: E402
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def mark_running(journal, job_id, pid, updated_at):
+    journal.conn.execute("UPDATE jobs SET state = ?, attempts = 1, host = ?, pid = ?, updated_at = ? "
+                         "WHERE job_id = ?", (RUNNING, socket.gethostname(), pid, updated_at, job_id))
+
+
+def test_resume_reruns_dead_running_job(tmp_path):
+    path = str(tmp_path / "journal.db")
+    output = str(tmp_path / "out.jpg")
+    # A stale output from before the interrupted attempt started is no proof it finished
+    with open(output, "wb") as f:
+        f.write(b"stale")
+    os.utime(output, (time.time() - 3600, time.time() - 3600))
+
+    journal = RenderJournal(path)
+    journal.enqueue("dead", {"output": output})
+    journal.enqueue("alive", {"output": str(tmp_path / "alive.jpg")})
+    mark_running(journal, "dead", dead_pid(), time.time())
+    mark_running(journal, "alive", os.getpid(), time.time())
+    journal.close()
+
+    rendered = []
+
+    def render(inputs):
+        rendered.append(inputs["output"])
+        with open(inputs["output"], "wb") as f:
+            f.write(b"rendered")
+        return {"output": inputs["output"]}
+
+    assert journal_command(["--journal", path, "resume"], render) == 0
+    assert rendered == [output]
+
+    journal = RenderJournal(path)
+    try:
+        job = journal.get("dead")
+        assert job["state"] == DONE
+        assert job["attempts"] == 2
+        assert job["result"] == {"output": output}
+        assert journal.get("alive")["state"] == RUNNING
+        assert journal.get("alive")["attempts"] == 1
+    finally:
+        journal.close()
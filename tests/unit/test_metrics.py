@@ -0,0 +1,45 @@
+"""
+Metrics start from zero after warmup
+
+The spool worker resets the registry once warmup is done; the counters
+read by collectors (scene JPEG cache, buffer arena) must start over too,
+or the first scrape counts the warmup renders as traffic.
+"""
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+import render_encode  # noqa: E402
+import render_io  # noqa: E402
+from render_metrics import REGISTRY  # noqa: E402
+from render_splice import SceneJpegCache  # noqa: E402
+from render_warmup import warm_up  # noqa: E402
+from slab_render import render_job  # noqa: E402
+
+COUNTERS = ("slab_render_renders_total", "slab_render_output_bytes_total", "slab_render_cache_requests_total",
+            "slab_render_render_seconds_count")
+
+
+def partial_render(inputs):
+    return render_job(dict(inputs, partial=True))
+
+
+def counter_values(exposition):
+    return [float(line.rsplit(" ", 1)[1]) for line in exposition.splitlines()
+            if not line.startswith("#") and line.split("{")[0].split(" ")[0] in COUNTERS]
+
+
+def test_reset_after_warmup_zeroes_every_counter(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_io, "HOST_PROFILE_PATH", str(tmp_path / "render_profile.json"))
+    monkeypatch.setattr(render_encode, "_scene_cache", SceneJpegCache(str(tmp_path)))
+    warm_up(partial_render, rounds=2, record=False)
+    assert any(counter_values(REGISTRY.exposition()))
+
+    REGISTRY.reset()
+
+    values = counter_values(REGISTRY.exposition())
+    # The collected cache counters are still exposed, at zero
+    assert values and not any(values)
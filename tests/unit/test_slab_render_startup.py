@@ -0,0 +1,46 @@
+"""
+Cold-start budget for the render CLI
+
+Importing slab_render must not pull in NumPy, Pillow or OpenCV, and its
+cumulative import time must stay under the budget. Override the budget
+with SLAB_RENDER_STARTUP_BUDGET_MS on slow machines.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+from render_startup import HEAVY_MODULES, parse_importtime  # noqa: E402
+
+STARTUP_BUDGET_MS = float(os.environ.get("SLAB_RENDER_STARTUP_BUDGET_MS", 150))
+RUNS = 3
+
+
+def run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+
+
+def test_cli_import_skips_heavy_modules():
+    code = ("import json, sys, slab_render; "
+            f"print(json.dumps([name for name in {list(HEAVY_MODULES)!r} if name in sys.modules]))")
+    assert json.loads(run_python("-c", code).stdout) == []
+
+
+def test_cli_import_within_budget():
+    samples = []
+    for _ in range(RUNS):
+        entries = parse_importtime(run_python("-X", "importtime", "-c", "import slab_render").stderr)
+        samples.append(next(entry["cumulative_us"] for entry in entries if entry["module"] == "slab_render"))
+    best_ms = min(samples) / 1000
+    assert best_ms <= STARTUP_BUDGET_MS, f"slab_render imports in {best_ms:.1f} ms (budget {STARTUP_BUDGET_MS} ms)"
+
+
+def test_help_runs_without_heavy_modules():
+    completed = run_python("-X", "importtime", "slab_render.py", "--help")
+    modules = {entry["module"].split(".")[0] for entry in parse_importtime(completed.stderr)}
+    assert "usage:" in completed.stdout
+    assert not modules & set(HEAVY_MODULES)
@@ -0,0 +1,60 @@
+"""
+Partial encodes decode to the same pixels as full encodes
+
+The dirty MCUs are re-encoded out of place and spliced into the cached
+scene, so a dirty region that starts or ends mid-MCU, or runs into the
+padded right and bottom edge MCUs, must still decode exactly like a full
+encode of the composite.
+"""
+
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+from render_splice import SceneJpegCache, splice_encode, splice_options  # noqa: E402
+
+
+def decode(data):
+    return np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+
+
+@pytest.mark.parametrize("subsampling", ["4:2:0", "4:2:2", "4:4:4"])
+@pytest.mark.parametrize("size, box", [
+    ((320, 240), (32, 48, 160, 128)),   # MCU-aligned
+    ((203, 150), (13, 5, 77, 61)),      # starts and ends mid-MCU
+    ((203, 150), (150, 100, 203, 150)),  # runs into the padded edge MCUs
+    ((200, 151), (0, 140, 90, 151)),    # odd height, bottom row only
+])
+def test_partial_matches_full_encode(tmp_path, subsampling, size, box):
+    width, height = size
+    rng = np.random.default_rng(1)
+    y, x = np.mgrid[0:height, 0:width]
+    scene = np.stack([x * 255 // width, y * 255 // height, (x ^ y) & 0xFF], axis=2).astype(np.uint8)
+    scene_path = str(tmp_path / "scene.png")
+    Image.fromarray(scene).save(scene_path)
+
+    left, top, right, bottom = box
+    alpha = np.zeros((height, width), np.uint8)
+    alpha[top:bottom, left:right] = 255
+    result = scene.copy()
+    result[top:bottom, left:right] = rng.integers(0, 256, (bottom - top, right - left, 3), dtype=np.uint8)
+
+    options = {"quality": 85, "subsampling": subsampling}
+    data, encoded, total = splice_encode(scene_path, scene, result, alpha, options,
+                                         SceneJpegCache(str(tmp_path / "cache")))
+    assert 0 < encoded < total
+
+    full = io.BytesIO()
+    Image.fromarray(result).save(full, "JPEG", **splice_options(options))
+    assert np.array_equal(decode(data), decode(full.getvalue()))
+    # Restart markers don't change the coefficients: a plain baseline encode decodes the same
+    plain = io.BytesIO()
+    Image.fromarray(result).save(plain, "JPEG", quality=85, subsampling=subsampling)
+    assert np.array_equal(decode(data), decode(plain.getvalue()))
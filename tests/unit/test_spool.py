@@ -0,0 +1,109 @@
+"""
+Spool claims are exclusive, leases expire and failures are recorded
+
+Workers sharing a spool directory race on the rename into claimed/; every
+job must be won by exactly one of them. A claim whose lease ran out goes
+back to incoming/ (or to failed/ once out of attempts), and a job whose
+render raised ends up in failed/ with its error.
+"""
+
+import os
+import sys
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+from render_io import read_json  # noqa: E402
+from render_spool import CLAIMED, FAILED, INCOMING, RenderSpool  # noqa: E402
+
+
+def worker(root, name, **options):
+    spool = RenderSpool(root, **options)
+    spool.owner = name
+    return spool
+
+
+def test_two_workers_never_claim_the_same_job(tmp_path):
+    root = str(tmp_path)
+    first, second = worker(root, "host-a-1"), worker(root, "host-b-2")
+    job_id = first.submit({"output": "out.jpg"})
+
+    claimed = first.claim()
+    assert claimed is not None and claimed[1]["job_id"] == job_id
+    assert second.claim() is None
+    assert os.listdir(first.path(CLAIMED)) == [f"{job_id}@host-a-1.json"]
+
+
+def test_concurrent_claims_are_exclusive(tmp_path):
+    root = str(tmp_path)
+    job_ids = {RenderSpool(root).submit({"output": f"out_{n}.jpg"}) for n in range(40)}
+    claims = {}
+    start = threading.Barrier(4)
+
+    def claim_all(name):
+        spool = worker(root, name)
+        start.wait()
+        while (claimed := spool.claim()) is not None:
+            claims.setdefault(claimed[1]["job_id"], []).append(name)
+
+    threads = [threading.Thread(target=claim_all, args=(f"host-{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(claims) == job_ids
+    assert all(len(owners) == 1 for owners in claims.values())
+    assert len(os.listdir(os.path.join(root, CLAIMED))) == len(job_ids)
+
+
+def expire(claim_path, lease_seconds):
+    old = time.time() - lease_seconds - 60
+    os.utime(claim_path, (old, old))
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    root = str(tmp_path)
+    dead, alive = worker(root, "host-a-1", lease_seconds=30), worker(root, "host-b-2", lease_seconds=30)
+    job_id = dead.submit({"output": "out.jpg"})
+    claim_path, _ = dead.claim()
+
+    # A claim still within its lease stays put
+    assert alive.reclaim_stale() == []
+    expire(claim_path, 30)
+    assert alive.reclaim_stale() == [job_id]
+    assert os.listdir(alive.path(INCOMING)) == [f"{job_id}.json"]
+
+    _, job = alive.claim()
+    assert job["job_id"] == job_id
+    assert job["attempts"] == 2
+    assert job["claimed_by"] == "host-b-2"
+
+
+def test_expired_lease_out_of_attempts_fails(tmp_path):
+    spool = worker(str(tmp_path), "host-a-1", lease_seconds=30, max_attempts=1)
+    job_id = spool.submit({"output": "out.jpg"})
+    claim_path, _ = spool.claim()
+    expire(claim_path, 30)
+
+    assert spool.reclaim_stale() == [job_id]
+    failed = read_json(spool.path(FAILED, f"{job_id}.json"))
+    assert failed["error"] == "Lease expired after 1 attempts"
+    assert os.listdir(spool.path(INCOMING)) == []
+
+
+def test_failed_render_is_recorded(tmp_path):
+    spool = worker(str(tmp_path), "host-a-1")
+    job_id = spool.submit({"output": "out.jpg"})
+
+    def render(inputs):
+        raise RuntimeError("slab image is corrupt")
+
+    assert spool.work(render, once=True) == 1
+    failed = read_json(spool.path(FAILED, f"{job_id}.json"))
+    assert failed["error"] == "slab image is corrupt"
+    assert failed["attempts"] == 1
+    assert "finished_at" in failed
+    assert spool.counts() == {"incoming": 0, "claimed": 0, "done": 0, "failed": 1}
@@ -0,0 +1,120 @@
+"""
+The render store evicts by real use and never evicts work in flight
+
+Eviction goes least recently used first, where use is what the renderer
+recorded writing and what the server logged serving. Files of unfinished
+journal jobs and gallery images survive any budget.
+"""
+
+import json
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+from render_journal import RenderJournal  # noqa: E402
+from render_store import ACCESS_LOG_NAME, GALLERY_MANIFEST_NAME, RenderStore, record_outputs  # noqa: E402
+from slab_render import COMMANDS  # noqa: E402
+
+DAY = 24 * 60 * 60
+
+
+def write_file(root, rel, size=1000, age=30 * DAY):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    # Old mtime and atime, so only recorded accesses tell the files apart
+    old = time.time() - age
+    os.utime(path, (old, old))
+    return path
+
+
+def write_manifest(root, urls=()):
+    with open(os.path.join(root, GALLERY_MANIFEST_NAME), "w") as f:
+        json.dump({"images": list(urls)}, f)
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    root = str(tmp_path)
+    now = time.time()
+    paths = {name: write_file(root, name) for name in ("render_1_1.jpg", "render_2_2.jpg", "render_3_3.jpg",
+                                                       os.path.join("catalog", "p1_kitchen.jpg"))}
+    write_manifest(root)
+    store = RenderStore(root)
+    try:
+        store.record(paths["render_1_1.jpg"], now - 3 * DAY)
+        store.record(paths["render_2_2.jpg"], now - 1 * DAY)
+        store.record(paths["render_3_3.jpg"], now - 2 * DAY)
+        store.record(paths[os.path.join("catalog", "p1_kitchen.jpg")], now - 4 * DAY)
+        entries = store.scan()
+        protected, _ = store.protected_paths()
+        evicted, remaining = store.enforce_budget(entries, protected, budget_bytes=2000)
+    finally:
+        store.close()
+
+    assert [entry["path"] for entry in evicted] == [os.path.join("catalog", "p1_kitchen.jpg"), "render_1_1.jpg"]
+    assert remaining == 2000
+    assert sorted(name for name in os.listdir(root) if name.endswith(".jpg")) == ["render_2_2.jpg",
+                                                                                "render_3_3.jpg"]
+
+
+def test_in_flight_and_gallery_files_are_never_evicted(tmp_path):
+    root = str(tmp_path)
+    kitchen = write_file(root, os.path.join("rendering", "kitchen_1.jpg"))
+    mask = write_file(root, os.path.join("rendering", "mask_1.png"))
+    slab = write_file(root, "slab_7.jpg", age=2 * DAY)
+    output = write_file(root, "render_7_1.jpg")
+    write_file(root, "render_8_1.jpg")
+    write_file(root, "render_9_1.jpg")
+    write_manifest(root, ["/upload/render_9_1.jpg"])
+    journal_path = str(tmp_path / "journal.db")
+    journal = RenderJournal(journal_path)
+    journal.enqueue("in-flight", {"kitchen": kitchen, "slab": slab, "mask": mask, "output": output})
+    journal.close()
+
+    store = RenderStore(root)
+    try:
+        entries = store.scan()
+        protected, manifest_found = store.protected_paths(journal=journal_path)
+        removed = store.sweep_orphans(entries, protected)
+        evicted, _ = store.enforce_budget(entries, protected, budget_bytes=0)
+    finally:
+        store.close()
+
+    assert manifest_found
+    assert removed == []
+    assert [entry["path"] for entry in evicted] == ["render_8_1.jpg"]
+    for path in (kitchen, mask, slab, output, os.path.join(root, "render_9_1.jpg")):
+        assert os.path.exists(path)
+
+
+def test_writes_and_served_files_are_recorded(tmp_path):
+    root = str(tmp_path)
+    written = write_file(root, "render_1_1.jpg")
+    served = write_file(root, "render_2_2.jpg")
+    write_file(root, "render_3_3.jpg")
+    before = time.time()
+
+    # The renderer records what it writes; files outside the upload root are no business of the store
+    assert record_outputs([written, str(tmp_path.parent / "elsewhere.jpg")], root) == 1
+    # The server logs what it serves; unmanaged files in the log are ignored
+    with open(os.path.join(root, ACCESS_LOG_NAME), "w") as f:
+        json.dump({"accesses": {"/upload/render_2_2.jpg": before - DAY, "/upload/avatars/me.jpg": before}}, f)
+
+    write_manifest(root)
+    assert COMMANDS["store"](["--root", root, "sweep", "--budget", "2000"]) == 0
+    assert not os.path.exists(os.path.join(root, ACCESS_LOG_NAME))
+
+    store = RenderStore(root)
+    try:
+        accesses = dict(store.conn.execute("SELECT path, last_access FROM files"))
+    finally:
+        store.close()
+    assert accesses["render_1_1.jpg"] >= before
+    assert accesses["render_2_2.jpg"] == before - DAY
+    # The one file neither written nor served was the one evicted
+    assert "render_3_3.jpg" not in accesses
+    assert os.path.exists(written) and os.path.exists(served)
@@ -0,0 +1,63 @@
+"""
+Tiled renders must match whole-frame renders
+
+The streamed strips are spliced into one baseline JPEG, so the decoded
+result may only differ from a whole-frame render by encoder rounding. The
+wide 4:4:4 case has more MCUs per strip than a JPEG restart interval can
+count unless the strip height is capped.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+import render_io  # noqa: E402
+from render_resample import available_backends  # noqa: E402
+from slab_render import render_countertop  # noqa: E402
+
+MAX_DIFF = 12
+MAX_MEAN_DIFF = 0.1
+
+
+def write_inputs(directory, size, slab_size):
+    rng = np.random.default_rng(0)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    kitchen = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=2)
+    Image.fromarray(kitchen.astype(np.uint8)).save(os.path.join(directory, "kitchen.jpg"), quality=95)
+    # Smooth veined texture, so resampling differences aren't drowned in noise
+    coarse = rng.integers(0, 256, (slab_size[1] // 16, slab_size[0] // 16, 3), dtype=np.uint8)
+    Image.fromarray(coarse).resize(slab_size, Image.Resampling.BICUBIC).save(os.path.join(directory, "slab.jpg"),
+                                                                            quality=95)
+    mask = np.zeros((height, width), np.uint8)
+    mask[height // 4:height * 3 // 4, width // 8:width * 7 // 8] = 255
+    Image.fromarray(mask).save(os.path.join(directory, "mask.png"))
+    return [os.path.join(directory, name) for name in ("kitchen.jpg", "slab.jpg", "mask.png")]
+
+
+@pytest.mark.parametrize("size, slab_size, preset, strip_height, resample", [
+    ((1024, 768), (640, 480), "gallery", 128, "pil-lanczos"),
+    ((1024, 768), (640, 480), "gallery", 128, "cv2-linear"),
+    ((1024, 768), (2400, 1800), "gallery", 256, "cv2-area"),
+    ((6000, 1200), (1600, 1200), "print", 1024, "pil-lanczos"),
+])
+def test_tiled_matches_full_render(tmp_path, monkeypatch, size, slab_size, preset, strip_height, resample):
+    if resample not in available_backends():
+        pytest.skip(f"{resample} is not available")
+    # The profile path is read at import; point it at an empty profile so tuned settings don't apply
+    monkeypatch.setattr(render_io, "HOST_PROFILE_PATH", str(tmp_path / "render_profile.json"))
+    kitchen, slab, mask = write_inputs(str(tmp_path), size, slab_size)
+    full = render_countertop(kitchen, slab, mask, str(tmp_path / "full.jpg"), resample, preset)
+    tiled = render_countertop(kitchen, slab, mask, str(tmp_path / "tiled.jpg"), resample, preset,
+                              tiled=True, strip_height=strip_height)
+    assert tiled["encode"]["strips"] > 1
+
+    diff = np.abs(np.asarray(Image.open(full["output"]), np.int16) - np.asarray(Image.open(tiled["output"]), np.int16))
+    assert diff.max() <= MAX_DIFF
+    assert diff.mean() <= MAX_MEAN_DIFF
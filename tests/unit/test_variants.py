@@ -0,0 +1,52 @@
+"""
+Variants of a slab smaller than the mask still cover the countertop
+
+The shared texture is scaled to the scene's longest side, over the whole
+scene rather than the mask's bounding box, so a slab smaller than the
+masked area is resampled up and every rotation and shift cuts a full
+scene-sized window from it.
+"""
+
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_DIR)
+
+import render_io  # noqa: E402
+from render_resample import resize  # noqa: E402
+from render_variants import DEFAULT_VARIANTS, parse_variant, texture_size, variant_view  # noqa: E402
+from slab_render import SLAB_COVERAGE, composite, render_variant_sweep  # noqa: E402
+
+MAX_MEAN_DIFF = 2.0
+
+
+def test_slab_smaller_than_mask(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_io, "HOST_PROFILE_PATH", str(tmp_path / "render_profile.json"))
+    size = width, height = 320, 200
+    slab_size = (48, 36)
+    y, x = np.mgrid[0:height, 0:width]
+    kitchen = np.stack([x * 255 // width, y * 255 // height, np.full_like(x, 64)], axis=2).astype(np.uint8)
+    sy, sx = np.mgrid[0:slab_size[1], 0:slab_size[0]]
+    slab = np.stack([sx * 5, sy * 7, (sx + sy) * 3], axis=2).astype(np.uint8)
+    alpha = np.zeros((height, width), np.uint8)
+    alpha[20:180, 10:310] = 255
+    paths = [str(tmp_path / name) for name in ("kitchen.png", "slab.png", "mask.png")]
+    for array, path in zip((kitchen, slab, alpha), paths):
+        Image.fromarray(array).save(path)
+
+    variants = [parse_variant(spec) for spec in DEFAULT_VARIANTS + ("rot270+shift=1,-1",)]
+    result = render_variant_sweep(*paths, variants, output_dir=str(tmp_path / "variants"), resample="pil-lanczos",
+                                  preset="print")
+
+    texture = resize(slab, texture_size(slab_size, size, SLAB_COVERAGE), "pil-lanczos")
+    assert min(texture.shape[:2]) >= max(size)
+    for variant, entry in zip(variants, result["variants"]):
+        view = variant_view(texture, size, variant)
+        assert view.shape[:2] == (height, width)
+        expected = composite(kitchen, view, alpha)
+        rendered = np.asarray(Image.open(entry["output"]).convert("RGB"))
+        assert np.abs(rendered.astype(np.int16) - expected).mean() <= MAX_MEAN_DIFF